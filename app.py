@@ -10,9 +10,12 @@ import os
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, session, g, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, session, g, flash, Response, stream_with_context, send_file
 import logging
 import io
+import click
+import threading
+import uuid
 
 # Import persona configuration
 from config.personas import (
@@ -26,6 +29,56 @@ from utils.persona_helpers import (
     get_overview_template_for_persona,
     should_hide_sidebar
 )
+from utils.schema import ensure_schema, CHANGE_ORDER_FILTER
+from utils.compliance import compute_compliance
+from utils.earned_value import get_portfolio_earned_value
+from utils.monte_carlo import forecast_project, forecast_portfolio
+from utils.intents import IntentRegistry
+from utils.cache import get_data_version
+from utils.search_index import search_projects, query_terms, tokenize
+from utils.entities import extract_entities, entity_scope
+from utils.conversation import ConversationStore, ConversationContext, result_rows
+from utils.query_planner import plan_question, QueryPlanner, QueryCostExceeded, STATEMENT_CACHE_SIZE
+from utils.guided_answers import (
+    prompt_key as guided_prompt_key,
+    refresh_guided_answers,
+    get_guided_answer,
+    start_guided_refresher
+)
+from utils.jobs import JobQueue
+from utils.report_workbook import write_report_workbook, is_available as report_workbook_available
+from utils.exports import EXPORT_FORMATS, iter_batches, is_available as export_format_available
+from utils.data_package import PACKAGE_FORMATS, build_data_package, open_package, iter_package_zip
+from utils.report_snapshots import (
+    current_fiscal_year,
+    fiscal_year_is_final,
+    get_report_snapshot,
+    list_report_snapshots,
+    save_report_snapshot,
+    snapshot_needed,
+    diff_reports
+)
+from utils.answer_stream import (
+    header as answer_header,
+    row as answer_row,
+    suggestions as answer_suggestions,
+    response_parts,
+    collect_parts,
+    to_ndjson
+)
+from utils.ask_cache import (
+    normalize_question,
+    get_cached_answer,
+    cache_answer,
+    cache_stats as ask_cache_stats
+)
+from utils.snapshots import (
+    build_kpi_row,
+    save_snapshot,
+    snapshot_due,
+    get_kpi_trend,
+    start_snapshot_scheduler
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,10 +90,23 @@ app.secret_key = os.environ.get('SECRET_KEY', 'surtax-oversight-dev-key')
 DB_PATH = Path(__file__).parent / 'data' / 'contracts.db'
 
 
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+
 def get_db():
     """Get database connection."""
+    global _schema_ready
     conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
+
+    # Apply runtime schema upgrades the first time this process connects
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                ensure_schema(conn)
+                _schema_ready = True
+
     return conn
 
 
@@ -74,9 +140,11 @@ def inject_persona_to_templates():
     """Make persona available in all templates."""
     # Get concerns count for nav badge
     concerns_count = 0
+    fiscal_year_options = []
     try:
-        concerns = get_concerns()
+        concerns = get_concerns(g.get('fiscal_year', request.args.get('fy', type=int)))
         concerns_count = len(concerns)
+        fiscal_year_options = get_report_fiscal_years()
     except:
         pass
 
@@ -86,6 +154,8 @@ def inject_persona_to_templates():
         'navigation_config': g.get('navigation', {}),
         'personas_list': PERSONAS,
         'concerns_count': concerns_count,
+        'selected_fiscal_year': g.get('fiscal_year', request.args.get('fy', type=int)),
+        'fiscal_year_options': fiscal_year_options,
         'hide_sidebar': g.get('hide_sidebar', False)
     }
 
@@ -177,10 +247,28 @@ def utility_functions():
 # DATA HELPERS
 # ==================
 
-def get_overview_stats():
-    """Get high-level overview statistics."""
+def requested_fiscal_year(default=None):
+    """
+    The fiscal year selected with ?fy= (None = all years).
+
+    The effective year is kept on g so the header selector shows it.
+    """
+    g.fiscal_year = request.args.get('fy', type=int) or default
+    return g.fiscal_year
+
+
+def _fiscal_year_clause(fiscal_year, alias=''):
+    """WHERE fragment and params restricting contracts to one fiscal year (or none)."""
+    if fiscal_year is None:
+        return '', []
+    return f' AND {alias}fiscal_year = ?', [fiscal_year]
+
+
+def get_overview_stats(fiscal_year=None):
+    """Get high-level overview statistics, optionally for one fiscal year."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year)
 
     stats = {}
 
@@ -198,7 +286,7 @@ def get_overview_stats():
         FROM contracts
         WHERE is_deleted = 0
         AND surtax_category IS NOT NULL
-    ''')
+    ''' + year_sql, year_params)
     row = cursor.fetchone()
     stats['total_projects'] = row['total_projects'] or 0
     stats['total_budget'] = row['total_budget'] or 0
@@ -228,10 +316,11 @@ def get_overview_stats():
     return stats
 
 
-def get_spending_by_category():
-    """Get spending breakdown by surtax category."""
+def get_spending_by_category(fiscal_year=None):
+    """Get spending breakdown by surtax category, optionally for one fiscal year."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year, 'c.')
 
     cursor.execute('''
         SELECT
@@ -245,9 +334,10 @@ def get_spending_by_category():
         LEFT JOIN surtax_categories sc ON c.surtax_category = sc.category_id
         WHERE c.is_deleted = 0
         AND c.surtax_category IS NOT NULL
+    ''' + year_sql + '''
         GROUP BY c.surtax_category
         ORDER BY total_budget DESC
-    ''')
+    ''', year_params)
 
     categories = []
     for row in cursor.fetchall():
@@ -265,10 +355,11 @@ def get_spending_by_category():
     return categories
 
 
-def get_concerns():
-    """Get auto-detected concerns for committee review."""
+def get_concerns(fiscal_year=None):
+    """Get auto-detected concerns for committee review, optionally for one fiscal year."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year)
 
     concerns = []
 
@@ -280,8 +371,9 @@ def get_concerns():
         WHERE is_deleted = 0
         AND surtax_category IS NOT NULL
         AND is_delayed = 1
+    ''' + year_sql + '''
         ORDER BY delay_days DESC
-    ''')
+    ''', year_params)
     for row in cursor.fetchall():
         concerns.append({
             'type': 'Schedule Delay',
@@ -305,8 +397,9 @@ def get_concerns():
         AND surtax_category IS NOT NULL
         AND is_over_budget = 1
         AND budget_variance_pct > 5
+    ''' + year_sql + '''
         ORDER BY budget_variance_pct DESC
-    ''')
+    ''', year_params)
     for row in cursor.fetchall():
         concerns.append({
             'type': 'Cost Overrun',
@@ -329,10 +422,11 @@ def get_concerns():
         WHERE is_deleted = 0
         AND surtax_category IS NOT NULL
         AND change_order_count > 0
+    ''' + year_sql + '''
         GROUP BY vendor_id
         HAVING total_change_orders >= 3
         ORDER BY total_change_orders DESC
-    ''')
+    ''', year_params)
     for row in cursor.fetchall():
         concerns.append({
             'type': 'Vendor Pattern',
@@ -354,13 +448,19 @@ def get_concerns():
     return concerns
 
 
-def get_projects(filters=None):
-    """Get projects with optional filters."""
-    conn = get_db()
-    cursor = conn.cursor()
+def projects_query(filters=None, select='c.*, sc.category_name, sc.color'):
+    """
+    Build the filtered project list query shared by /projects and its export.
 
-    query = '''
-        SELECT c.*, sc.category_name, sc.color
+    Args:
+        filters: Dict of project filters (see project_filters_from_request)
+        select: Column list to select (already validated by the caller)
+
+    Returns:
+        (sql, params) tuple
+    """
+    query = f'''
+        SELECT {select}
         FROM contracts c
         LEFT JOIN surtax_categories sc ON c.surtax_category = sc.category_id
         WHERE c.is_deleted = 0
@@ -389,10 +489,20 @@ def get_projects(filters=None):
             query += ' AND c.is_delayed = 1'
         if filters.get('over_budget'):
             query += ' AND c.is_over_budget = 1'
+        if filters.get('fiscal_year'):
+            query += ' AND c.fiscal_year = ?'
+            params.append(filters['fiscal_year'])
 
     query += ' ORDER BY c.current_amount DESC'
+    return query, params
+
+
+def get_projects(filters=None):
+    """Get projects with optional filters."""
+    conn = get_db()
+    cursor = conn.cursor()
 
-    cursor.execute(query, params)
+    cursor.execute(*projects_query(filters))
     projects = [dict(row) for row in cursor.fetchall()]
 
     conn.close()
@@ -496,29 +606,37 @@ def get_project_detail(contract_id):
         except:
             project['funding_sources_dict'] = {}
 
+    # Earned-value metrics and forecast (from the cached portfolio pass)
+    project['earned_value'] = get_portfolio_earned_value(conn)['projects'].get(contract_id)
+
+    # Monte Carlo completion and cost forecast for unfinished projects
+    if (project.get('percent_complete') or 0) < 100:
+        project['forecast'] = forecast_project(conn, contract_id)
+
     conn.close()
     return project
 
 
-def get_schools():
-    """Get all schools with project summaries."""
+def get_schools(fiscal_year=None):
+    """Get all schools with project summaries, optionally for one fiscal year."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year, 'c.')
 
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT s.*,
             (SELECT COUNT(*) FROM contracts c
              WHERE c.school_id = s.school_id
              AND c.is_deleted = 0
-             AND c.surtax_category IS NOT NULL) as project_count,
+             AND c.surtax_category IS NOT NULL{year_sql}) as project_count,
             (SELECT COALESCE(SUM(current_amount), 0) FROM contracts c
              WHERE c.school_id = s.school_id
              AND c.is_deleted = 0
-             AND c.surtax_category IS NOT NULL) as total_budget
+             AND c.surtax_category IS NOT NULL{year_sql}) as total_budget
         FROM schools s
         WHERE s.is_deleted = 0
         ORDER BY s.school_name
-    ''')
+    ''', year_params * 2)
 
     schools = [dict(row) for row in cursor.fetchall()]
     conn.close()
@@ -597,9 +715,10 @@ def switch_persona(persona_id):
 @app.route('/')
 def index():
     """Main landing page - persona-aware routing."""
-    stats = get_overview_stats()
-    categories = get_spending_by_category()
-    concerns = get_concerns()
+    fiscal_year = requested_fiscal_year()
+    stats = get_overview_stats(fiscal_year)
+    categories = get_spending_by_category(fiscal_year)
+    concerns = get_concerns(fiscal_year)
 
     # Both personas see the same executive dashboard
     return render_template('surtax/executive_dashboard.html',
@@ -612,9 +731,10 @@ def index():
 @app.route('/overview')
 def overview():
     """Detailed overview dashboard."""
-    stats = get_overview_stats()
-    categories = get_spending_by_category()
-    concerns = get_concerns()[:5]  # Top 5 concerns
+    fiscal_year = requested_fiscal_year()
+    stats = get_overview_stats(fiscal_year)
+    categories = get_spending_by_category(fiscal_year)
+    concerns = get_concerns(fiscal_year)[:5]  # Top 5 concerns
     recent = get_recent_activity(5)
 
     return render_template('surtax/overview.html',
@@ -625,19 +745,25 @@ def overview():
                           title='Surtax Oversight Dashboard')
 
 
-@app.route('/projects')
-def projects():
-    """Project list with filtering."""
-    filters = {
+def project_filters_from_request():
+    """The /projects filters from the query string."""
+    return {
         'category': request.args.get('category'),
         'subcategory': request.args.get('subcategory'),
         'status': request.args.get('status'),
         'school': request.args.get('school'),
         'search': request.args.get('search'),
         'delayed': request.args.get('delayed') == '1',
-        'over_budget': request.args.get('over_budget') == '1'
+        'over_budget': request.args.get('over_budget') == '1',
+        'fiscal_year': requested_fiscal_year()
     }
 
+
+@app.route('/projects')
+def projects():
+    """Project list with filtering."""
+    filters = project_filters_from_request()
+
     # Get filter options
     conn = get_db()
     cursor = conn.cursor()
@@ -688,6 +814,57 @@ def projects():
                           title='Projects')
 
 
+# Columns exported when ?columns= is not given
+PROJECT_EXPORT_COLUMNS = [
+    'contract_id', 'title', 'school_name', 'surtax_category', 'category_name', 'fiscal_year',
+    'vendor_name', 'status', 'original_amount', 'current_amount', 'total_paid',
+    'percent_complete', 'start_date', 'current_end_date', 'is_delayed', 'delay_days',
+    'is_over_budget', 'budget_variance_pct',
+]
+
+
+@app.route('/projects/export')
+def projects_export():
+    """
+    Stream the filtered project list as CSV, NDJSON or Parquet.
+
+    Query params:
+        format: csv (default), ndjson or parquet
+        columns: Optional comma-separated contract columns to include
+        plus every /projects filter
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown format: {fmt} (use {', '.join(EXPORT_FORMATS)})"}), 400
+    if not export_format_available(fmt):
+        return jsonify({'error': f'{fmt} export requires {EXPORT_FORMATS[fmt][3]} to be installed'}), 501
+
+    conn = get_db()
+    contract_types = {row['name']: row['type'] for row in conn.execute('PRAGMA table_info(contracts)')}
+    column_types = dict(contract_types, category_name='TEXT', color='TEXT')
+
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or PROJECT_EXPORT_COLUMNS
+    unknown = [c for c in columns if c not in column_types]
+    if unknown:
+        conn.close()
+        return jsonify({'error': f"Unknown column(s): {', '.join(unknown)}"}), 400
+
+    select = ', '.join(f'c.{c}' if c in contract_types else f'sc.{c}' for c in columns)
+    cursor = conn.cursor()
+    cursor.execute(*projects_query(project_filters_from_request(), select))
+    writer, mimetype, extension, _ = EXPORT_FORMATS[fmt]
+
+    def generate():
+        try:
+            yield from writer(columns, iter_batches(cursor), {c: column_types[c] for c in columns})
+        finally:
+            conn.close()
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=surtax_projects.{extension}'
+    return response
+
+
 @app.route('/project/<contract_id>')
 def project_detail(contract_id):
     """Individual project detail page."""
@@ -712,8 +889,9 @@ def concerns():
     issue_type = request.args.get('type')
     severity = request.args.get('severity')
     search = request.args.get('search')
+    fiscal_year = requested_fiscal_year()
 
-    concern_list = get_concerns()
+    concern_list = get_concerns(fiscal_year)
 
     # Apply filters
     if issue_type:
@@ -774,7 +952,7 @@ def concerns():
     }
 
     # Get available filter options
-    all_concerns = get_concerns()
+    all_concerns = get_concerns(fiscal_year)
     issue_types = list(set(c['type'] for c in all_concerns))
     severities = ['High', 'Medium', 'Low']
 
@@ -796,7 +974,7 @@ def concerns():
 @app.route('/schools')
 def schools():
     """School lookup page."""
-    school_list = get_schools()
+    school_list = get_schools(requested_fiscal_year())
 
     return render_template('surtax/schools.html',
                           schools=school_list,
@@ -838,267 +1016,1300 @@ def api_ask():
     if not question:
         return jsonify({'error': 'No question provided'}), 400
 
-    # Simple keyword-based responses for now
-    # This will be enhanced with actual AI in Phase 3
-    response = process_question(question)
+    # Repeated questions are served from memory until the data changes;
+    # follow-ups depend on the session and are answered from its context
+    normalized = normalize_question(question)
+    session_id = ask_session_id()
+    conn = get_db()
+    try:
+        version = get_data_version(conn)
+        response = answer_followup(conn, normalized, conversations.get(session_id, version))
+        cached = False
+        if response is None:
+            response = stored_answer(conn, normalized, version)
+            cached = response is not None
+            if not cached:
+                response = process_question(normalized, conn)
+                cache_answer(normalized, version, response)
+            remember_answer(conn, session_id, normalized, response, version)
+    finally:
+        conn.close()
 
     return jsonify({
         'question': question,
         'answer': response['answer'],
         'data': response.get('data'),
-        'suggestions': response.get('suggestions', [])
+        'suggestions': response.get('suggestions', []),
+        'cached': cached,
+        'intent': response.get('intent')
     })
 
 
-def process_question(question: str) -> dict:
-    """Process a natural language question and return an answer."""
-    question_lower = question.lower()
-
-    conn = get_db()
-    cursor = conn.cursor()
-
-    # Pattern matching for common questions
-    if any(kw in question_lower for kw in ['total', 'how much', 'budget', 'spending']):
-        cursor.execute('''
-            SELECT
-                COUNT(*) as count,
-                SUM(current_amount) as total_budget,
-                SUM(total_paid) as total_spent
-            FROM contracts
-            WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-        ''')
-        row = cursor.fetchone()
-        conn.close()
-
-        return {
-            'answer': f"There are {row['count']} surtax-funded projects with a total budget of ${row['total_budget']:,.0f}. So far, ${row['total_spent']:,.0f} has been spent ({row['total_spent']/row['total_budget']*100:.1f}% of budget).",
-            'suggestions': ['What projects are delayed?', 'Show me spending by category']
-        }
+# ==================
+# ASK AI INTENTS
+# ==================
+# Each intent lists keyword clauses (all must match) and answers with a
+# parameterized query. Matching is done by utils.intents in a single pass.
 
-    # Check for specific project delay questions FIRST (e.g., "Why is the high school delayed?")
-    elif any(kw in question_lower for kw in ['high school', 'south marion']) and any(kw in question_lower for kw in ['delayed', 'behind', 'late', 'why']):
-        cursor.execute('''
-            SELECT title, school_name, delay_days, delay_reason, status, percent_complete, current_end_date
-            FROM contracts
-            WHERE is_deleted = 0
-            AND (title LIKE '%High School%' OR title LIKE '%South Marion%')
-            AND is_delayed = 1
-            ORDER BY delay_days DESC
-            LIMIT 1
-        ''')
-        row = cursor.fetchone()
-        conn.close()
+ask_intents = IntentRegistry()
 
-        if row:
-            delay_reason = row['delay_reason'] or 'Supply chain delays and permitting issues'
-            return {
-                'answer': f"The {row['title'][:50]} is delayed by {row['delay_days']} days.\n\n**Reason:** {delay_reason}\n\n• Status: {row['status']}\n• Progress: {row['percent_complete']:.0f}%\n• New completion: {row['current_end_date'] or 'TBD'}",
-                'data': dict(row),
-                'suggestions': ['What is being done about it?', 'What other projects are delayed?']
-            }
-        else:
-            return {
-                'answer': "The high school project is currently on schedule.",
-                'suggestions': ['Show project details', 'What projects are delayed?']
-            }
 
-    elif any(kw in question_lower for kw in ['delayed', 'behind schedule', 'late']):
-        cursor.execute('''
-            SELECT title, school_name, delay_days
-            FROM contracts
-            WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_delayed = 1
-            ORDER BY delay_days DESC
-            LIMIT 5
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
+@ask_intents.intent('totals', ['total', 'how much', 'budget', 'spending'])
+def answer_totals(cursor, question, match):
+    cursor.execute('''
+        SELECT
+            COUNT(*) as count,
+            SUM(current_amount) as total_budget,
+            SUM(total_paid) as total_spent
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''')
+    row = cursor.fetchone()
 
-        if rows:
-            projects = [f"• {row['title'][:40]} ({row['delay_days']} days)" for row in rows]
-            return {
-                'answer': f"There are {len(rows)} delayed projects:\n" + "\n".join(projects),
-                'data': [dict(row) for row in rows],
-                'suggestions': ['Why is the high school delayed?', 'What projects are over budget?']
-            }
-        else:
-            return {
-                'answer': "Good news! There are no delayed projects at this time.",
-                'suggestions': ['Show total spending', 'What projects are over budget?']
-            }
+    return {
+        'answer': f"There are {row['count']} surtax-funded projects with a total budget of ${row['total_budget']:,.0f}. So far, ${row['total_spent']:,.0f} has been spent ({row['total_spent']/row['total_budget']*100:.1f}% of budget).",
+        'suggestions': ['What projects are delayed?', 'Show me spending by category']
+    }
 
-    elif any(kw in question_lower for kw in ['over budget', 'cost overrun', 'overspent']):
-        cursor.execute('''
-            SELECT title, school_name, budget_variance_pct, budget_variance_amount
-            FROM contracts
-            WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_over_budget = 1
-            ORDER BY budget_variance_pct DESC
-            LIMIT 5
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
 
-        if rows:
-            projects = [f"• {row['title'][:40]} (+{row['budget_variance_pct']:.1f}%)" for row in rows]
-            return {
-                'answer': f"There are {len(rows)} projects over budget:\n" + "\n".join(projects),
-                'data': [dict(row) for row in rows],
-                'suggestions': ['What is causing these overruns?', 'Show delayed projects']
-            }
-        else:
-            return {
-                'answer': "All projects are currently within budget.",
-                'suggestions': ['Show total spending', 'What projects are delayed?']
-            }
+@ask_intents.intent('school_delay', ['high school', 'south marion'], ['delayed', 'behind', 'late', 'why'])
+def answer_school_delay(cursor, question, match):
+    cursor.execute('''
+        SELECT contract_id, title, school_name, delay_days, delay_reason, status, percent_complete, current_end_date
+        FROM contracts
+        WHERE is_deleted = 0
+        AND (title LIKE '%High School%' OR title LIKE '%South Marion%')
+        AND is_delayed = 1
+        ORDER BY delay_days DESC
+        LIMIT 1
+    ''')
+    row = cursor.fetchone()
 
-    elif any(kw in question_lower for kw in ['high school', 'south marion', 'ccc']):
-        cursor.execute('''
-            SELECT * FROM contracts
-            WHERE is_deleted = 0
-            AND (title LIKE '%High School%CCC%' OR title LIKE '%SW High School%' OR title LIKE '%South Marion%')
-            LIMIT 1
-        ''')
-        row = cursor.fetchone()
-        conn.close()
+    if row:
+        delay_reason = row['delay_reason'] or 'Supply chain delays and permitting issues'
+        return {
+            'answer': f"The {row['title'][:50]} is delayed by {row['delay_days']} days.\n\n**Reason:** {delay_reason}\n\n• Status: {row['status']}\n• Progress: {row['percent_complete']:.0f}%\n• New completion: {row['current_end_date'] or 'TBD'}",
+            'data': dict(row),
+            'suggestions': ['What is being done about it?', 'What other projects are delayed?']
+        }
+    return {
+        'answer': "The high school project is currently on schedule.",
+        'suggestions': ['Show project details', 'What projects are delayed?']
+    }
 
-        if row:
-            return {
-                'answer': f"South Marion High School (CCC):\n• Budget: ${row['current_amount']:,.0f}\n• Status: {row['status']}\n• Progress: {row['percent_complete']:.0f}%\n• Expected completion: {row['current_end_date'] or 'Aug 2026'}",
-                'data': dict(row),
-                'suggestions': ['Are there any change orders?', 'Who is the contractor?']
-            }
-        else:
-            return {'answer': "I couldn't find information about that project.", 'suggestions': ['Show all projects']}
 
-    elif 'category' in question_lower or 'breakdown' in question_lower:
-        cursor.execute('''
-            SELECT surtax_category, COUNT(*) as count, SUM(current_amount) as total
-            FROM contracts
-            WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-            GROUP BY surtax_category
-            ORDER BY total DESC
-        ''')
-        rows = cursor.fetchall()
-        conn.close()
+@ask_intents.intent('delayed', ['delayed', 'behind schedule', 'late'])
+def answer_delayed(cursor, question, match):
+    cursor.execute('''
+        SELECT contract_id, title, school_name, delay_days
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_delayed = 1
+        ORDER BY delay_days DESC
+        LIMIT 5
+    ''')
+    rows = cursor.fetchall()
 
-        categories = [f"• {row['surtax_category']}: ${row['total']:,.0f} ({row['count']} projects)" for row in rows]
+    if rows:
+        projects = [f"• {row['title'][:40]} ({row['delay_days']} days)" for row in rows]
         return {
-            'answer': "Spending by category:\n" + "\n".join(categories),
+            'answer': f"There are {len(rows)} delayed projects:\n" + "\n".join(projects),
             'data': [dict(row) for row in rows],
-            'suggestions': ['Which category has the most delays?', 'Show new construction projects']
-        }
-
-    else:
-        conn.close()
-        return {
-            'answer': "I'm not sure how to answer that. Try asking about:\n• Total budget or spending\n• Delayed projects\n• Projects over budget\n• Specific schools or projects\n• Spending by category",
-            'suggestions': ['What is the total budget?', 'Are any projects delayed?', 'Show spending by category']
+            'suggestions': ['Why is the high school delayed?', 'What projects are over budget?']
         }
-
-
-# ==================
-# ANNUAL REPORT & MEETING MODE
-# ==================
-
-def get_report_data(fiscal_year=None):
-    """Get comprehensive data for annual report."""
-    conn = get_db()
-    cursor = conn.cursor()
-
-    report = {
-        'generated_at': datetime.now(),
-        'fiscal_year': fiscal_year or f"FY {datetime.now().year}",
+    return {
+        'answer': "Good news! There are no delayed projects at this time.",
+        'suggestions': ['Show total spending', 'What projects are over budget?']
     }
 
-    # Overall stats
-    report['stats'] = get_overview_stats()
-    report['categories'] = get_spending_by_category()
-    report['concerns'] = get_concerns()
 
-    # Projects by status
+@ask_intents.intent('over_budget', ['over budget', 'cost overrun', 'overspent'])
+def answer_over_budget(cursor, question, match):
     cursor.execute('''
-        SELECT status, COUNT(*) as count, SUM(current_amount) as total
+        SELECT contract_id, title, school_name, budget_variance_pct, budget_variance_amount
         FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-        GROUP BY status
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_over_budget = 1
+        ORDER BY budget_variance_pct DESC
+        LIMIT 5
     ''')
-    report['by_status'] = [dict(row) for row in cursor.fetchall()]
+    rows = cursor.fetchall()
 
-    # Top 10 projects by budget
-    cursor.execute('''
-        SELECT title, school_name, surtax_category, current_amount,
-               total_paid, percent_complete, status, is_delayed, is_over_budget
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-        ORDER BY current_amount DESC
-        LIMIT 10
-    ''')
-    report['top_projects'] = [dict(row) for row in cursor.fetchall()]
+    if rows:
+        projects = [f"• {row['title'][:40]} (+{row['budget_variance_pct']:.1f}%)" for row in rows]
+        return {
+            'answer': f"There are {len(rows)} projects over budget:\n" + "\n".join(projects),
+            'data': [dict(row) for row in rows],
+            'suggestions': ['What is causing these overruns?', 'Show delayed projects']
+        }
+    return {
+        'answer': "All projects are currently within budget.",
+        'suggestions': ['Show total spending', 'What projects are delayed?']
+    }
 
-    # Completed projects this period
+
+@ask_intents.intent('school', ['high school', 'south marion', 'ccc'])
+def answer_school(cursor, question, match):
     cursor.execute('''
-        SELECT title, school_name, current_amount, total_paid
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND status = 'Completed'
-        ORDER BY current_end_date DESC
-        LIMIT 10
+        SELECT * FROM contracts
+        WHERE is_deleted = 0
+        AND (title LIKE '%High School%CCC%' OR title LIKE '%SW High School%' OR title LIKE '%South Marion%')
+        LIMIT 1
     ''')
-    report['completed_projects'] = [dict(row) for row in cursor.fetchall()]
+    row = cursor.fetchone()
 
-    # Change orders summary
+    if row:
+        return {
+            'answer': f"South Marion High School (CCC):\n• Budget: ${row['current_amount']:,.0f}\n• Status: {row['status']}\n• Progress: {row['percent_complete']:.0f}%\n• Expected completion: {row['current_end_date'] or 'Aug 2026'}",
+            'data': dict(row),
+            'suggestions': ['Are there any change orders?', 'Who is the contractor?']
+        }
+    return {'answer': "I couldn't find information about that project.", 'suggestions': ['Show all projects']}
+
+
+@ask_intents.intent('category', ['category', 'breakdown'])
+def answer_category(cursor, question, match):
     cursor.execute('''
-        SELECT COUNT(*) as total_cos,
-               SUM(total_change_order_amount) as total_co_amount,
-               AVG(change_order_count) as avg_cos_per_project
+        SELECT surtax_category, COUNT(*) as count, SUM(current_amount) as total
         FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND change_order_count > 0
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+        GROUP BY surtax_category
+        ORDER BY total DESC
     ''')
-    co_row = cursor.fetchone()
-    report['change_orders'] = {
-        'total_count': co_row['total_cos'] or 0,
-        'total_amount': co_row['total_co_amount'] or 0,
-        'avg_per_project': co_row['avg_cos_per_project'] or 0
-    }
+    rows = cursor.fetchall()
 
-    # Compliance checklist
-    report['compliance'] = {
-        'funds_for_listed_purposes': True,  # Would need actual verification
-        'no_salary_expenditures': True,
-        'annual_audit_completed': False,  # Placeholder
-        'performance_audit_completed': False,
-        'public_meetings_held': True,
-        'annual_report_issued': False
+    categories = [f"• {row['surtax_category']}: ${row['total']:,.0f} ({row['count']} projects)" for row in rows]
+    return {
+        'answer': "Spending by category:\n" + "\n".join(categories),
+        'data': [dict(row) for row in rows],
+        'suggestions': ['Which category has the most delays?', 'Show new construction projects']
     }
 
-    conn.close()
-    return report
 
+def _entity_names(entities):
+    """Readable list of entity names for an answer."""
+    names = [e.name for e in entities]
+    return names[0] if len(names) == 1 else ', '.join(names[:-1]) + ' and ' + names[-1]
 
-@app.route('/report')
-def annual_report():
-    """Annual report generator page."""
-    report = get_report_data()
 
-    return render_template('surtax/report.html',
-                          report=report,
-                          title='Annual Report')
+@ask_intents.intent('entity_delay', ['delayed', 'behind', 'late', 'why'], entities=['school', 'vendor', 'project'])
+def answer_entity_delay(cursor, question, match):
+    scope, params = entity_scope(match.entities)
+    cursor.execute(f'''
+        SELECT contract_id, title, school_name, delay_days, delay_reason, status, current_end_date
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_delayed = 1 AND {scope}
+        ORDER BY delay_days DESC
+        LIMIT 5
+    ''', params)
+    rows = cursor.fetchall()
+    names = _entity_names(match.entities)
 
+    if rows:
+        projects = [f"• {row['title'][:50]} ({row['delay_days']} days) — {row['delay_reason'] or 'reason not recorded'}" for row in rows]
+        return {
+            'answer': f"{names}: {len(rows)} delayed project{'s' if len(rows) != 1 else ''}:\n" + "\n".join(projects),
+            'data': [dict(row) for row in rows],
+            'suggestions': ['What other projects are delayed?', f"Tell me about {match.entities[0].name}"]
+        }
+    return {
+        'answer': f"No delayed surtax projects found for {names}.",
+        'suggestions': ['What projects are delayed?', f"Tell me about {match.entities[0].name}"]
+    }
 
-@app.route('/report/print')
-def annual_report_print():
-    """Print-friendly version of annual report."""
-    report = get_report_data()
 
-    return render_template('surtax/report_print.html',
-                          report=report,
-                          title='Annual Report - Print View')
+@ask_intents.intent('entity_budget', ['over budget', 'cost overrun', 'overspent', 'budget', 'spending', 'how much', 'cost', 'total'],
+                    entities=['school', 'vendor', 'project'])
+def answer_entity_budget(cursor, question, match):
+    scope, params = entity_scope(match.entities)
+    cursor.execute(f'''
+        SELECT COUNT(*) as count,
+               COALESCE(SUM(current_amount), 0) as total_budget,
+               COALESCE(SUM(total_paid), 0) as total_spent,
+               COALESCE(SUM(is_over_budget), 0) as over_budget
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND {scope}
+    ''', params)
+    row = cursor.fetchone()
+    names = _entity_names(match.entities)
 
+    if not row['count']:
+        return {
+            'answer': f"No surtax projects are linked to {names}.",
+            'suggestions': ['What is the total budget?', 'Show spending by category']
+        }
+    pct = row['total_spent'] / row['total_budget'] * 100 if row['total_budget'] else 0
+    return {
+        'answer': f"{names}: {row['count']} surtax project{'s' if row['count'] != 1 else ''} with a total budget of ${row['total_budget']:,.0f}. ${row['total_spent']:,.0f} has been spent ({pct:.1f}% of budget); {row['over_budget']} over budget.",
+        'data': dict(row),
+        'suggestions': [f"Tell me about {match.entities[0].name}", 'What projects are over budget?']
+    }
 
-@app.route('/meeting')
-def meeting_mode():
-    """Meeting mode - simplified presentation view."""
-    stats = get_overview_stats()
-    categories = get_spending_by_category()
-    concerns = get_concerns()
+
+# Words that describe the request rather than narrow it ("tell me about the
+# work at Belleview Senior High")
+SUMMARY_FILLER = {
+    'work', 'info', 'information', 'detail', 'status', 'update', 'happening', 'going',
+    'senior', 'elementary', 'middle', 'high', 'school', 'elem', 'es', 'ms', 'hs',
+}
+
+
+@ask_intents.intent('entity_summary', entities=['school', 'vendor', 'project'])
+def answer_entity_summary(cursor, question, match):
+    scope, params = entity_scope(match.entities)
+    cursor.execute(f'''
+        SELECT contract_id, title, school_name, vendor_name, status, percent_complete, current_amount, is_delayed, is_over_budget
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND {scope}
+        ORDER BY current_amount DESC
+    ''', params)
+    rows = cursor.fetchall()
+    names = _entity_names(match.entities)
+
+    if not rows:
+        return {
+            'answer': f"I found {names}, but no surtax projects are linked to it.",
+            'suggestions': ['Show all projects', 'What is the total budget?']
+        }
+
+    # The rest of the question narrows the list ("roof work at Belleview"):
+    # only the entity's projects that match those terms are shown
+    exclude = SUMMARY_FILLER.union(*(tokenize(e.name) for e in match.entities))
+    terms = query_terms(cursor.connection, question, exclude)
+    if terms:
+        relevance = dict(search_projects(cursor.connection, ' '.join(terms), k=None))
+        rows = [row for row in rows if row['contract_id'] in relevance]
+        if not rows:
+            return {
+                'answer': f"None of the surtax projects at {names} match \"{' '.join(terms)}\".",
+                'suggestions': [f"Tell me about {match.entities[0].name}", f"Show {' '.join(terms)} projects"]
+            }
+        rows = sorted(rows, key=lambda row: -relevance[row['contract_id']])
+    rows = rows[:5]
+
+    projects = [
+        f"• {row['title'][:50]} ({row['status']}, {row['percent_complete'] or 0:.0f}% complete, ${row['current_amount'] or 0:,.0f})"
+        for row in rows
+    ]
+    return {
+        'answer': f"{names}:\n" + "\n".join(projects),
+        'data': [dict(row) for row in rows],
+        'suggestions': [f"Is {match.entities[0].name} behind schedule?", f"How much has {match.entities[0].name} spent?"]
+    }
+
+
+@ask_intents.intent('portfolio_summary', ['summary', 'overview', 'portfolio', 'status report'])
+def answer_portfolio_summary(cursor, question, match):
+    # Generator handler: the header goes out before any query runs, then one
+    # row per section as soon as it is computed
+    yield answer_header("Portfolio summary:")
+
+    cursor.execute('''
+        SELECT COUNT(*) as count,
+               COALESCE(SUM(current_amount), 0) as total_budget,
+               COALESCE(SUM(total_paid), 0) as total_spent,
+               COALESCE(SUM(is_delayed), 0) as delayed,
+               COALESCE(SUM(is_over_budget), 0) as over_budget
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''')
+    totals = cursor.fetchone()
+    pct = totals['total_spent'] / totals['total_budget'] * 100 if totals['total_budget'] else 0
+    yield answer_row(f"• Budget: ${totals['total_budget']:,.0f} across {totals['count']} projects, ${totals['total_spent']:,.0f} spent ({pct:.1f}%)", dict(totals))
+
+    cursor.execute('''
+        SELECT title, delay_days FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_delayed = 1
+        ORDER BY delay_days DESC
+        LIMIT 1
+    ''')
+    worst = cursor.fetchone()
+    schedule = f"• Schedule: {totals['delayed']} delayed"
+    if worst:
+        schedule += f" (longest: {worst['title'][:40]}, {worst['delay_days']} days)"
+    yield answer_row(schedule)
+    yield answer_row(f"• Cost: {totals['over_budget']} over budget")
+
+    compliance = compute_compliance(cursor.connection)
+    yield answer_row(f"• Compliance: {compliance['overall_score']}/100 ({compliance['overall_status']})")
+
+    ev = get_portfolio_earned_value(cursor.connection)['portfolio']
+    if ev['cpi'] is not None and ev['spi'] is not None:
+        yield answer_row(f"• Earned value: CPI {ev['cpi']:.2f}, SPI {ev['spi']:.2f}")
+
+    yield answer_suggestions(['What projects are delayed?', 'What projects are over budget?'])
+
+
+ask_intents.compile()
+
+
+def _planner_connection():
+    """Long-lived connection for the query planner pool; keeps statements prepared."""
+    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+query_planner = QueryPlanner(_planner_connection)
+
+
+def answer_from_plan(plan) -> dict:
+    """Answer a question the fixed intents can't, from a planned parameterized query."""
+    description = plan.describe()
+    try:
+        rows = query_planner.execute(plan)
+    except QueryCostExceeded:
+        return {
+            'answer': f"That question is too broad to answer quickly ({description}). Try narrowing it to a school, category or status.",
+            'suggestions': ['What projects are delayed?', 'Show spending by category'],
+            'intent': 'query'
+        }
+
+    if plan.template == 'aggregate':
+        row = rows[0]
+        pct = row['total_spent'] / row['total_budget'] * 100 if row['total_budget'] else 0
+        return {
+            'answer': f"{row['count']} surtax project{'s' if row['count'] != 1 else ''} ({description}) with a total budget of ${row['total_budget']:,.0f}. ${row['total_spent']:,.0f} has been spent ({pct:.1f}% of budget); {row['delayed']} delayed, {row['over_budget']} over budget.",
+            'data': dict(row),
+            'suggestions': ['What projects are delayed?', 'What projects are over budget?'],
+            'intent': 'query'
+        }
+
+    if not rows:
+        return {
+            'answer': f"No surtax projects match ({description}).",
+            'suggestions': ['Show all projects', 'What is the total budget?'],
+            'intent': 'query'
+        }
+    projects = [
+        f"• {row['title'][:50]} — {row['school_name'] or 'District-wide'} ({row['status']}, ${row['current_amount'] or 0:,.0f}"
+        + (f", {row['delay_days']} days late" if row['delay_days'] else '') + ')'
+        for row in rows
+    ]
+    heading = f"Top {len(rows)} projects" if len(rows) == plan.limit else f"{len(rows)} project{'s' if len(rows) != 1 else ''}"
+    return {
+        'answer': f"{heading} ({description}):\n" + "\n".join(projects),
+        'data': [dict(row) for row in rows],
+        'suggestions': ['What projects are delayed?', 'What projects are over budget?'],
+        'intent': 'query'
+    }
+
+
+# ==================
+# ASK AI FOLLOW-UPS
+# ==================
+# Follow-up questions ("Who is the contractor?") are answered from the
+# session's previous result rows (see utils/conversation.py). Handlers take
+# (conn, context, match); columns the previous answer didn't select are
+# fetched once by contract_id and kept on the stored rows.
+
+conversations = ConversationStore()
+followup_intents = IntentRegistry()
+
+
+def ask_session_id():
+    """Server-side conversation key for the current browser session."""
+    if 'ask_session' not in session:
+        session['ask_session'] = uuid.uuid4().hex
+    return session['ask_session']
+
+
+def _fetch_contract_columns(conn, contract_ids, columns):
+    """Fetch named columns (from the handlers' fixed lists) for contracts by id."""
+    placeholders = ','.join('?' * len(contract_ids))
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT contract_id, {', '.join(columns)} FROM contracts WHERE contract_id IN ({placeholders})",
+                   list(contract_ids))
+    return {row['contract_id']: dict(row) for row in cursor.fetchall()}
+
+
+def _context_rows(conn, context, columns):
+    """The previous result rows with the given columns filled in."""
+    if not context.rows and context.entities:
+        # Aggregate answers ("How much has Belleview spent?") kept no rows
+        scope, params = entity_scope(context.entities)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT contract_id FROM contracts
+            WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND {scope}
+            ORDER BY current_amount DESC
+        ''', params)
+        conversations.set_rows(context, result_rows([dict(row) for row in cursor.fetchall()]))
+    conversations.set_rows(context, context.hydrated(columns, lambda ids, missing: _fetch_contract_columns(conn, ids, missing)))
+    return context.rows
+
+
+@followup_intents.intent('followup_contractor', ['contractor', 'vendor', 'who is building', 'who built', 'builder'])
+def answer_followup_contractor(conn, context, match):
+    rows = _context_rows(conn, context, ['title', 'vendor_name'])
+    lines = [f"• {row['title'][:50]} — {row['vendor_name'] or 'contractor not recorded'}" for row in rows[:10]]
+    return {
+        'answer': "Contractors:\n" + "\n".join(lines),
+        'data': [{'contract_id': row['contract_id'], 'title': row['title'], 'vendor_name': row['vendor_name']} for row in rows[:10]],
+        'suggestions': ['Are there any change orders?', 'What is being done about it?']
+    }
+
+
+@followup_intents.intent('followup_actions', ['being done', 'doing about', 'causing', 'cause', 'reason', 'plan to fix', 'next steps'])
+def answer_followup_actions(conn, context, match):
+    rows = _context_rows(conn, context, ['title', 'status', 'delay_reason', 'watchlist_reason', 'committee_notes'])
+    lines = []
+    for row in rows[:10]:
+        notes = [n for n in (row['delay_reason'], row['watchlist_reason'], row['committee_notes']) if n]
+        lines.append(f"• {row['title'][:50]} ({row['status']}): {'; '.join(notes) if notes else 'no corrective action recorded'}")
+    return {
+        'answer': "What the records show:\n" + "\n".join(lines),
+        'data': [{k: row[k] for k in ('contract_id', 'title', 'delay_reason', 'watchlist_reason', 'committee_notes')} for row in rows[:10]],
+        'suggestions': ['Who is the contractor?', 'Are there any change orders?']
+    }
+
+
+@followup_intents.intent('followup_change_orders', ['change orders', 'change order'])
+def answer_followup_change_orders(conn, context, match):
+    rows = _context_rows(conn, context, ['title', 'change_order_count', 'total_change_order_amount'])
+    lines = [
+        f"• {row['title'][:50]}: {row['change_order_count'] or 0} change order{'s' if row['change_order_count'] != 1 else ''} (${row['total_change_order_amount'] or 0:,.0f})"
+        for row in rows[:10]
+    ]
+    return {
+        'answer': "Change orders:\n" + "\n".join(lines),
+        'data': [{k: row[k] for k in ('contract_id', 'title', 'change_order_count', 'total_change_order_amount')} for row in rows[:10]],
+        'suggestions': ['Who is the contractor?', 'What is being done about it?']
+    }
+
+
+@followup_intents.intent('followup_details', ['details', 'tell me more', 'more about'])
+def answer_followup_details(conn, context, match):
+    rows = _context_rows(conn, context, ['title', 'school_name', 'status', 'percent_complete', 'current_amount', 'current_end_date'])
+    lines = [
+        f"• {row['title'][:50]} — {row['school_name'] or 'District-wide'} ({row['status']}, {row['percent_complete'] or 0:.0f}% complete, ${row['current_amount'] or 0:,.0f}, due {row['current_end_date'] or 'TBD'})"
+        for row in rows[:10]
+    ]
+    return {
+        'answer': "Project details:\n" + "\n".join(lines),
+        'data': [dict(row) for row in rows[:10]],
+        'suggestions': ['Who is the contractor?', 'Are there any change orders?']
+    }
+
+
+followup_intents.compile()
+
+
+def answer_followup(conn, question: str, context):
+    """
+    Answer a normalized follow-up from the session context, or return None.
+
+    A question is a follow-up only if it names no entity of its own and no
+    regular intent claims it.
+    """
+    if context is None or not (context.rows or context.entities):
+        return None
+    match = followup_intents.match(question)
+    if match is None or extract_entities(conn, question) or ask_intents.match(question) is not None:
+        return None
+    if not _context_rows(conn, context, []):
+        return None
+    response = match.intent.handler(conn, context, match)
+    response['intent'] = match.name
+    return response
+
+
+def remember_answer(conn, session_id, question: str, response: dict, version):
+    """Keep an answer's entities and result rows as the session's context."""
+    entities = [m.entity for m in extract_entities(conn, question)]
+    conversations.remember(session_id, ConversationContext(
+        question, response.get('intent'), entities, result_rows(response.get('data')), version
+    ))
+
+
+@app.route('/api/ask/stream', methods=['POST'])
+def api_ask_stream():
+    """Streaming variant of /api/ask: NDJSON header, rows, suggestions, done."""
+    data = request.get_json()
+    question = data.get('question', '').strip()
+
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+
+    normalized = normalize_question(question)
+    session_id = ask_session_id()
+
+    def generate():
+        conn = get_db()
+        try:
+            version = get_data_version(conn)
+            followup = answer_followup(conn, normalized, conversations.get(session_id, version))
+            if followup is not None:
+                for event in response_parts(followup):
+                    yield to_ndjson(event)
+                yield to_ndjson({'type': 'done', 'cached': False})
+                return
+
+            cached = stored_answer(conn, normalized, version)
+            if cached is not None:
+                response = cached
+                for event in response_parts(cached):
+                    yield to_ndjson(event)
+            else:
+                events = []
+                for event in question_parts(normalized, conn):
+                    events.append(event)
+                    yield to_ndjson(event)
+                response = collect_parts(events)
+                cache_answer(normalized, version, response)
+            remember_answer(conn, session_id, normalized, response, version)
+            yield to_ndjson({'type': 'done', 'cached': cached is not None})
+        finally:
+            conn.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/ask/stats')
+def api_ask_stats():
+    """Hit-rate metrics for the Ask AI answer cache, query planner and conversations."""
+    return jsonify(dict(ask_cache_stats(), planner=query_planner.stats(), conversations=conversations.stats()))
+
+
+def question_parts(question: str, conn):
+    """
+    Yield the answer to a normalized question as stream events.
+
+    Dict-returning handlers are split into header/rows/suggestions;
+    generator handlers stream their events as they produce them.
+    """
+    guided = _guided_builder_by_key.get(question)
+    if guided is not None:
+        # Guided prompt clicked before the background refresh caught up
+        yield from response_parts(dict(guided(conn), intent='guided'))
+        return
+
+    mentions = extract_entities(conn, question)
+    match = ask_intents.match(question, mentions)
+
+    # A question with more conditions than any fixed intent understands
+    # ("delayed projects at Forest High over $1M") goes to the planner
+    plan = plan_question(question, mentions)
+    if plan is not None and plan.constraints > (match.constraints if match else 0):
+        yield from response_parts(answer_from_plan(plan))
+        return
+
+    if match is None:
+        yield from response_parts(answer_from_search(conn, question))
+        return
+
+    result = match.intent.handler(conn.cursor(), question, match)
+    if isinstance(result, dict):
+        result['intent'] = match.name
+        yield from response_parts(result)
+        return
+    for event in result:
+        if event['type'] == 'header':
+            event['intent'] = match.name
+        yield event
+
+
+def process_question(question: str, conn=None) -> dict:
+    """
+    Process a natural language question and return an answer.
+
+    Matching and handlers see the normalized question, so every question
+    that shares an answer-cache key gets the same answer.
+    """
+    question = normalize_question(question)
+
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        return collect_parts(question_parts(question, conn))
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def answer_from_search(conn, question: str) -> dict:
+    """Fallback: answer with the most relevant projects from the local TF-IDF index."""
+    results = search_projects(conn, question, k=5)
+    if not results:
+        return {
+            'answer': "I'm not sure how to answer that. Try asking about:\n• Total budget or spending\n• Delayed projects\n• Projects over budget\n• Specific schools or projects\n• Spending by category",
+            'suggestions': ['What is the total budget?', 'Are any projects delayed?', 'Show spending by category']
+        }
+
+    scores = dict(results)
+    placeholders = ','.join('?' * len(results))
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT contract_id, title, school_name, status, percent_complete, current_amount
+        FROM contracts
+        WHERE contract_id IN ({placeholders})
+    ''', list(scores))
+    rows = sorted(cursor.fetchall(), key=lambda row: -scores[row['contract_id']])
+
+    projects = [
+        f"• {row['title'][:50]} — {row['school_name'] or 'District-wide'} ({row['status']}, {row['percent_complete'] or 0:.0f}% complete)"
+        for row in rows
+    ]
+    return {
+        'answer': "These projects look most relevant:\n" + "\n".join(projects),
+        'data': [dict(row, score=round(scores[row['contract_id']], 3)) for row in rows],
+        'suggestions': ['What projects are delayed?', 'What projects are over budget?'],
+        'intent': 'search'
+    }
+
+
+# ==================
+# GUIDED PROMPT ANSWERS
+# ==================
+# Structured answers for the committee's GUIDED_AI_PROMPTS, keyed by prompt
+# category. They are precomputed on every data-version change (see
+# utils/guided_answers.py) so a click is a single keyed read.
+
+def _surtax_revenue_by_year(cursor):
+    cursor.execute('''
+        SELECT fiscal_year, SUM(total_amount) as collected
+        FROM revenues_summary
+        WHERE account_name LIKE '%Surtax%'
+        GROUP BY fiscal_year
+        ORDER BY fiscal_year
+    ''')
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def guided_revenue(conn):
+    cursor = conn.cursor()
+    revenue = _surtax_revenue_by_year(cursor)
+    stats = get_overview_stats()
+
+    lines = ["Surtax revenue vs. program commitments:"]
+    for prior, current in zip(revenue, revenue[1:]):
+        change = (current['collected'] - prior['collected']) / prior['collected'] * 100 if prior['collected'] else 0
+        lines.append(f"• FY{current['fiscal_year']}: ${current['collected']:,.0f} collected ({change:+.1f}% vs FY{prior['fiscal_year']})")
+    if len(revenue) == 1:
+        lines.append(f"• FY{revenue[0]['fiscal_year']}: ${revenue[0]['collected']:,.0f} collected (no prior year on file to compare)")
+    if not revenue:
+        lines.append("• No surtax revenue lines have been imported yet")
+    lines.append(f"• Program budget ${stats['total_budget']:,.0f}; ${stats['total_spent']:,.0f} spent, ${stats['total_remaining']:,.0f} remaining")
+    if revenue and revenue[-1]['collected']:
+        years = stats['total_remaining'] / revenue[-1]['collected']
+        lines.append(f"• At the latest collection rate, remaining commitments equal {years:.1f} years of surtax revenue")
+
+    return {
+        'answer': "\n".join(lines),
+        'data': {'revenue': revenue, 'budget': stats['total_budget'], 'spent': stats['total_spent']},
+        'suggestions': ['Explain forecast & contingency', 'What projects are delayed?']
+    }
+
+
+def guided_compliance(conn):
+    compliance = compute_compliance(conn)
+    funds = next(c for c in compliance['categories'] if c['key'] == 'funds')
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.surtax_category, COUNT(*) as count, SUM(c.current_amount) as total,
+               MAX(sc.ballot_language) as ballot_language
+        FROM contracts c
+        LEFT JOIN surtax_categories sc ON sc.category_id = c.surtax_category
+        WHERE c.is_deleted = 0 AND c.surtax_category IS NOT NULL
+        GROUP BY c.surtax_category
+        ORDER BY total DESC
+    ''')
+    categories = [dict(row) for row in cursor.fetchall()]
+
+    lines = [f"Use of funds scores {funds['score']}/100 ({funds['status']}); overall compliance {compliance['overall_score']}/100."]
+    for cat in categories:
+        language = f" — ballot: \"{cat['ballot_language']}\"" if cat['ballot_language'] else " — not mapped to ballot language"
+        lines.append(f"• {cat['surtax_category']}: ${cat['total']:,.0f} ({cat['count']} projects){language}")
+    lines += [f"• {rec}" for rec in funds['recommendations']]
+
+    return {
+        'answer': "\n".join(lines),
+        'data': {'overall_score': compliance['overall_score'], 'funds_score': funds['score'], 'categories': categories},
+        'suggestions': ['Show spending by category', 'Highlight top 3 risks']
+    }
+
+
+def guided_delays(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT contract_id, title, school_name, delay_days, delay_reason, current_end_date, percent_complete
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_delayed = 1
+        ORDER BY delay_days DESC
+    ''')
+    rows = [dict(row) for row in cursor.fetchall()]
+    if not rows:
+        return {'answer': "No projects are currently behind schedule.", 'suggestions': ['Identify projects over budget']}
+
+    lines = [f"{len(rows)} projects are behind schedule:"]
+    for r in rows:
+        lines.append(f"• {r['title'][:50]}: {r['delay_days']} days late, now due {r['current_end_date'] or 'TBD'} — cause: {r['delay_reason'] or 'not recorded'}")
+    return {
+        'answer': "\n".join(lines),
+        'data': rows,
+        'suggestions': ['Why is the high school delayed?', 'Highlight top 3 risks']
+    }
+
+
+def guided_overruns(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT contract_id, title, original_amount, current_amount, budget_variance_pct,
+               change_order_count, total_change_order_amount
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND is_over_budget = 1
+        ORDER BY budget_variance_pct DESC
+    ''')
+    over = [dict(row) for row in cursor.fetchall()]
+    ev = get_portfolio_earned_value(conn)['projects']
+    trending = [
+        {'contract_id': cid, 'cpi': m['cpi'], 'eac': m['eac'], 'bac': m['bac']}
+        for cid, m in ev.items()
+        if m['cpi'] is not None and m['cpi'] < 0.9 and cid not in {r['contract_id'] for r in over}
+    ]
+
+    lines = [f"{len(over)} projects are over budget and {len(trending)} more are trending toward an overrun (CPI < 0.9):"]
+    for r in over:
+        lines.append(f"• {r['title'][:50]}: +{r['budget_variance_pct']:.1f}% (${r['current_amount'] - r['original_amount']:,.0f}), {r['change_order_count'] or 0} change orders")
+    if trending:
+        cursor.execute(f'''
+            SELECT contract_id, title FROM contracts
+            WHERE contract_id IN ({','.join('?' * len(trending))})
+        ''', [t['contract_id'] for t in trending])
+        titles = {row['contract_id']: row['title'] for row in cursor.fetchall()}
+        for t in sorted(trending, key=lambda t: t['cpi'])[:5]:
+            lines.append(f"• {titles.get(t['contract_id'], t['contract_id'])[:50]}: CPI {t['cpi']:.2f}, forecast ${t['eac']:,.0f} vs ${t['bac']:,.0f} budget")
+
+    return {
+        'answer': "\n".join(lines),
+        'data': {'over_budget': over, 'trending': trending},
+        'suggestions': ['What is causing these overruns?', 'Compare revenue to projections']
+    }
+
+
+def guided_meeting_summary(conn):
+    stats = get_overview_stats()
+    concerns = get_concerns()
+    high = [c for c in concerns if c['severity'] == 'High']
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT title, status, percent_complete FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND status = 'Active'
+        ORDER BY current_amount DESC
+        LIMIT 3
+    ''')
+    major = [dict(row) for row in cursor.fetchall()]
+
+    lines = [
+        "Executive summary:",
+        f"• Financials: ${stats['total_spent']:,.0f} of ${stats['total_budget']:,.0f} spent ({stats['percent_spent']:.1f}%) across {stats['total_projects']} projects",
+        "• Project updates: " + ("; ".join(f"{p['title'][:35]} {p['percent_complete'] or 0:.0f}%" for p in major) or "no active projects"),
+        f"• Needs attention: {len(high)} high-severity concerns" + (f", led by {high[0]['title'][:40]} ({high[0]['detail']})" if high else ""),
+    ]
+    return {
+        'answer': "\n".join(lines),
+        'data': {'stats': stats, 'major_projects': major, 'high_concerns': high},
+        'suggestions': ['Highlight top 3 risks', 'Explain projects behind schedule']
+    }
+
+
+def guided_transparency(conn):
+    compliance = compute_compliance(conn)
+    card = next(c for c in compliance['categories'] if c['key'] == 'transparency')
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT COUNT(*) as meetings, COALESCE(SUM(attendees), 0) as attendees,
+               COUNT(DISTINCT contract_id) as projects, MAX(meeting_date) as last_meeting
+        FROM community_engagement
+    ''')
+    engagement = dict(cursor.fetchone())
+    cursor.execute('''
+        SELECT COUNT(*) FROM contracts c
+        WHERE c.is_deleted = 0 AND c.surtax_category IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM community_engagement ce WHERE ce.contract_id = c.contract_id)
+    ''')
+    no_outreach = cursor.fetchone()[0]
+
+    lines = [f"Transparency & reporting scores {card['score']}/100 ({card['status']}):"]
+    lines += [f"• {m['label']}: {m['value']}" for m in card['metrics']]
+    lines.append(f"• Community meetings: {engagement['meetings']} covering {engagement['projects']} projects, {engagement['attendees']:,} attendees (latest {engagement['last_meeting'] or 'n/a'})")
+    lines.append(f"• Gap: {no_outreach} surtax projects have no recorded community engagement")
+    return {
+        'answer': "\n".join(lines),
+        'data': {'score': card['score'], 'engagement': engagement, 'projects_without_outreach': no_outreach},
+        'suggestions': ['Turn into public summary', 'Verify ballot language compliance']
+    }
+
+
+def guided_forecast(conn):
+    cursor = conn.cursor()
+    revenue = _surtax_revenue_by_year(cursor)
+    ev = get_portfolio_earned_value(conn)['portfolio']
+    stats = get_overview_stats()
+
+    lines = ["Revenue forecast & contingency:"]
+    if revenue:
+        latest = revenue[-1]
+        lines.append(f"• Latest collections: ${latest['collected']:,.0f} (FY{latest['fiscal_year']}); multi-year history on file: {len(revenue)} year(s)")
+    else:
+        lines.append("• No surtax revenue history has been imported")
+    lines.append(f"• Remaining program commitments: ${stats['total_remaining']:,.0f}")
+    if ev['cpi']:
+        lines.append(f"• Estimate at completion ${ev['eac']:,.0f} vs ${ev['bac']:,.0f} budget (CPI {ev['cpi']:.2f}); variance ${ev['vac']:,.0f}")
+    if revenue and revenue[-1]['collected']:
+        shortfall = revenue[-1]['collected'] * 0.9
+        lines.append(f"• A 10% collection shortfall would leave ${shortfall:,.0f}/yr, extending the payback of remaining commitments to {stats['total_remaining'] / shortfall:.1f} years")
+    return {
+        'answer': "\n".join(lines),
+        'data': {'revenue': revenue, 'earned_value': ev, 'remaining': stats['total_remaining']},
+        'suggestions': ['Compare revenue to projections', 'Identify projects over budget']
+    }
+
+
+def guided_vendors(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT c.vendor_id, MAX(c.vendor_name) as vendor_name, COUNT(*) as contracts,
+               SUM(c.current_amount) as total_value, SUM(c.is_delayed) as delayed,
+               SUM(c.change_order_count) as change_orders,
+               MAX(cp.quality_score) as quality_score, MAX(cp.deficiency_rate) as deficiency_rate,
+               MAX(cp.safety_record) as safety_record
+        FROM contracts c
+        LEFT JOIN contractor_performance cp ON cp.vendor_id = c.vendor_id
+        WHERE c.is_deleted = 0 AND c.surtax_category IS NOT NULL AND c.vendor_id IS NOT NULL
+        GROUP BY c.vendor_id
+        ORDER BY total_value DESC
+        LIMIT 5
+    ''')
+    vendors = [dict(row) for row in cursor.fetchall()]
+
+    lines = ["Top contractors by contract value:"]
+    for v in vendors:
+        quality = f"quality {v['quality_score']}/5" if v['quality_score'] is not None else "no quality rating"
+        lines.append(f"• {v['vendor_name']}: {v['contracts']} contracts, ${v['total_value']:,.0f}; {quality}, {v['delayed'] or 0} delayed, {v['change_orders'] or 0} change orders")
+    return {
+        'answer': "\n".join(lines),
+        'data': vendors,
+        'suggestions': ['Identify projects over budget', 'Highlight top 3 risks']
+    }
+
+
+def guided_risks(conn):
+    severity_rank = {'High': 0, 'Medium': 1, 'Low': 2}
+    concerns = sorted(get_concerns(), key=lambda c: (severity_rank.get(c['severity'], 3), -(c['value'] or 0)))[:3]
+
+    lines = ["Top 3 program risks:"]
+    for c in concerns:
+        lines.append(f"• [{c['severity']}] {c['type']}: {c['title'][:45]} — {c['detail']}")
+    if not concerns:
+        lines.append("• No open risks detected")
+    return {
+        'answer': "\n".join(lines),
+        'data': concerns,
+        'suggestions': [c['suggested_question'] for c in concerns][:2] or ['Prepare 3-bullet meeting summary']
+    }
+
+
+def guided_public_summary(conn):
+    stats = get_overview_stats()
+    compliance = compute_compliance(conn)
+    lines = [
+        "Your school surtax at work:",
+        f"• {stats['total_projects']} projects funded, with ${stats['total_budget']:,.0f} committed to school facilities",
+        f"• {stats['completed_projects']} projects completed and {stats['active_projects']} under way",
+        f"• ${stats['total_spent']:,.0f} spent so far ({stats['percent_spent']:.0f}% of the program)",
+        f"• {stats['on_track_projects']} active projects on schedule; {stats['delayed_projects']} being monitored for delays",
+        f"• Independent compliance review score: {compliance['overall_score']}/100",
+    ]
+    return {
+        'answer': "\n".join(lines),
+        'data': stats,
+        'suggestions': ['Review public communication efforts', 'Prepare 3-bullet meeting summary']
+    }
+
+
+# GUIDED_AI_PROMPTS category -> answer builder
+GUIDED_ANSWER_BUILDERS = {
+    'Financial Oversight': guided_revenue,
+    'Compliance': guided_compliance,
+    'Project Status': guided_delays,
+    'Budget Concerns': guided_overruns,
+    'Meeting Prep': guided_meeting_summary,
+    'Public Transparency': guided_transparency,
+    'Financial Planning': guided_forecast,
+    'Vendor Oversight': guided_vendors,
+    'Risk Assessment': guided_risks,
+    'Public Communication': guided_public_summary,
+}
+
+_guided_builder_by_key = {
+    guided_prompt_key(p['prompt']): GUIDED_ANSWER_BUILDERS[p['category']]
+    for p in GUIDED_AI_PROMPTS if p['category'] in GUIDED_ANSWER_BUILDERS
+}
+
+
+def refresh_guided_prompt_answers(force=False):
+    """Precompute guided answers if the data version has changed."""
+    conn = get_db()
+    try:
+        return refresh_guided_answers(conn, GUIDED_AI_PROMPTS, GUIDED_ANSWER_BUILDERS, force=force)
+    finally:
+        conn.close()
+
+
+def stored_answer(conn, normalized, version):
+    """Precomputed guided answer or answer-cache hit for a normalized question."""
+    if normalized in _guided_builder_by_key:
+        response = get_guided_answer(conn, normalized, version)
+        if response is not None:
+            return response
+    return get_cached_answer(normalized, version)
+
+
+
+# ==================
+# ANNUAL REPORT & MEETING MODE
+# ==================
+
+def get_report_data(fiscal_year=None):
+    """
+    Compute the annual report for one fiscal year (all years if None).
+
+    This is the expensive path; the report views serve materialized
+    snapshots from get_annual_report() instead.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year)
+
+    report = {
+        'generated_at': datetime.now(),
+        'fiscal_year': f"FY {fiscal_year}" if fiscal_year else 'All Fiscal Years',
+        'fiscal_year_number': fiscal_year,
+    }
+
+    # Overall stats
+    report['stats'] = get_overview_stats(fiscal_year)
+    report['categories'] = get_spending_by_category(fiscal_year)
+    report['concerns'] = get_concerns(fiscal_year)
+
+    # Projects by status
+    cursor.execute('''
+        SELECT status, COUNT(*) as count, SUM(current_amount) as total
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + year_sql + '''
+        GROUP BY status
+    ''', year_params)
+    report['by_status'] = [dict(row) for row in cursor.fetchall()]
+
+    # Top 10 projects by budget
+    cursor.execute('''
+        SELECT contract_id, title, school_name, surtax_category, current_amount,
+               total_paid, percent_complete, status, is_delayed, is_over_budget
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + year_sql + '''
+        ORDER BY current_amount DESC
+        LIMIT 10
+    ''', year_params)
+    report['top_projects'] = [dict(row) for row in cursor.fetchall()]
+
+    # Completed projects this period
+    cursor.execute('''
+        SELECT contract_id, title, school_name, current_amount, total_paid
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND status = 'Completed'
+    ''' + year_sql + '''
+        ORDER BY current_end_date DESC
+        LIMIT 10
+    ''', year_params)
+    report['completed_projects'] = [dict(row) for row in cursor.fetchall()]
+
+    # Change orders summary
+    cursor.execute('''
+        SELECT COUNT(*) as total_cos,
+               SUM(total_change_order_amount) as total_co_amount,
+               AVG(change_order_count) as avg_cos_per_project
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND change_order_count > 0
+    ''' + year_sql, year_params)
+    co_row = cursor.fetchone()
+    report['change_orders'] = {
+        'total_count': co_row['total_cos'] or 0,
+        'total_amount': co_row['total_co_amount'] or 0,
+        'avg_per_project': co_row['avg_cos_per_project'] or 0
+    }
+
+    # Compliance checklist
+    report['compliance'] = {
+        'funds_for_listed_purposes': True,  # Would need actual verification
+        'no_salary_expenditures': True,
+        'annual_audit_completed': False,  # Placeholder
+        'performance_audit_completed': False,
+        'public_meetings_held': True,
+        'annual_report_issued': False
+    }
+
+    conn.close()
+    return report
+
+
+def get_report_fiscal_years():
+    """Fiscal years that have surtax projects, plus the current one, newest first."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT DISTINCT fiscal_year FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND fiscal_year IS NOT NULL
+    ''')
+    years = {int(row['fiscal_year']) for row in cursor.fetchall()}
+    conn.close()
+    years.add(current_fiscal_year())
+    return sorted(years, reverse=True)
+
+
+def get_annual_report(fiscal_year):
+    """
+    Serve a fiscal year's report from its materialized snapshot.
+
+    A snapshot is written only when none exists, the year has just become
+    final, or an open year's data has changed (see snapshot_needed).
+    """
+    conn = get_db()
+    try:
+        latest = get_report_snapshot(conn, fiscal_year)
+        reason = snapshot_needed(conn, fiscal_year, latest)
+        if reason is None:
+            return latest
+
+        report = get_report_data(fiscal_year)
+        try:
+            version = save_report_snapshot(conn, fiscal_year, report, reason, is_final=(reason == 'final'))
+            logger.info(f'Materialized FY {fiscal_year} report v{version} ({reason})')
+        except sqlite3.IntegrityError:
+            # Another request materialized the same version first
+            pass
+        return get_report_snapshot(conn, fiscal_year)
+    finally:
+        conn.close()
+
+
+def regenerate_annual_report(fiscal_year):
+    """
+    Explicitly rebuild a fiscal year's report as a new snapshot version.
+
+    Returns:
+        (new report, list of changes from the previous version)
+    """
+    conn = get_db()
+    try:
+        previous = get_report_snapshot(conn, fiscal_year)
+        version = save_report_snapshot(conn, fiscal_year, get_report_data(fiscal_year), 'regenerated',
+                                       is_final=fiscal_year_is_final(fiscal_year))
+        current = get_report_snapshot(conn, fiscal_year, version)
+        logger.info(f'Regenerated FY {fiscal_year} report as v{version}')
+        return current, diff_reports(previous, current) if previous else []
+    finally:
+        conn.close()
+
+
+@app.route('/report')
+def annual_report():
+    """Annual report generator page."""
+    report = get_annual_report(requested_fiscal_year(default=current_fiscal_year()))
+
+    return render_template('surtax/report.html',
+                          report=report,
+                          fiscal_years=get_report_fiscal_years(),
+                          title='Annual Report')
+
+
+@app.route('/report/print')
+def annual_report_print():
+    """Print-friendly version of annual report."""
+    report = get_annual_report(requested_fiscal_year(default=current_fiscal_year()))
+
+    return render_template('surtax/report_print.html',
+                          report=report,
+                          title='Annual Report - Print View')
+
+
+@app.route('/api/report/snapshots')
+def api_report_snapshots():
+    """Snapshot versions, optionally for one fiscal year (?fy=2025)."""
+    conn = get_db()
+    try:
+        return jsonify(list_report_snapshots(conn, request.args.get('fy', type=int)))
+    finally:
+        conn.close()
+
+
+@app.route('/api/report/snapshots/<int:fiscal_year>/regenerate', methods=['POST'])
+def api_regenerate_report(fiscal_year):
+    """Rebuild a fiscal year's report as a new version and return the diff."""
+    report, changes = regenerate_annual_report(fiscal_year)
+    return jsonify({'fiscal_year': fiscal_year, 'snapshot': report['snapshot'], 'changes': changes})
+
+
+@app.route('/api/report/snapshots/<int:fiscal_year>/diff')
+def api_report_diff(fiscal_year):
+    """Changes between two versions (?from=1&to=2, defaults to the last two)."""
+    conn = get_db()
+    try:
+        to_version = request.args.get('to', type=int)
+        new = get_report_snapshot(conn, fiscal_year, to_version)
+        if new is None:
+            return jsonify({'error': f'No FY {fiscal_year} report snapshot'}), 404
+        from_version = request.args.get('from', type=int) or new['snapshot']['version'] - 1
+        old = get_report_snapshot(conn, fiscal_year, from_version)
+        if old is None:
+            return jsonify({'error': f'No FY {fiscal_year} report version {from_version}'}), 404
+    finally:
+        conn.close()
+
+    return jsonify({
+        'fiscal_year': fiscal_year,
+        'from': from_version,
+        'to': new['snapshot']['version'],
+        'changes': diff_reports(old, new)
+    })
+
+
+@app.cli.command('report-snapshot')
+@click.argument('fiscal_year', type=int, required=False)
+@click.option('--regenerate', is_flag=True, help='Write a new version even if the current one is up to date')
+def report_snapshot_command(fiscal_year, regenerate):
+    """Materialize (or regenerate) a fiscal year's annual report snapshot."""
+    fiscal_year = fiscal_year or current_fiscal_year()
+    if not regenerate:
+        report = get_annual_report(fiscal_year)
+        print(f"[OK] FY {fiscal_year} report v{report['snapshot']['version']} ({report['snapshot']['reason']})")
+        return
+
+    report, changes = regenerate_annual_report(fiscal_year)
+    print(f"[OK] Regenerated FY {fiscal_year} report as v{report['snapshot']['version']}: {len(changes)} change(s)")
+    for change in changes:
+        print(f"  {change['path']}: {change['old']!r} -> {change['new']!r}")
+
+
+# ==================
+# REPORT RENDER JOBS
+# ==================
+# Print-ready report artifacts are rendered by a small worker pool (see
+# utils/jobs.py) instead of in the request thread. Artifacts are keyed by
+# fiscal year and data version, so repeat exports reuse the finished file.
+
+def render_report_print_html(fiscal_year):
+    """Render report_print.html outside a request (used by job workers)."""
+    with app.test_request_context(f'/report/print?fy={fiscal_year}'):
+        return render_template('surtax/report_print.html',
+                              report=get_annual_report(fiscal_year),
+                              title='Annual Report - Print View')
+
+
+def render_report_html_job(params, path):
+    path.write_text(render_report_print_html(params['fiscal_year']), encoding='utf-8')
+
+
+def render_report_pdf_job(params, path):
+    """Print the report to PDF with a local headless Chromium (playwright)."""
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise RuntimeError('PDF rendering requires playwright: pip install playwright && playwright install chromium')
+
+    html = render_report_print_html(params['fiscal_year'])
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        try:
+            page = browser.new_page()
+            page.set_content(html, wait_until='networkidle')
+            page.pdf(path=str(path), format='Letter', print_background=True)
+        finally:
+            browser.close()
+
+
+def render_report_xlsx_job(params, path):
+    """Every report section as its own sheet (write-only openpyxl workbook)."""
+    if not report_workbook_available():
+        raise RuntimeError('Excel export requires openpyxl: pip install openpyxl')
+    write_report_workbook(get_annual_report(params['fiscal_year']), path)
+
+
+def _jobs_connection():
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+report_jobs = JobQueue(_jobs_connection, {
+    'report_html': ('html', render_report_html_job),
+    'report_pdf': ('pdf', render_report_pdf_job),
+    'report_xlsx': ('xlsx', render_report_xlsx_job),
+})
+
+REPORT_JOB_FORMATS = {'html': 'report_html', 'pdf': 'report_pdf', 'xlsx': 'report_xlsx'}
+
+
+def _job_status(job):
+    status = {k: job[k] for k in ('job_id', 'kind', 'params', 'status', 'error', 'created_at', 'started_at', 'finished_at')}
+    status['status_url'] = url_for('api_job_status', job_id=job['job_id'])
+    if job['status'] == 'done':
+        status['artifact_url'] = url_for('api_job_artifact', job_id=job['job_id'])
+    return status
+
+
+@app.route('/api/jobs/report', methods=['POST'])
+def api_submit_report_job():
+    """Queue a report render. Body/query: fy, format (html, pdf or xlsx)."""
+    data = request.get_json(silent=True) or request.form
+    fmt = data.get('format', request.args.get('format', 'pdf'))
+    if fmt not in REPORT_JOB_FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
+    fy = data.get('fy') or request.args.get('fy')
+    try:
+        fiscal_year = int(fy) if fy else current_fiscal_year()
+    except (TypeError, ValueError):
+        return jsonify({'error': f'Invalid fiscal year: {fy}'}), 400
+
+    conn = get_db()
+    try:
+        version = get_data_version(conn)
+    finally:
+        conn.close()
+
+    kind = REPORT_JOB_FORMATS[fmt]
+    job = report_jobs.submit(kind, {'fiscal_year': fiscal_year}, f'{kind}:fy{fiscal_year}:v{version}')
+    return jsonify(_job_status(job)), 200 if job['status'] == 'done' else 202
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Poll a background job."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_status(job))
+
+
+@app.route('/api/jobs/<job_id>/artifact')
+def api_job_artifact(job_id):
+    """Download a finished job's artifact."""
+    job = report_jobs.get(job_id)
+    if job is None or job['status'] != 'done' or not Path(job['artifact_path']).exists():
+        return jsonify({'error': 'Artifact not available'}), 404
+    fiscal_year = job['params'].get('fiscal_year')
+    extension = Path(job['artifact_path']).suffix
+    return send_file(job['artifact_path'], as_attachment=extension != '.html',
+                     download_name=f'surtax_annual_report_FY{fiscal_year}{extension}')
+
+
+@app.route('/meeting')
+def meeting_mode():
+    """Meeting mode - simplified presentation view."""
+    fiscal_year = requested_fiscal_year()
+    stats = get_overview_stats(fiscal_year)
+    categories = get_spending_by_category(fiscal_year)
+    concerns = get_concerns(fiscal_year)
 
     # Generate suggested agenda items based on current data
     agenda_items = []
@@ -1159,10 +2370,11 @@ def meeting_mode():
 def meeting_present():
     """Full-screen presentation mode for meetings."""
     slide = request.args.get('slide', '1')
+    fiscal_year = requested_fiscal_year()
 
-    stats = get_overview_stats()
-    categories = get_spending_by_category()
-    concerns = get_concerns()
+    stats = get_overview_stats(fiscal_year)
+    categories = get_spending_by_category(fiscal_year)
+    concerns = get_concerns(fiscal_year)
 
     # Build slides
     slides = [
@@ -1233,165 +2445,10 @@ def meeting_present():
 # COMPLIANCE DASHBOARD
 # ==================
 
-def get_compliance_data():
-    """Get comprehensive compliance tracking data."""
+def get_compliance_data(scorers=None, fiscal_year=None):
+    """Get comprehensive compliance tracking data, optionally for one fiscal year."""
     conn = get_db()
-    cursor = conn.cursor()
-
-    compliance = {
-        'generated_at': datetime.now(),
-        'overall_score': 0,
-        'categories': []
-    }
-
-    # 1. Financial Compliance
-    cursor.execute('''
-        SELECT
-            COUNT(*) as total,
-            SUM(current_amount) as total_budget,
-            SUM(total_paid) as total_spent,
-            COUNT(CASE WHEN is_over_budget = 1 THEN 1 END) as over_budget_count
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-    ''')
-    fin = cursor.fetchone()
-
-    over_budget_pct = (fin['over_budget_count'] / fin['total'] * 100) if fin['total'] > 0 else 0
-    financial_score = max(0, 100 - (over_budget_pct * 5))  # Deduct 5 points per percent over budget
-
-    compliance['categories'].append({
-        'name': 'Financial Management',
-        'icon': 'currency-dollar',
-        'score': int(financial_score),
-        'status': 'good' if financial_score >= 80 else 'warning' if financial_score >= 60 else 'critical',
-        'metrics': [
-            {'label': 'Total Budget', 'value': f"${fin['total_budget']:,.0f}" if fin['total_budget'] else '$0'},
-            {'label': 'Total Spent', 'value': f"${fin['total_spent']:,.0f}" if fin['total_spent'] else '$0'},
-            {'label': 'Over Budget Projects', 'value': f"{fin['over_budget_count'] or 0} of {fin['total'] or 0}"},
-            {'label': 'Budget Variance Rate', 'value': f"{over_budget_pct:.1f}%"}
-        ],
-        'recommendations': [
-            'Continue monitoring projects approaching budget limits',
-            'Review change order approval processes'
-        ] if over_budget_pct > 10 else ['All projects within acceptable budget variance']
-    })
-
-    # 2. Schedule Compliance
-    cursor.execute('''
-        SELECT
-            COUNT(*) as total,
-            COUNT(CASE WHEN is_delayed = 1 THEN 1 END) as delayed_count,
-            AVG(CASE WHEN is_delayed = 1 THEN delay_days ELSE 0 END) as avg_delay
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND status = 'Active'
-    ''')
-    sched = cursor.fetchone()
-
-    delayed_pct = (sched['delayed_count'] / sched['total'] * 100) if sched['total'] > 0 else 0
-    schedule_score = max(0, 100 - (delayed_pct * 3))  # Deduct 3 points per percent delayed
-
-    compliance['categories'].append({
-        'name': 'Schedule Performance',
-        'icon': 'clock',
-        'score': int(schedule_score),
-        'status': 'good' if schedule_score >= 80 else 'warning' if schedule_score >= 60 else 'critical',
-        'metrics': [
-            {'label': 'Active Projects', 'value': str(sched['total'] or 0)},
-            {'label': 'Delayed Projects', 'value': str(sched['delayed_count'] or 0)},
-            {'label': 'On-Time Rate', 'value': f"{100 - delayed_pct:.1f}%"},
-            {'label': 'Avg Delay (days)', 'value': f"{sched['avg_delay']:.0f}" if sched['avg_delay'] else '0'}
-        ],
-        'recommendations': [
-            'Investigate root causes of delays',
-            'Consider schedule recovery plans'
-        ] if delayed_pct > 20 else ['Schedule performance is acceptable']
-    })
-
-    # 3. Use of Funds Compliance (based on categories)
-    cursor.execute('''
-        SELECT surtax_category, COUNT(*) as count, SUM(current_amount) as total
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-        GROUP BY surtax_category
-    ''')
-    categories = cursor.fetchall()
-
-    approved_categories = ['New Construction', 'Renovation', 'Technology', 'Safety & Security', 'Maintenance']
-    valid_funds = sum(row['total'] or 0 for row in categories if row['surtax_category'] in approved_categories)
-    total_funds = sum(row['total'] or 0 for row in categories)
-    funds_score = (valid_funds / total_funds * 100) if total_funds > 0 else 100
-
-    compliance['categories'].append({
-        'name': 'Use of Funds',
-        'icon': 'check-circle',
-        'score': int(funds_score),
-        'status': 'good' if funds_score >= 95 else 'warning' if funds_score >= 80 else 'critical',
-        'metrics': [
-            {'label': 'Approved Categories', 'value': str(len([c for c in categories if c['surtax_category'] in approved_categories]))},
-            {'label': 'Total Categories', 'value': str(len(categories))},
-            {'label': 'Eligible Spending', 'value': f"${valid_funds:,.0f}"},
-            {'label': 'Compliance Rate', 'value': f"{funds_score:.1f}%"}
-        ],
-        'recommendations': ['All funds used for voter-approved purposes'] if funds_score >= 95 else ['Review categorization of expenditures']
-    })
-
-    # 4. Transparency & Reporting
-    # This is more subjective - based on having meetings, reports, etc.
-    transparency_items = {
-        'public_meetings': True,
-        'annual_report': True,
-        'website_updated': True,
-        'financial_audit': False,  # Placeholder
-        'performance_audit': False  # Placeholder
-    }
-    transparency_score = sum(1 for v in transparency_items.values() if v) / len(transparency_items) * 100
-
-    compliance['categories'].append({
-        'name': 'Transparency & Reporting',
-        'icon': 'document-text',
-        'score': int(transparency_score),
-        'status': 'good' if transparency_score >= 80 else 'warning' if transparency_score >= 60 else 'critical',
-        'metrics': [
-            {'label': 'Public Meetings', 'value': 'Yes' if transparency_items['public_meetings'] else 'No', 'check': transparency_items['public_meetings']},
-            {'label': 'Annual Report', 'value': 'Yes' if transparency_items['annual_report'] else 'Pending', 'check': transparency_items['annual_report']},
-            {'label': 'Financial Audit', 'value': 'Yes' if transparency_items['financial_audit'] else 'Pending', 'check': transparency_items['financial_audit']},
-            {'label': 'Performance Audit', 'value': 'Yes' if transparency_items['performance_audit'] else 'Pending', 'check': transparency_items['performance_audit']}
-        ],
-        'recommendations': ['Complete outstanding audits'] if transparency_score < 100 else ['All transparency requirements met']
-    })
-
-    # 5. Vendor Performance
-    cursor.execute('''
-        SELECT
-            COUNT(DISTINCT vendor_id) as vendor_count,
-            AVG(change_order_count) as avg_change_orders,
-            COUNT(CASE WHEN change_order_count > 2 THEN 1 END) as high_co_count
-        FROM contracts
-        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND vendor_id IS NOT NULL
-    ''')
-    vendor = cursor.fetchone()
-
-    high_co_pct = (vendor['high_co_count'] / vendor['vendor_count'] * 100) if vendor['vendor_count'] > 0 else 0
-    vendor_score = max(0, 100 - (high_co_pct * 2))
-
-    compliance['categories'].append({
-        'name': 'Vendor Performance',
-        'icon': 'users',
-        'score': int(vendor_score),
-        'status': 'good' if vendor_score >= 80 else 'warning' if vendor_score >= 60 else 'critical',
-        'metrics': [
-            {'label': 'Active Vendors', 'value': str(vendor['vendor_count'] or 0)},
-            {'label': 'Avg Change Orders', 'value': f"{vendor['avg_change_orders']:.1f}" if vendor['avg_change_orders'] else '0'},
-            {'label': 'High CO Vendors', 'value': str(vendor['high_co_count'] or 0)},
-            {'label': 'Performance Rate', 'value': f"{vendor_score:.0f}%"}
-        ],
-        'recommendations': ['Review vendors with high change order rates'] if high_co_pct > 20 else ['Vendor performance is satisfactory']
-    })
-
-    # Calculate overall score
-    compliance['overall_score'] = int(sum(c['score'] for c in compliance['categories']) / len(compliance['categories']))
-    compliance['overall_status'] = 'good' if compliance['overall_score'] >= 80 else 'warning' if compliance['overall_score'] >= 60 else 'critical'
-
+    compliance = compute_compliance(conn, scorers, fiscal_year)
     conn.close()
     return compliance
 
@@ -1399,13 +2456,61 @@ def get_compliance_data():
 @app.route('/compliance')
 def compliance_dashboard():
     """Compliance dashboard with Prop 39-style indicators."""
-    compliance = get_compliance_data()
+    compliance = get_compliance_data(fiscal_year=requested_fiscal_year())
 
     return render_template('surtax/compliance.html',
                           compliance=compliance,
                           title='Compliance Dashboard')
 
 
+# ==================
+# KPI HISTORY
+# ==================
+
+def record_kpi_snapshot(force=False):
+    """Append a KPI snapshot if the data changed or the last one is stale."""
+    conn = get_db()
+    try:
+        reason = 'manual' if force else snapshot_due(conn)
+        if not reason:
+            return None
+
+        kpis = build_kpi_row(get_overview_stats(), get_compliance_data(), get_concerns())
+        snapshot_id = save_snapshot(conn, kpis, reason=reason)
+        logger.info(f'KPI snapshot {snapshot_id} recorded ({reason})')
+        return snapshot_id
+    finally:
+        conn.close()
+
+
+@app.cli.command('snapshot-kpis')
+def snapshot_kpis_command():
+    """Record a KPI snapshot (for cron / scheduled tasks)."""
+    snapshot_id = record_kpi_snapshot(force=True)
+    print(f'[OK] Recorded KPI snapshot {snapshot_id}')
+
+
+@app.route('/api/trends')
+def api_trends():
+    """KPI history for trend charts.
+
+    Query params:
+        metrics: Comma-separated KPI names (e.g. total_spent,compliance_overall)
+        from / to: Optional ISO dates bounding the range
+    """
+    metrics = [m.strip() for m in request.args.get('metrics', 'compliance_overall').split(',') if m.strip()]
+
+    conn = get_db()
+    try:
+        trend = get_kpi_trend(conn, metrics, request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+
+    return jsonify(trend)
+
+
 # ==================
 # WATCHLIST
 # ==================
@@ -1506,6 +2611,7 @@ def vendors():
     """Vendor Performance tracking."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
 
     # Get vendor performance data
     cursor.execute('''
@@ -1518,9 +2624,10 @@ def vendors():
             AVG(percent_complete) as avg_completion
         FROM contracts
         WHERE is_deleted = 0 AND vendor_name IS NOT NULL AND vendor_name != ''
+    ''' + year_sql + '''
         GROUP BY vendor_name
         ORDER BY total_value DESC
-    ''')
+    ''', year_params)
     vendors_list = cursor.fetchall()
     conn.close()
 
@@ -1534,39 +2641,43 @@ def change_orders():
     """Change Order tracking."""
     conn = get_db()
     cursor = conn.cursor()
+    fiscal_year = requested_fiscal_year()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year)
 
-    # Get projects with budget changes
-    cursor.execute('''
+    # Get projects with budget changes (served by idx_contracts_change_abs)
+    cursor.execute(f'''
         SELECT
             contract_id, title, school_name, vendor_name,
             original_amount, current_amount,
-            (current_amount - original_amount) as change_amount,
+            change_amount,
             CASE WHEN original_amount > 0
-                THEN ((current_amount - original_amount) / original_amount * 100)
+                THEN (change_amount / original_amount * 100)
                 ELSE 0 END as change_pct,
+            change_order_count,
             status
         FROM contracts
-        WHERE is_deleted = 0
-        AND surtax_category IS NOT NULL
-        AND original_amount IS NOT NULL
-        AND current_amount != original_amount
-        ORDER BY ABS(current_amount - original_amount) DESC
-    ''')
+        WHERE {CHANGE_ORDER_FILTER}{year_sql}
+        ORDER BY change_abs DESC
+    ''', year_params)
     change_orders_list = cursor.fetchall()
 
-    # Summary stats
-    cursor.execute('''
-        SELECT
-            COUNT(*) as total_changes,
-            SUM(current_amount - original_amount) as total_change_value,
-            SUM(CASE WHEN current_amount > original_amount THEN 1 ELSE 0 END) as increases,
-            SUM(CASE WHEN current_amount < original_amount THEN 1 ELSE 0 END) as decreases
-        FROM contracts
-        WHERE is_deleted = 0
-        AND surtax_category IS NOT NULL
-        AND original_amount IS NOT NULL
-        AND current_amount != original_amount
-    ''')
+    if fiscal_year is None:
+        # Summary stats (maintained by triggers on contracts)
+        cursor.execute('''
+            SELECT total_changes, total_change_value, increases, decreases
+            FROM change_order_summary
+            WHERE id = 1
+        ''')
+    else:
+        # One year's slice, read through idx_contracts_fy_category
+        cursor.execute(f'''
+            SELECT COUNT(*) as total_changes,
+                   COALESCE(SUM(change_amount), 0) as total_change_value,
+                   COALESCE(SUM(CASE WHEN change_amount > 0 THEN 1 ELSE 0 END), 0) as increases,
+                   COALESCE(SUM(CASE WHEN change_amount < 0 THEN 1 ELSE 0 END), 0) as decreases
+            FROM contracts
+            WHERE {CHANGE_ORDER_FILTER}{year_sql}
+        ''', year_params)
     stats = cursor.fetchone()
     conn.close()
 
@@ -1576,11 +2687,80 @@ def change_orders():
                           stats=stats)
 
 
+CHANGE_ORDER_ITEMS_PER_PAGE = 25
+
+
+def get_change_order_items(contract_id, page=1, per_page=CHANGE_ORDER_ITEMS_PER_PAGE):
+    """Get one page of change order line items for a contract."""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT contract_id, title, school_name, vendor_name,
+               original_amount, current_amount, change_amount
+        FROM contracts
+        WHERE contract_id = ?
+    ''', (contract_id,))
+    contract = cursor.fetchone()
+    if not contract:
+        conn.close()
+        return None, [], {}
+
+    cursor.execute('''
+        SELECT COUNT(*) as total_count,
+               COALESCE(SUM(amount), 0) as total_amount,
+               COALESCE(SUM(days_added), 0) as total_days_added
+        FROM change_orders
+        WHERE contract_id = ?
+    ''', (contract_id,))
+    totals = dict(cursor.fetchone())
+
+    total_pages = max(1, (totals['total_count'] + per_page - 1) // per_page)
+    page = max(1, min(page, total_pages))
+
+    cursor.execute('''
+        SELECT * FROM change_orders
+        WHERE contract_id = ?
+        ORDER BY approved_date DESC
+        LIMIT ? OFFSET ?
+    ''', (contract_id, per_page, (page - 1) * per_page))
+    items = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total_pages': total_pages,
+        'has_prev': page > 1,
+        'has_next': page < total_pages,
+        **totals
+    }
+    return dict(contract), items, pagination
+
+
+@app.route('/change-orders/<contract_id>')
+def change_order_items(contract_id):
+    """Line-item change orders for one contract."""
+    page = request.args.get('page', '1')
+    page = int(page) if page.isdigit() else 1
+
+    contract, items, pagination = get_change_order_items(contract_id, page)
+    if not contract:
+        return redirect(url_for('change_orders'))
+
+    return render_template('surtax/change_order_items.html',
+                          contract=contract,
+                          items=items,
+                          pagination=pagination,
+                          title=f"Change Orders - {contract['title']}")
+
+
 @app.route('/risk')
 def risk_dashboard():
     """Risk Dashboard - flags high-risk projects."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
 
     # Get high-risk projects (delayed, over budget, or both)
     cursor.execute('''
@@ -1597,6 +2777,7 @@ def risk_dashboard():
             END as risk_level
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + year_sql + '''
         ORDER BY
             CASE
                 WHEN is_delayed = 1 AND is_over_budget = 1 THEN 1
@@ -1604,7 +2785,7 @@ def risk_dashboard():
                 ELSE 3
             END,
             delay_days DESC
-    ''')
+    ''', year_params)
     projects = cursor.fetchall()
 
     # Risk summary
@@ -1616,7 +2797,7 @@ def risk_dashboard():
             SUM(CASE WHEN is_delayed = 0 AND is_over_budget = 0 THEN 1 ELSE 0 END) as low
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-    ''')
+    ''' + year_sql, year_params)
     risk_summary = cursor.fetchone()
     conn.close()
 
@@ -1653,6 +2834,8 @@ def analytics():
     """Analytics and reporting."""
     conn = get_db()
     cursor = conn.cursor()
+    fiscal_year = requested_fiscal_year()
+    year_sql, year_params = _fiscal_year_clause(fiscal_year)
 
     # Spending trends by category
     cursor.execute('''
@@ -1664,9 +2847,10 @@ def analytics():
             AVG(percent_complete) as avg_completion
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + year_sql + '''
         GROUP BY surtax_category
         ORDER BY total_budget DESC
-    ''')
+    ''', year_params)
     category_data = cursor.fetchall()
 
     # Monthly spending (simulated based on paid amounts)
@@ -1677,23 +2861,124 @@ def analytics():
             SUM(current_amount) as value
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + year_sql + '''
         GROUP BY status
-    ''')
+    ''', year_params)
     status_data = cursor.fetchall()
+
+    # Earned value across the portfolio
+    earned_value = get_portfolio_earned_value(conn, fiscal_year=fiscal_year)
+    titles = {row['contract_id']: row['title'] for row in conn.execute('''
+        SELECT contract_id, title FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''')}
     conn.close()
 
+    ev_watch = sorted(
+        ({'contract_id': cid, 'title': titles.get(cid, cid), **ev}
+         for cid, ev in earned_value['projects'].items()
+         if (ev['cpi'] is not None and ev['cpi'] < 0.9) or (ev['spi'] is not None and ev['spi'] < 0.9)),
+        key=lambda p: min(p['cpi'] if p['cpi'] is not None else 1, p['spi'] if p['spi'] is not None else 1)
+    )[:10]
+
     return render_template('surtax/analytics.html',
                           title='Analytics',
                           category_data=category_data,
-                          status_data=status_data)
+                          status_data=status_data,
+                          ev_portfolio=earned_value['portfolio'],
+                          ev_watch=ev_watch)
+
+
+@app.route('/api/earned-value')
+def api_earned_value():
+    """Earned-value metrics and forecasts for every surtax project (?fy= for one fiscal year)."""
+    conn = get_db()
+    earned_value = get_portfolio_earned_value(conn, fiscal_year=requested_fiscal_year())
+    conn.close()
+    return jsonify(earned_value)
+
+
+@app.route('/api/forecast/<contract_id>')
+def api_project_forecast(contract_id):
+    """Monte Carlo completion and cost forecast for one project.
+
+    Query params:
+        trials: Number of simulated outcomes (default 5000)
+        target: Optional ISO date, e.g. 2026-08-31, to get prob_by_target
+    """
+    trials = request.args.get('trials', '5000')
+    target = request.args.get('target')
+
+    conn = get_db()
+    try:
+        forecast = forecast_project(conn, contract_id,
+                                    trials=int(trials) if trials.isdigit() else 5000,
+                                    target_date=target)
+    except ValueError:
+        return jsonify({'error': 'target must be an ISO date (YYYY-MM-DD)'}), 400
+    finally:
+        conn.close()
+
+    if forecast is None:
+        return jsonify({'error': 'Project not found'}), 404
+    return jsonify(forecast)
+
+
+@app.route('/api/forecast')
+def api_portfolio_forecast():
+    """Monte Carlo forecasts for delayed projects (or all active ones with ?scope=active)."""
+    trials = request.args.get('trials', '5000')
+    target = request.args.get('target')
+    status_filter = 'status = \'Active\'' if request.args.get('scope') == 'active' else 'is_delayed = 1'
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
+
+    conn = get_db()
+    try:
+        contract_ids = [row['contract_id'] for row in conn.execute(f'''
+            SELECT contract_id FROM contracts
+            WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND {status_filter}
+            AND COALESCE(percent_complete, 0) < 100{year_sql}
+        ''', year_params)]
+        forecasts = forecast_portfolio(conn, contract_ids,
+                                       trials=int(trials) if trials.isdigit() else 5000,
+                                       target_date=target)
+    except ValueError:
+        return jsonify({'error': 'target must be an ISO date (YYYY-MM-DD)'}), 400
+    finally:
+        conn.close()
+
+    return jsonify({'count': len(forecasts), 'projects': forecasts})
+
+
+@app.route('/api/earned-value/<contract_id>')
+def api_project_earned_value(contract_id):
+    """Earned-value metrics and forecast for one project."""
+    conn = get_db()
+    earned_value = get_portfolio_earned_value(conn)
+    conn.close()
+
+    project = earned_value['projects'].get(contract_id)
+    if project is None:
+        return jsonify({'error': 'Project not found'}), 404
+    return jsonify({'contract_id': contract_id, 'as_of': earned_value['as_of'], **project})
 
 
 @app.route('/financials')
 def financials():
-    """Financial summary with Marion County data."""
+    """Financial summary with Marion County data for one fiscal year (?fy=, default latest)."""
     conn = get_db()
     cursor = conn.cursor()
 
+    # Each import adds a fiscal year's rows; summing across them would
+    # double-count, so always read one year's slice
+    cursor.execute('''
+        SELECT fiscal_year FROM expenditures_summary WHERE fiscal_year IS NOT NULL
+        UNION
+        SELECT fiscal_year FROM revenues_summary WHERE fiscal_year IS NOT NULL
+    ''')
+    summary_years = sorted((int(row['fiscal_year']) for row in cursor.fetchall()), reverse=True)
+    fiscal_year = requested_fiscal_year(default=summary_years[0] if summary_years else None)
+
     # Get expenditures summary
     cursor.execute('''
         SELECT
@@ -1703,9 +2988,10 @@ def financials():
             special_revenue,
             capital_projects
         FROM expenditures_summary
+        WHERE fiscal_year = ?
         ORDER BY total_amount DESC
         LIMIT 10
-    ''')
+    ''', (fiscal_year,))
     top_expenditures = cursor.fetchall()
 
     # Get total expenditures by fund type
@@ -1719,7 +3005,8 @@ def financials():
             SUM(internal_service) as internal_service,
             SUM(total_amount) as total
         FROM expenditures_summary
-    ''')
+        WHERE fiscal_year = ?
+    ''', (fiscal_year,))
     exp_by_fund = cursor.fetchone()
 
     # Get revenues summary
@@ -1731,9 +3018,10 @@ def financials():
             special_revenue,
             capital_projects
         FROM revenues_summary
+        WHERE fiscal_year = ?
         ORDER BY total_amount DESC
         LIMIT 10
-    ''')
+    ''', (fiscal_year,))
     top_revenues = cursor.fetchall()
 
     # Get total revenues by fund type
@@ -1747,12 +3035,13 @@ def financials():
             SUM(internal_service) as internal_service,
             SUM(total_amount) as total
         FROM revenues_summary
-    ''')
+        WHERE fiscal_year = ?
+    ''', (fiscal_year,))
     rev_by_fund = cursor.fetchone()
 
     # Calculate summary stats
-    total_revenue = rev_by_fund['total'] if rev_by_fund else 0
-    total_expenditure = exp_by_fund['total'] if exp_by_fund else 0
+    total_revenue = (rev_by_fund['total'] if rev_by_fund else 0) or 0
+    total_expenditure = (exp_by_fund['total'] if exp_by_fund else 0) or 0
     net_position = total_revenue - total_expenditure
     budget_balance = (net_position / total_revenue * 100) if total_revenue > 0 else 0
 
@@ -1765,6 +3054,8 @@ def financials():
                           total_expenditure=total_expenditure,
                           net_position=net_position,
                           budget_balance=budget_balance,
+                          fiscal_year=fiscal_year,
+                          summary_years=summary_years,
                           title='Financial Summary')
 
 
@@ -1858,6 +3149,7 @@ def map_view():
     """Geographic map view of projects."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
 
     # Get schools with projects
     cursor.execute('''
@@ -1867,9 +3159,10 @@ def map_view():
             SUM(current_amount) as total_value
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND school_name IS NOT NULL
+    ''' + year_sql + '''
         GROUP BY school_name
         ORDER BY total_value DESC
-    ''')
+    ''', year_params)
     schools = cursor.fetchall()
     conn.close()
 
@@ -1883,6 +3176,7 @@ def public_portal():
     """Public transparency portal."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
 
     # Get public-facing summary
     cursor.execute('''
@@ -1893,7 +3187,7 @@ def public_portal():
             SUM(CASE WHEN status = 'Complete' THEN 1 ELSE 0 END) as completed
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL
-    ''')
+    ''' + year_sql, year_params)
     summary = cursor.fetchone()
 
     # Recent completed projects
@@ -1901,9 +3195,10 @@ def public_portal():
         SELECT title, school_name, current_amount, surtax_category
         FROM contracts
         WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND status = 'Complete'
+    ''' + year_sql + '''
         ORDER BY current_end_date DESC
         LIMIT 10
-    ''')
+    ''', year_params)
     completed = cursor.fetchall()
     conn.close()
 
@@ -1913,11 +3208,65 @@ def public_portal():
                           completed=completed)
 
 
+@app.route('/public/records.zip')
+def public_records_package():
+    """
+    Public-records data package: per-table files plus datapackage.json, zipped.
+
+    Query params:
+        format: csv (default) or parquet
+
+    Only tables whose content changed since the last build are rewritten;
+    the zip is streamed from a snapshot of the format's package directory.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in PACKAGE_FORMATS:
+        return jsonify({'error': f"Unknown format: {fmt} (use {', '.join(PACKAGE_FORMATS)})"}), 400
+    if not export_format_available(fmt):
+        return jsonify({'error': f'{fmt} packages require {EXPORT_FORMATS[fmt][3]} to be installed'}), 501
+
+    conn = get_db()
+    try:
+        build_data_package(conn, fmt)
+    finally:
+        conn.close()
+
+    response = Response(stream_with_context(iter_package_zip(open_package(fmt))), mimetype='application/zip')
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=surtax_public_records_{datetime.now().strftime('%Y%m%d')}.zip")
+    return response
+
+
+@app.cli.command('data-package')
+@click.option('--format', 'fmt', type=click.Choice(PACKAGE_FORMATS), default='csv', help='Table file format')
+@click.option('--force', is_flag=True, help='Rewrite every table, changed or not')
+@click.option('--output', type=click.Path(dir_okay=False), help='Also write the zipped package here')
+def data_package_command(fmt, force, output):
+    """Build the public-records data package, rewriting only changed tables."""
+    conn = get_db()
+    try:
+        _, summary = build_data_package(conn, fmt, force=force)
+    finally:
+        conn.close()
+
+    for entry in summary:
+        state = 'rebuilt' if entry['rebuilt'] else 'unchanged'
+        print(f"  {entry['table']}: {entry['rows']} rows ({state})")
+    print(f"[OK] {sum(e['rebuilt'] for e in summary)} of {len(summary)} table(s) rebuilt")
+
+    if output:
+        with open(output, 'wb') as f:
+            for chunk in iter_package_zip(open_package(fmt)):
+                f.write(chunk)
+        print(f'[OK] Wrote {output}')
+
+
 @app.route('/alerts')
 def alerts():
     """Alerts and notifications management."""
     conn = get_db()
     cursor = conn.cursor()
+    year_sql, year_params = _fiscal_year_clause(requested_fiscal_year())
 
     # Generate alerts based on project status
     alerts_list = []
@@ -1927,9 +3276,10 @@ def alerts():
         SELECT contract_id, title, delay_days
         FROM contracts
         WHERE is_deleted = 0 AND is_delayed = 1
+    ''' + year_sql + '''
         ORDER BY delay_days DESC
         LIMIT 5
-    ''')
+    ''', year_params)
     for row in cursor.fetchall():
         alerts_list.append({
             'type': 'warning',
@@ -1943,9 +3293,10 @@ def alerts():
         SELECT contract_id, title, budget_variance_pct
         FROM contracts
         WHERE is_deleted = 0 AND is_over_budget = 1
+    ''' + year_sql + '''
         ORDER BY budget_variance_pct DESC
         LIMIT 5
-    ''')
+    ''', year_params)
     for row in cursor.fetchall():
         alerts_list.append({
             'type': 'danger',
@@ -1967,4 +3318,10 @@ def alerts():
 
 if __name__ == '__main__':
     logger.info("Starting Surtax Oversight Dashboard on port 5847...")
+    # Only the serving process records snapshots, not the debug reloader parent
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        record_kpi_snapshot()
+        start_snapshot_scheduler(record_kpi_snapshot)
+        refresh_guided_prompt_answers()
+        start_guided_refresher(refresh_guided_prompt_answers)
     app.run(host='127.0.0.1', port=5847, debug=True)
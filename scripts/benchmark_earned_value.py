@@ -0,0 +1,112 @@
+"""
+Earned-value engine benchmark.
+
+Times the vectorized earned-value pass (utils/earned_value.py) over synthetic
+portfolios of 10k and 100k projects, both on in-memory rows and end-to-end
+from a temporary SQLite contracts table.
+
+Usage:
+    python scripts/benchmark_earned_value.py [sizes...]
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.earned_value import (
+    columns_from_rows,
+    compute_earned_value,
+    load_contract_columns,
+    summarize_portfolio
+)
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+def synthetic_rows(n, seed=42):
+    """Generate n contract rows in load_contract_columns() order."""
+    rng = np.random.default_rng(seed)
+    base = date(2022, 1, 1)
+    original = rng.uniform(50_000, 50_000_000, n)
+    current = original * rng.uniform(0.95, 1.3, n)
+    paid = current * rng.uniform(0, 1.1, n)
+    pct = rng.uniform(0, 100, n)
+    start_offsets = rng.integers(0, 1000, n)
+    durations = rng.integers(90, 900, n)
+    slips = rng.integers(0, 200, n)
+
+    rows = []
+    for i in range(n):
+        start = base + timedelta(days=int(start_offsets[i]))
+        original_end = start + timedelta(days=int(durations[i]))
+        current_end = original_end + timedelta(days=int(slips[i]))
+        rows.append((
+            f'BENCH-{i:06d}', 'Active',
+            float(original[i]), float(current[i]), float(paid[i]), float(pct[i]),
+            start.isoformat(), original_end.isoformat(), current_end.isoformat(), None
+        ))
+    return rows
+
+
+def timed(label, func, repeat=3):
+    """Run func repeat times and print the best wall-clock time."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'  {label:<32} {best * 1000:10.1f} ms')
+    return result
+
+
+def bench_size(n):
+    print(f'\n{n:,} projects')
+    rows = synthetic_rows(n)
+
+    cols = timed('transpose rows -> arrays', lambda: columns_from_rows(rows))
+    metrics = timed('earned-value pass (NumPy)', lambda: compute_earned_value(cols, date(2025, 1, 1)))
+    timed('portfolio roll-up', lambda: summarize_portfolio(metrics))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(str(Path(tmp) / 'bench.db'))
+        conn.execute('''
+            CREATE TABLE contracts (
+                contract_id TEXT PRIMARY KEY, status TEXT,
+                original_amount REAL, current_amount REAL, total_paid REAL, percent_complete REAL,
+                start_date TEXT, original_end_date TEXT, current_end_date TEXT, actual_end_date TEXT,
+                is_deleted INTEGER DEFAULT 0, surtax_category TEXT DEFAULT 'Renovation'
+            )
+        ''')
+        conn.executemany('''
+            INSERT INTO contracts (contract_id, status, original_amount, current_amount, total_paid,
+                                   percent_complete, start_date, original_end_date, current_end_date,
+                                   actual_end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+        timed('end-to-end from SQLite', lambda: compute_earned_value(load_contract_columns(conn), date(2025, 1, 1)))
+        conn.close()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print('=' * 60)
+    print('EARNED VALUE BENCHMARK')
+    print('=' * 60)
+    for n in sizes:
+        bench_size(n)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Ask AI intent matcher benchmark.
+
+Routes a corpus of questions through the compiled intent registry
+(utils/intents.py) and through the original if/elif keyword chain, reporting
+per-question latency and every question where the two disagree. A second run
+pads the registry with synthetic intents to show that the single-pass
+matcher stays flat as intents are added.
+
+Usage:
+    python scripts/benchmark_intents.py [questions.txt]
+
+questions.txt holds one logged question per line; without it the built-in
+corpus of guided prompts and suggestion chips is used.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import ask_intents
+from config.personas import GUIDED_AI_PROMPTS
+from utils.intents import IntentRegistry
+
+SAMPLE_QUESTIONS = [
+    'What is the total budget?',
+    'How much has been spent so far?',
+    'Show total spending',
+    'Show me spending by category',
+    'What projects are delayed?',
+    'Are any projects delayed?',
+    'Show delayed projects',
+    'What other projects are delayed?',
+    'Why is the high school delayed?',
+    'Is South Marion running late?',
+    'What projects are over budget?',
+    'Any cost overrun on the new high school?',
+    'How much is the high school over budget?',
+    'Tell me about South Marion High School (CCC)',
+    'Which category has the most delays?',
+    'Give me a breakdown by category',
+    'Who is the contractor?',
+    'Are there any change orders?',
+    'What is being done about it?',
+    'Show all projects',
+]
+
+
+def legacy_intent(question):
+    """The original process_question() if/elif chain, routing only."""
+    q = question.lower()
+    if any(kw in q for kw in ['total', 'how much', 'budget', 'spending']):
+        return 'totals'
+    elif any(kw in q for kw in ['high school', 'south marion']) and any(kw in q for kw in ['delayed', 'behind', 'late', 'why']):
+        return 'school_delay'
+    elif any(kw in q for kw in ['delayed', 'behind schedule', 'late']):
+        return 'delayed'
+    elif any(kw in q for kw in ['over budget', 'cost overrun', 'overspent']):
+        return 'over_budget'
+    elif any(kw in q for kw in ['high school', 'south marion', 'ccc']):
+        return 'school'
+    elif 'category' in q or 'breakdown' in q:
+        return 'category'
+    return None
+
+
+def compiled_intent(registry, question):
+    match = registry.match(question)
+    return match.name if match else None
+
+
+def padded_registry(extra):
+    """The app registry plus `extra` synthetic intents that never match."""
+    registry = IntentRegistry()
+    for intent in ask_intents.intents:
+        registry.register(intent.name, intent.clauses, intent.handler)
+    for i in range(extra):
+        registry.register(f'synthetic_{i}', [[f'zq{i}x keyword', f'zq{i}y phrase']], None)
+    registry.compile()
+    return registry
+
+
+def timed(label, func, corpus, repeat=200):
+    """Route the corpus repeat times and print the mean per-question latency."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in corpus:
+            func(question)
+    elapsed = time.perf_counter() - start
+    print(f'  {label:<40} {elapsed / (repeat * len(corpus)) * 1e6:8.1f} us/question')
+
+
+def load_corpus():
+    if len(sys.argv) > 1:
+        lines = Path(sys.argv[1]).read_text(encoding='utf-8').splitlines()
+        return [line.strip() for line in lines if line.strip()]
+    return SAMPLE_QUESTIONS + [p['prompt'] for p in GUIDED_AI_PROMPTS]
+
+
+def main():
+    corpus = load_corpus()
+
+    print('=' * 60)
+    print('INTENT MATCHER BENCHMARK')
+    print('=' * 60)
+    print(f'{len(corpus)} questions, {len(ask_intents.intents)} intents\n')
+
+    timed('legacy if/elif chain', legacy_intent, corpus)
+    timed('compiled matcher', lambda q: compiled_intent(ask_intents, q), corpus)
+    for extra in (100, 1000):
+        registry = padded_registry(extra)
+        timed(f'compiled matcher (+{extra} intents)', lambda q: compiled_intent(registry, q), corpus)
+
+    print('\nRouting differences (legacy -> compiled):')
+    differences = 0
+    for question in corpus:
+        old, new = legacy_intent(question), compiled_intent(ask_intents, question)
+        if old != new:
+            differences += 1
+            print(f'  {old or "fallback"} -> {new or "fallback"}: {question[:70]}')
+    if not differences:
+        print('  none')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,12 +9,23 @@ Data sources: News articles, MCPS facilities department, public records
 
 import sqlite3
 import sys
-from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.staged_import import ImportSource, StagedImport, StagedImportError
+
 # Paths
 DB_PATH = Path(__file__).parent.parent / 'data' / 'contracts.db'
 
+# capital_projects columns compared and written for each project_code
+PROJECT_COLUMNS = [
+    'project_name', 'project_type', 'location', 'address', 'budget_amount', 'spent_to_date',
+    'start_date', 'estimated_completion', 'status', 'capacity', 'square_footage',
+    'num_classrooms', 'num_labs', 'contractor', 'construction_manager', 'cm_contract_amount',
+    'description', 'data_source', 'source_url'
+]
+
 def create_capital_projects_table():
     """Create table for capital construction projects"""
     conn = sqlite3.connect(DB_PATH)
@@ -53,11 +64,8 @@ def create_capital_projects_table():
     conn.close()
     print('[OK] Capital projects table created')
 
-def import_projects():
-    """Import verified capital projects from research"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
+def verified_projects():
+    """Verified capital projects from research"""
     projects = [
         {
             'project_code': 'HS-CCC',
@@ -127,49 +135,42 @@ def import_projects():
         }
     ]
 
-    imported_count = 0
-    for project in projects:
-        try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO capital_projects (
-                    project_code, project_name, project_type, location, address,
-                    budget_amount, spent_to_date, start_date, estimated_completion,
-                    status, capacity, square_footage, num_classrooms, num_labs,
-                    contractor, construction_manager, cm_contract_amount,
-                    description, data_source, source_url, imported_date, last_updated
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                project['project_code'],
-                project['project_name'],
-                project['project_type'],
-                project['location'],
-                project['address'],
-                project['budget_amount'],
-                project['spent_to_date'],
-                project['start_date'],
-                project['estimated_completion'],
-                project['status'],
-                project['capacity'],
-                project['square_footage'],
-                project['num_classrooms'],
-                project['num_labs'],
-                project['contractor'],
-                project['construction_manager'],
-                project['cm_contract_amount'],
-                project['description'],
-                project['data_source'],
-                project['source_url'],
-                datetime.now(),
-                datetime.now()
-            ))
-            imported_count += 1
-            print(f'[OK] Imported: {project["project_name"]}')
-        except Exception as e:
-            print(f'[ERROR] Failed to import {project["project_name"]}: {e}')
+    return projects
 
-    conn.commit()
-    conn.close()
-    print(f'\n[OK] Imported {imported_count} capital projects')
+class CapitalProjectsSource(ImportSource):
+    """Verified capital projects (news, MCPS facilities, public records)"""
+
+    name = 'capital-projects'
+    description = 'Verified capital projects -> capital_projects'
+    table = 'capital_projects'
+    key = ('project_code',)
+    columns = PROJECT_COLUMNS
+    required = ('project_code', 'project_name')
+
+    # Other importers share capital_projects, so nothing is deleted
+    delete_missing = False
+
+    def source_paths(self):
+        # The project list lives in this script
+        return [Path(__file__)]
+
+    def extract(self, selected):
+        projects = verified_projects()
+        yield None, [(p['project_code'], *(p.get(c) for c in PROJECT_COLUMNS)) for p in projects], selected[0]
+
+    def on_insert(self, now):
+        return {'imported_date': now, 'last_updated': now}
+
+    def on_update(self, now):
+        return {'last_updated': now}
+
+def import_projects(force=False, dry_run=False):
+    """Stage, validate and swap in the verified capital projects
+
+    Returns:
+        StagedImport result dict
+    """
+    return StagedImport(DB_PATH, CapitalProjectsSource(), dry_run=dry_run, force=force).run()
 
 def generate_summary_report():
     """Generate summary statistics from imported projects"""
@@ -239,8 +240,12 @@ def main():
     # Create table
     create_capital_projects_table()
 
-    # Import projects
-    import_projects()
+    # Import projects (skipped when this script's project list is unchanged)
+    try:
+        import_projects(force='--force' in sys.argv[1:], dry_run='--dry-run' in sys.argv[1:])
+    except StagedImportError as e:
+        print(f'[ERROR] {e}')
+        return
 
     # Generate summary report
     generate_summary_report()
@@ -0,0 +1,66 @@
+"""
+Shared entry point for the staged data imports
+
+Every source loads into a staging table, is validated there and is swapped
+into place in one short transaction (see utils/staged_import.py), with
+per-stage timing and row counts.
+
+Usage:
+    python scripts/import_data.py                      # list sources
+    python scripts/import_data.py <source> [files...] [--dry-run] [--force] [--jobs N]
+"""
+
+import sys
+import argparse
+import importlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.staged_import import StagedImport, StagedImportError
+
+DB_PATH = Path(__file__).parent.parent / 'data' / 'contracts.db'
+
+# source name -> (script module, ImportSource class); imported on demand so
+# one source's optional dependencies (e.g. openpyxl, pypdf) don't affect the others
+SOURCES = {
+    'marion-expenditures': ('import_marion_data', 'ExpendituresSource'),
+    'marion-revenues': ('import_marion_data', 'RevenuesSource'),
+    'capital-projects': ('import_capital_projects', 'CapitalProjectsSource'),
+    'fldoe-workplan': ('import_fldoe_workplan', 'WorkPlanSource'),
+    'fldoe-workplan-pdf': ('import_fldoe_pdf', 'WorkPlanPdfSource'),
+}
+
+def load_source(name):
+    """The ImportSource class registered under a name"""
+    module_name, class_name = SOURCES[name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a staged data import.')
+    parser.add_argument('source', nargs='?', choices=sorted(SOURCES), help='Source to import')
+    parser.add_argument('files', nargs='*', type=Path, help='Source files (default: the source\'s own)')
+    parser.add_argument('--dry-run', action='store_true', help='Load and validate in staging, then discard')
+    parser.add_argument('--force', action='store_true', help='Import even if the sources are unchanged')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Parser processes, for sources that parse files')
+    args = parser.parse_args()
+
+    if args.source is None:
+        print('Available sources:')
+        for name in sorted(SOURCES):
+            print(f'  {name:<22} {load_source(name).description}')
+        return 0
+
+    source = load_source(args.source)(files=args.files, jobs=args.jobs)
+    try:
+        result = StagedImport(DB_PATH, source, dry_run=args.dry_run, force=args.force).run()
+    except StagedImportError as e:
+        print(f'[ERROR] {e}')
+        return 1
+
+    total = sum(metric['seconds'] for metric in result['metrics'])
+    print(f'[OK] {args.source}: {result["status"]} in {total:.2f}s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
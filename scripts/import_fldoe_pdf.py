@@ -0,0 +1,443 @@
+"""
+Import capital projects from an FLDOE 5-Year Facilities Work Plan PDF
+
+Reads the project schedule tables (capacity and other project schedules)
+straight from a work plan PDF such as MARION2025.pdf, instead of the
+hand-transcribed list in import_fldoe_workplan.py:
+
+- every page is hashed (content stream + PARSER_VERSION); pages parsed
+  before are read from the page cache in CACHE_DIR
+- the remaining pages are parsed in a process pool, one page per task,
+  from pypdf's layout-mode text, with per-page timing
+- schedule rows are normalized into capital_projects records and upserted
+  through the staged import (see utils/staged_import.py)
+
+Usage:
+    python scripts/import_data.py fldoe-workplan-pdf MARION2025.pdf [--jobs N] [--dry-run] [--force]
+
+pypdf is optional (pip install pypdf); only this source needs it. For the
+2024-2025 plan, the fldoe-workplan source also carries details the PDF does
+not (construction managers, addresses); use this one for new plan years.
+Projects already loaded from either source keep their codes (see reconcile),
+so a new plan updates them rather than adding copies. The newest plan owns
+a project; for the 2024-2025 plan itself the hand-entered rows win.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.staged_import import ImportSource, StagedImportError
+
+# Parsed pages, one JSON file per page hash
+CACHE_DIR = Path(__file__).parent.parent / 'data' / 'workplan_pages'
+
+# Bump when the page parser changes, so cached pages are parsed again
+PARSER_VERSION = '1'
+
+# capital_projects columns the PDF provides (others, such as spent_to_date
+# and construction_manager, are left to the sources that know them)
+PDF_COLUMNS = [
+    'project_name', 'project_type', 'location', 'budget_amount', 'start_date',
+    'estimated_completion', 'status', 'capacity', 'square_footage', 'num_classrooms',
+    'description', 'data_source'
+]
+
+# Schedule header, e.g. "Project Description  Location  2024 - 2025  2025 - 2026 ... Total  Funded"
+FISCAL_YEAR = re.compile(r'\b(20\d\d)\s*-\s*(20\d\d)\b')
+
+# First line of each schedule row carries the description, location, the
+# planned cost per year, the total and whether it is funded
+PLANNED_COST = re.compile(r'Planned Cost:?')
+AMOUNT = re.compile(r'\$?\(?-?[\d,]+(?:\.\d+)?\)?')
+FUNDED = re.compile(r'\b(Yes|No)\s*$', re.IGNORECASE)
+
+# Later lines of a capacity schedule row: label, one value per year, total
+METRIC_LABELS = {
+    'Student Stations': 'capacity',
+    'Total Classrooms': 'num_classrooms',
+    'Gross Sq Ft': 'square_footage',
+}
+METRIC = re.compile('(' + '|'.join(METRIC_LABELS) + r'):?', re.IGNORECASE)
+METRIC_FIELDS = {label.lower(): field for label, field in METRIC_LABELS.items()}
+
+# Lines after "Planned Cost:" that can still belong to the same row
+MAX_ROW_LINES = 4
+
+COLUMN_GAP = re.compile(r'\s{2,}')
+
+def _number(text):
+    """'$1,234' / '(1,234)' -> float, or None"""
+    text = text.strip().replace('$', '').replace(',', '')
+    negative = text.startswith('(') and text.endswith(')')
+    try:
+        value = float(text.strip('()'))
+    except ValueError:
+        return None
+    return -value if negative else value
+
+def parse_page_text(text):
+    """
+    Schedule rows on one page of layout-mode text.
+
+    Returns:
+        Dict with 'fiscal_years' (['2024-2025', ...] from the table header,
+        or [] if the page has none) and 'rows', a list of dicts with
+        description, location, costs (per year), total, funded and any
+        capacity / num_classrooms / square_footage totals
+    """
+    lines = text.splitlines()
+    fiscal_years, rows = [], []
+    for line in lines:
+        years = FISCAL_YEAR.findall(line)
+        if len(years) >= 2 and not PLANNED_COST.search(line):
+            fiscal_years = [f'{start}-{end}' for start, end in years]
+            break
+
+    for index, line in enumerate(lines):
+        label = PLANNED_COST.search(line)
+        if not label:
+            continue
+
+        rest = line[label.end():]
+        funded = FUNDED.search(rest)
+        if funded:
+            rest = rest[:funded.start()]
+        amounts = [_number(a) for a in AMOUNT.findall(rest)]
+        amounts = [a for a in amounts if a is not None]
+
+        # Description and location are the first two columns left of the label
+        left = line[:label.start()].rstrip()
+        columns = COLUMN_GAP.split(left.strip())
+        description = columns[0] if columns and columns[0] else ''
+        location = ' '.join(columns[1:])
+        location_col = left.find(location) if location else label.start()
+
+        row = {
+            'description': description,
+            'location': location,
+            'costs': amounts[:-1],
+            'total': amounts[-1] if amounts else None,
+            'funded': funded.group(1).lower() == 'yes' if funded else None,
+        }
+
+        # Following lines: metrics, plus wrapped description / location text
+        for follow in lines[index + 1:index + 1 + MAX_ROW_LINES]:
+            if not follow.strip() or PLANNED_COST.search(follow):
+                break
+            metric = METRIC.search(follow)
+            end = metric.start() if metric else label.start()
+            if metric:
+                values = [_number(a) for a in AMOUNT.findall(follow[metric.end():])]
+                values = [v for v in values if v is not None]
+                if values:
+                    row[METRIC_FIELDS[metric.group(1).lower()]] = int(values[-1])
+            elif AMOUNT.fullmatch(follow.strip().split()[-1]):
+                break
+            wrapped_description = follow[:min(location_col, end)].strip()
+            wrapped_location = follow[location_col:end].strip() if location_col < end else ''
+            if wrapped_description:
+                row['description'] = f"{row['description']} {wrapped_description}".strip()
+            if wrapped_location and location:
+                row['location'] = f"{row['location']} {wrapped_location}"
+        if row['description'] or row['location']:
+            rows.append(row)
+
+    return {'fiscal_years': fiscal_years, 'rows': rows}
+
+# ==================
+# PAGE-PARALLEL PARSING
+# ==================
+# Each worker opens the PDF once (initializer) and parses single pages;
+# only the small per-page results travel back to the importing process.
+
+_worker_reader = None
+
+def _open_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise StagedImportError('pypdf is required to read work plan PDFs (pip install pypdf)')
+    return PdfReader(str(path))
+
+def _init_worker(path):
+    global _worker_reader
+    _worker_reader = _open_pdf(path)
+
+def _parse_page(number):
+    """Worker: parse one page, returning (page number, seconds, result)"""
+    started = time.perf_counter()
+    text = _worker_reader.pages[number].extract_text(extraction_mode='layout')
+    return number, time.perf_counter() - started, parse_page_text(text)
+
+def page_hash(page):
+    """SHA-256 of a page's content stream and the parser version"""
+    digest = hashlib.sha256(PARSER_VERSION.encode('utf-8'))
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+    return digest.hexdigest()
+
+def parse_pdf(path, jobs=None, cache_dir=CACHE_DIR):
+    """
+    Parse every page of a work plan PDF, reusing cached pages.
+
+    Args:
+        path: Work plan PDF
+        jobs: Parser processes (defaults to CPU count, capped at the
+            number of pages to parse)
+        cache_dir: Page cache directory
+
+    Returns:
+        List of per-page results (see parse_page_text), in page order
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    hashes = [page_hash(page) for page in _open_pdf(path).pages]
+    results, todo = {}, []
+    for number, digest in enumerate(hashes):
+        cached = cache_dir / f'{digest}.json'
+        if cached.exists():
+            results[number] = json.loads(cached.read_text(encoding='utf-8'))
+        else:
+            todo.append(number)
+
+    print(f'[INFO] {path.name}: {len(hashes)} pages, {len(hashes) - len(todo)} cached')
+    if todo:
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(todo)))
+        print(f'[INFO] Parsing {len(todo)} page(s) with {jobs} process(es)...')
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(path,)) as pool:
+            for number, seconds, result in pool.map(_parse_page, todo):
+                results[number] = result
+                tmp = cache_dir / f'{hashes[number]}.json.tmp'
+                tmp.write_text(json.dumps(result), encoding='utf-8')
+                os.replace(tmp, cache_dir / f'{hashes[number]}.json')
+                print(f'  page {number + 1:>3}: {len(result["rows"]):>3} row(s) in {seconds:.2f}s')
+        print(f'[INFO] Parsed {len(todo)} page(s) in {time.perf_counter() - started:.2f}s')
+
+    return [results[number] for number in range(len(hashes))]
+
+# ==================
+# NORMALIZATION
+# ==================
+
+def _slug(text):
+    return re.sub(r'[^A-Z0-9]+', '-', text.upper()).strip('-')
+
+# Building-system work, whatever the verb ("HVAC replacement", "replace roof")
+RENOVATION_WORDS = ('hvac', 'roof', 'chiller', 'paint', 'flooring', 'paving', 'renovat', 'remodel', 'repair', 'upgrade')
+
+def project_type(description):
+    """capital_projects.project_type for a schedule description"""
+    text = description.lower()
+    if any(word in text for word in RENOVATION_WORDS):
+        return 'Renovation'
+    if 'addition' in text or 'classroom' in text:
+        return 'Addition/Expansion'
+    if re.search(r'\b(new|replace)\b', text):
+        return 'New Construction'
+    return 'Renovation'
+
+def normalize_rows(pages):
+    """
+    capital_projects records from parsed pages.
+
+    A page without its own table header uses the fiscal years of the last
+    header before it. Codes are WP-<location>-<hash of location and
+    description>, numbered when a plan lists the same row twice. They leave
+    out the plan year, so a project carried into next year's plan keeps
+    its code and is updated in place.
+
+    Returns:
+        (plan's first fiscal year, list of dicts keyed by project_code and
+        PDF_COLUMNS)
+    """
+    fiscal_years, projects, codes = [], [], {}
+    for page in pages:
+        fiscal_years = page['fiscal_years'] or fiscal_years
+        for row in page['rows']:
+            if not fiscal_years:
+                raise StagedImportError('schedule rows found before any fiscal year header')
+            if row['total'] is None:
+                continue
+
+            costs = row['costs'] if len(row['costs']) == len(fiscal_years) else []
+            active = [i for i, cost in enumerate(costs) if cost]
+            start_year = int(fiscal_years[active[0]][:4]) if active else None
+            end_year = int(fiscal_years[active[-1]][-4:]) if active else None
+            # Funded work scheduled in the plan's first year is under way
+            underway = row['funded'] and active and active[0] == 0
+
+            location, description = row['location'], row['description']
+            digest = hashlib.sha1(f'{location}|{description}'.encode('utf-8')).hexdigest()[:6]
+            code = f'{CODE_PREFIX}{_slug(location)[:24] or "DISTRICT"}-{digest}'
+            codes[code] = codes.get(code, 0) + 1
+            if codes[code] > 1:
+                code = f'{code}-{codes[code]}'
+
+            notes = description
+            if row['funded'] is False:
+                notes += ' (Not yet funded)'
+            projects.append({
+                'project_code': code,
+                'project_name': f'{location} - {description}' if location else description,
+                'project_type': project_type(description),
+                'location': location or None,
+                'budget_amount': row['total'],
+                'start_date': f'{start_year}-07-01' if start_year else None,
+                'estimated_completion': f'{end_year}-06-30' if end_year else None,
+                'status': 'Under Construction' if underway else 'Planning',
+                'capacity': row.get('capacity') or None,
+                'square_footage': row.get('square_footage') or None,
+                'num_classrooms': row.get('num_classrooms') or None,
+                'description': notes,
+                'data_source': f'FLDOE {fiscal_years[0]} Work Plan',
+            })
+
+    return (fiscal_years[0] if fiscal_years else None), projects
+
+# Codes this source gives the projects it adds
+CODE_PREFIX = 'WP-'
+
+# data_source of work plan rows, e.g. "FLDOE 2024-2025 Work Plan (+ ...)"
+PLAN_SOURCE = re.compile(r'FLDOE (20\d\d)-20\d\d Work Plan')
+
+# Words that say nothing about which project a row is
+FILLER_WORDS = {'school', 'the', 'of', 'and', 'to', 'a', 'at', 'for', 'in'}
+
+# Shared description words needed to match a project (an equal budget counts as 2)
+MIN_MATCH_SCORE = 2
+
+def _words(text):
+    return set(re.findall(r'[a-z0-9]+', (text or '').lower())) - FILLER_WORDS
+
+def _match_score(project, existing):
+    """How well a parsed project matches an existing row (0 = different project)"""
+    ours, theirs = _words(project['location']), _words(existing['location'])
+    if not ours or not theirs or not (ours <= theirs or theirs <= ours):
+        return 0
+    described = _words(existing['project_name']) | _words(existing['description'])
+    score = len(_words(project['description']) & described)
+    if project['budget_amount'] and project['budget_amount'] == existing['budget_amount']:
+        score += 2
+    return score if score >= MIN_MATCH_SCORE else 0
+
+def plan_year(data_source):
+    """First year of the FLDOE work plan a data_source names, or None"""
+    match = PLAN_SOURCE.match(data_source or '')
+    return int(match.group(1)) if match else None
+
+def _may_update(row, year):
+    """
+    Whether a plan starting in year may overwrite an existing row.
+
+    The newest plan owns a project. For the same plan year, the hand-entered
+    fldoe-workplan row (curated statuses, construction managers) wins over
+    the PDF; rows this source coded itself are updated, so re-importing a
+    plan applies parser fixes.
+    """
+    owner = plan_year(row['data_source'])
+    if owner is None or owner < year:
+        return True
+    return owner == year and row['project_code'].startswith(CODE_PREFIX)
+
+def reconcile(projects, existing, plan):
+    """
+    Give parsed projects the codes of the work plan rows already loaded.
+
+    Rows from earlier imports (this source or the hand-entered fldoe-workplan
+    list) are matched by code, then on location plus description words or
+    budget, best match first, so a plan that lists a known project updates
+    it instead of adding a second copy. A matched project keeps the existing
+    row's name, location and description; the plan supplies the rest. A
+    project whose row belongs to a newer plan, or to the hand-entered list
+    of the same plan, is dropped (see _may_update).
+
+    Args:
+        projects: dicts from normalize_rows (matched ones are changed in place)
+        existing: dicts of project_code, project_name, location, description,
+            budget_amount and data_source
+        plan: The plan's first fiscal year, e.g. '2025-2026'
+
+    Returns:
+        The projects to load
+    """
+    year = int(plan[:4])
+    by_code = {row['project_code']: row for row in existing}
+    matched = {i: by_code[p['project_code']] for i, p in enumerate(projects) if p['project_code'] in by_code}
+    claimed = {row['project_code'] for row in matched.values()}
+    pairs = sorted(
+        ((_match_score(p, row), i, row['project_code'])
+         for i, p in enumerate(projects) if i not in matched
+         for row in existing if row['project_code'] not in claimed),
+        key=lambda pair: (-pair[0], pair[1]))
+    for score, i, code in pairs:
+        if not score or i in matched or code in claimed:
+            continue
+        claimed.add(code)
+        row = matched[i] = by_code[code]
+        projects[i].update(project_code=code, project_name=row['project_name'],
+                           location=row['location'], description=row['description'])
+    return [p for i, p in enumerate(projects) if i not in matched or _may_update(matched[i], year)]
+
+class WorkPlanPdfSource(ImportSource):
+    """Project schedules parsed from FLDOE work plan PDFs"""
+
+    name = 'fldoe-workplan-pdf'
+    description = 'FLDOE work plan PDF project schedules -> capital_projects'
+    table = 'capital_projects'
+    key = ('project_code',)
+    columns = PDF_COLUMNS
+    required = ('project_code', 'project_name')
+
+    # Other importers share capital_projects, so nothing is deleted
+    delete_missing = False
+
+    def __init__(self, files=None, jobs=None):
+        super().__init__(files, jobs)
+        self._paths = {}
+        self._existing = []
+
+    def source_paths(self):
+        if not self.files:
+            raise StagedImportError('Pass the work plan PDF(s) to import')
+        return list(self.files)
+
+    def select(self, conn, force=False, dry_run=False):
+        selected = super().select(conn, force, dry_run)
+        self._paths = {fingerprint['source']: path
+                       for fingerprint, path in zip(selected, self.source_paths())}
+        cursor = conn.execute(
+            "SELECT project_code, project_name, location, description, budget_amount, data_source "
+            "FROM capital_projects WHERE data_source LIKE 'FLDOE%'")
+        columns = [column[0] for column in cursor.description]
+        self._existing = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return selected
+
+    def extract(self, selected):
+        for fingerprint in selected:
+            path = self._paths[fingerprint['source']]
+            plan, projects = normalize_rows(parse_pdf(path, self.jobs))
+            if not projects:
+                raise StagedImportError(f'No project schedules found in {path.name}')
+            parsed = len(projects)
+            projects = reconcile(projects, self._existing, plan)
+            print(f'[INFO] {path.name}: {parsed} projects (FY{plan}), '
+                  f'{parsed - len(projects)} left to newer or hand-entered rows')
+            yield None, [(p['project_code'], *(p[c] for c in PDF_COLUMNS)) for p in projects], fingerprint
+
+    def on_insert(self, now):
+        return {'imported_date': now, 'last_updated': now, 'spent_to_date': 0}
+
+    def on_update(self, now):
+        return {'last_updated': now}
@@ -8,20 +8,33 @@ Data Source: MARION2025.pdf (FLDOE Official Work Plan)
 Approved: 9/24/2024 by Marion County School Board
 """
 
+import sys
 import sqlite3
-from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.staged_import import ImportSource, StagedImport, StagedImportError
+
 DB_PATH = Path(__file__).parent.parent / 'data' / 'contracts.db'
 
-def import_capacity_projects():
-    """Import capacity-adding projects from pages 10-12 of work plan"""
+# capital_projects columns compared and written for each project_code
+PROJECT_COLUMNS = [
+    'project_name', 'project_type', 'location', 'address', 'budget_amount', 'spent_to_date',
+    'start_date', 'estimated_completion', 'status', 'capacity', 'square_footage',
+    'num_classrooms', 'num_labs', 'contractor', 'construction_manager', 'cm_contract_amount',
+    'description', 'data_source', 'source_url'
+]
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# First year of the plan transcribed below; projects a newer plan has taken
+# over (scripts/import_fldoe_pdf.py) are left to that plan
+PLAN_YEAR = '2024'
+
+def capacity_projects():
+    """Capacity-adding projects from pages 10-12 of work plan"""
 
     # Projects from "Capacity Project Schedules" section
-    capacity_projects = [
+    projects = [
         {
             'project_code': 'HARBOR-VIEW-ADD',
             'project_name': 'Harbour View Elementary - 16 Classroom and Cafeteria Addition',
@@ -210,49 +223,60 @@ def import_capacity_projects():
         }
     ]
 
-    imported = 0
-    for project in capacity_projects:
-        try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO capital_projects (
-                    project_code, project_name, project_type, location, address,
-                    budget_amount, spent_to_date, start_date, estimated_completion,
-                    status, capacity, square_footage, num_classrooms, num_labs,
-                    contractor, construction_manager, cm_contract_amount,
-                    description, data_source, source_url, imported_date, last_updated
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                project['project_code'],
-                project['project_name'],
-                project['project_type'],
-                project['location'],
-                project.get('address'),
-                project.get('budget_amount'),
-                0,
-                project.get('start_date'),
-                project.get('estimated_completion'),
-                project.get('status'),
-                project.get('capacity'),
-                project.get('square_footage'),
-                project.get('num_classrooms'),
-                project.get('num_labs'),
-                project.get('contractor'),
-                project.get('construction_manager'),
-                project.get('cm_contract_amount'),
-                project['description'],
-                project['data_source'],
-                project['source_url'],
-                datetime.now(),
-                datetime.now()
-            ))
-            imported += 1
-            print(f'[OK] Imported: {project["project_name"]}')
-        except Exception as e:
-            print(f'[ERROR] Failed to import {project["project_name"]}: {e}')
-
-    conn.commit()
-    conn.close()
-    return imported
+    # Nothing has been spent on work plan projects at import time
+    return [{'spent_to_date': 0, **project} for project in projects]
+
+class WorkPlanSource(ImportSource):
+    """Capacity projects transcribed from the FLDOE 5-Year Facilities Work Plan"""
+
+    name = 'fldoe-workplan'
+    description = 'FLDOE work plan capacity projects -> capital_projects'
+    table = 'capital_projects'
+    key = ('project_code',)
+    columns = PROJECT_COLUMNS
+    required = ('project_code', 'project_name')
+
+    # Other importers share capital_projects, so nothing is deleted
+    delete_missing = False
+
+    def __init__(self, files=None, jobs=None):
+        super().__init__(files, jobs)
+        self._superseded = set()
+
+    def source_paths(self):
+        # The project list lives in this script
+        return [Path(__file__)]
+
+    def select(self, conn, force=False, dry_run=False):
+        selected = super().select(conn, force, dry_run)
+        cursor = conn.execute('''
+            SELECT project_code FROM capital_projects
+            WHERE data_source LIKE 'FLDOE ____-____ Work Plan%' AND substr(data_source, 7, 4) > ?
+        ''', (PLAN_YEAR,))
+        self._superseded = {row[0] for row in cursor.fetchall()}
+        return selected
+
+    def extract(self, selected):
+        projects = capacity_projects()
+        current = [p for p in projects if p['project_code'] not in self._superseded]
+        if len(current) < len(projects):
+            print(f'[INFO] {len(projects) - len(current)} project(s) follow a newer work plan, left as they are')
+        projects = current
+        yield None, [(p['project_code'], *(p.get(c) for c in PROJECT_COLUMNS)) for p in projects], selected[0]
+
+    def on_insert(self, now):
+        return {'imported_date': now, 'last_updated': now}
+
+    def on_update(self, now):
+        return {'last_updated': now}
+
+def import_capacity_projects(force=False, dry_run=False):
+    """Stage, validate and swap in the work plan capacity projects
+
+    Returns:
+        StagedImport result dict
+    """
+    return StagedImport(DB_PATH, WorkPlanSource(), dry_run=dry_run, force=force).run()
 
 def generate_summary():
     """Generate summary report"""
@@ -300,8 +324,13 @@ def main():
     print('Source: MARION2025.pdf (2024-2025 5-Year Facilities Work Program)')
     print('='*80)
 
-    imported = import_capacity_projects()
-    print(f'\n[OK] Imported {imported} projects from FLDOE Work Plan')
+    try:
+        result = import_capacity_projects(force='--force' in sys.argv[1:], dry_run='--dry-run' in sys.argv[1:])
+    except StagedImportError as e:
+        print(f'[ERROR] {e}')
+        return
+    if result['status'] == 'imported':
+        print(f'\n[OK] Imported {result["counts"]["rows"]} projects from FLDOE Work Plan')
 
     generate_summary()
 
@@ -5,12 +5,21 @@ This script imports expenditure and revenue data from Marion County Excel files
 and creates summary financial reports for the oversight dashboard.
 """
 
-import pandas as pd
-import sqlite3
+import os
+import re
 import sys
-from datetime import datetime
+import sqlite3
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.import_manifest import check_source, get_manifest_entry
+from utils.schema import table_exists
+from utils.staged_import import ImportSource, StagedImport, StagedImportError
+
 # Paths
 DB_PATH = Path(__file__).parent.parent / 'data' / 'contracts.db'
 MARION_DATA = Path(__file__).parent.parent / 'data' / 'marion_county'
@@ -66,99 +75,254 @@ def create_financial_tables():
     conn.close()
     print('[OK] Financial tables created')
 
-def parse_expenditures(file_path):
-    """Parse Marion County expenditures Excel file"""
-    print(f'\n[INFO] Parsing expenditures from {file_path}...')
-
-    # Read Excel with proper header row
-    df = pd.read_excel(file_path, skiprows=2)
-
-    # Clean up column names
-    df.columns = [
-        'account_name', 'account_code', 'description',
-        'general', 'special_revenue', 'debt_service', 'capital_projects', 'permanent',
-        'enterprise', 'internal_service', 'custodial', 'pension', 'trust',
-        'private_purpose', 'component_units', 'total', 'per_capita'
-    ]
-
-    # Remove header row and NaN rows
-    df = df[df['account_code'].notna()]
-    df = df[df['account_code'].apply(lambda x: str(x).replace('.0', '').replace('.', '').isdigit())]
-
-    # Convert numeric columns
-    numeric_cols = ['general', 'special_revenue', 'debt_service', 'capital_projects',
-                    'enterprise', 'internal_service', 'total', 'per_capita']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    print(f'[OK] Parsed {len(df)} expenditure records')
-    return df
-
-def parse_revenues(file_path):
-    """Parse Marion County revenues Excel file"""
-    print(f'\n[INFO] Parsing revenues from {file_path}...')
-
-    # Read Excel with proper header row
-    df = pd.read_excel(file_path, skiprows=2)
-
-    # Clean up column names
-    df.columns = [
-        'account_name', 'account_code', 'description',
-        'general', 'special_revenue', 'debt_service', 'capital_projects', 'permanent',
-        'enterprise', 'internal_service', 'custodial', 'pension', 'trust',
-        'private_purpose', 'component_units', 'total', 'per_capita'
-    ]
-
-    # Remove header row and NaN rows
-    df = df[df['account_code'].notna()]
-    df = df[df['account_code'].apply(lambda x: str(x).replace('.0', '').replace('.', '').isdigit() if isinstance(x, (int, float, str)) else False)]
-
-    # Convert numeric columns
-    numeric_cols = ['general', 'special_revenue', 'debt_service', 'capital_projects',
-                    'enterprise', 'internal_service', 'total', 'per_capita']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    print(f'[OK] Parsed {len(df)} revenue records')
-    return df
-
-def import_to_database(df, table_name, fiscal_year='2024'):
-    """Import DataFrame to database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Clear existing data for this fiscal year
-    cursor.execute(f'DELETE FROM {table_name} WHERE fiscal_year = ?', (fiscal_year,))
-    print(f'[INFO] Cleared existing {fiscal_year} data from {table_name}')
-
-    imported_count = 0
-    for _, row in df.iterrows():
-        cursor.execute(f'''
-            INSERT INTO {table_name} (
-                account_code, account_name, general_fund, special_revenue,
-                debt_service, capital_projects, enterprise, internal_service,
-                total_amount, per_capita, fiscal_year, imported_date, data_source
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            str(row['account_code']).replace('.0', ''),
-            row['description'],
-            float(row['general']),
-            float(row['special_revenue']),
-            float(row['debt_service']),
-            float(row['capital_projects']),
-            float(row['enterprise']),
-            float(row['internal_service']),
-            float(row['total']),
-            float(row['per_capita']),
-            fiscal_year,
-            datetime.now(),
-            'Marion County Excel Import'
-        ))
-        imported_count += 1
-
-    conn.commit()
-    conn.close()
-    print(f'[OK] Imported {imported_count} records to {table_name}')
+# Account codes are digits, optionally dotted (e.g. 511, 519.1)
+ACCOUNT_CODE = re.compile(r'\d+(?:\.\d+)*')
+
+# Title, fiscal year and two header rows precede the account lines
+FIRST_DATA_ROW = 4
+
+# Second title row, e.g. "Local Fiscal Year Ended September 30, 2024"
+FISCAL_YEAR_TITLE = re.compile(r'Fiscal Year Ended\D*?(\d{4})', re.IGNORECASE)
+
+DEFAULT_FISCAL_YEAR = '2024'
+
+# Record fields in INSERT order
+RECORD_COLUMNS = [
+    'account_code', 'account_name', 'general_fund', 'special_revenue', 'debt_service',
+    'capital_projects', 'enterprise', 'internal_service', 'total_amount', 'per_capita'
+]
+
+# Worksheet columns: B account code, C name, then the fund amounts we keep
+CODE_COLUMN = 1
+NAME_COLUMN = 2
+AMOUNT_COLUMNS = [3, 4, 5, 6, 8, 9, 15, 16]
+
+BATCH_SIZE = 5000
+
+def _account_code(value):
+    """Normalized account code, or None for section headings and blank rows"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    code = str(value).strip() if value is not None else ''
+    return code if ACCOUNT_CODE.fullmatch(code) else None
+
+def _amount(value):
+    """Cell value as a float (blanks and text count as 0)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def iter_account_records(file_path, batch_size=BATCH_SIZE, meta=None):
+    """
+    Stream typed account records from a county workbook, batch by batch.
+
+    The first worksheet is read with openpyxl's read-only row iterator, so
+    memory is bounded by batch_size rather than the file size. Yields lists
+    of tuples in RECORD_COLUMNS order. If given, meta receives the
+    'fiscal_year' named in the title rows (before the first batch).
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        batch = []
+        for index, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            if index < FIRST_DATA_ROW:
+                match = FISCAL_YEAR_TITLE.search(' '.join(str(v) for v in row if v is not None))
+                if match and meta is not None:
+                    meta.setdefault('fiscal_year', match.group(1))
+                continue
+            if len(row) <= AMOUNT_COLUMNS[-1]:
+                row = tuple(row) + (None,) * (AMOUNT_COLUMNS[-1] + 1 - len(row))
+            code = _account_code(row[CODE_COLUMN])
+            if code is None:
+                continue
+            name = row[NAME_COLUMN]
+            batch.append((code, str(name).strip() if name is not None else None,
+                          *(_amount(row[i]) for i in AMOUNT_COLUMNS)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        workbook.close()
+
+# ==================
+# PARALLEL MULTI-FILE IMPORT
+# ==================
+# Workbooks are parsed in a process pool; parsed batches come back over a
+# bounded queue to the single importing connection, since SQLite allows one
+# writer. Messages are (source index, kind, payload) with kind one of
+# 'start' (fiscal year), 'batch' (records), 'done' (row count) or 'error'.
+
+_worker_queue = None
+
+def _init_worker(queue):
+    global _worker_queue
+    _worker_queue = queue
+
+def source_table(file_path):
+    """Summary table for a workbook, from its file name"""
+    name = Path(file_path).name.lower()
+    if 'revenue' in name:
+        return 'revenues_summary'
+    if 'expenditure' in name:
+        return 'expenditures_summary'
+    return None
+
+def _parse_source(index, file_path, fiscal_year, batch_size):
+    """Worker: parse one workbook and send its batches to the importer"""
+    try:
+        meta = {} if fiscal_year is None else {'fiscal_year': fiscal_year}
+        count = 0
+        for batch in iter_account_records(file_path, batch_size, meta):
+            if count == 0:
+                _worker_queue.put((index, 'start', meta.get('fiscal_year', DEFAULT_FISCAL_YEAR)))
+            _worker_queue.put((index, 'batch', batch))
+            count += len(batch)
+        if count == 0:
+            _worker_queue.put((index, 'start', meta.get('fiscal_year', DEFAULT_FISCAL_YEAR)))
+        _worker_queue.put((index, 'done', count))
+    except Exception as e:
+        _worker_queue.put((index, 'error', f'{type(e).__name__}: {e}'))
+
+def iter_parsed(paths, jobs=None, batch_size=BATCH_SIZE, fiscal_year=None):
+    """
+    Parse workbooks in a process pool, yielding batches as they arrive.
+
+    Args:
+        paths: Workbook paths
+        jobs: Parser processes (defaults to CPU count, capped at len(paths))
+        batch_size: Records per batch
+        fiscal_year: Fiscal year for every file (default: each workbook title)
+
+    Yields:
+        (path index, fiscal year, list of records)
+
+    Raises:
+        StagedImportError: if any workbook failed to parse (after the rest
+            have finished)
+    """
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths)))
+    queue = multiprocessing.Queue(maxsize=jobs * 4)
+    pending = set(range(len(paths)))
+    fiscal_years, errors = {}, []
+
+    print(f'[INFO] Parsing {len(paths)} workbook(s) with {jobs} process(es)...')
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(queue,)) as pool:
+        for index, path in enumerate(paths):
+            future = pool.submit(_parse_source, index, path, fiscal_year, batch_size)
+            # A worker process that dies cannot report for itself
+            future.add_done_callback(
+                lambda f, index=index: f.exception() and queue.put((index, 'error', str(f.exception()))))
+        try:
+            while pending:
+                index, kind, payload = queue.get()
+                if kind in ('done', 'error'):
+                    pending.discard(index)
+                if kind == 'error':
+                    errors.append(f'{paths[index].name}: {payload}')
+                elif errors:
+                    continue
+                elif kind == 'start':
+                    fiscal_years[index] = payload
+                elif kind == 'batch':
+                    yield index, fiscal_years[index], payload
+                elif kind == 'done':
+                    print(f'  [{len(paths) - len(pending)}/{len(paths)}] {paths[index].name}: '
+                          f'{payload:,} rows (FY{fiscal_years[index]})')
+        finally:
+            # Drain if the consumer stopped early, so no worker blocks on put()
+            while pending:
+                index, kind, _ = queue.get()
+                if kind in ('done', 'error'):
+                    pending.discard(index)
+
+    if errors:
+        raise StagedImportError('; '.join(errors))
+
+class SummarySource(ImportSource):
+    """
+    County financial workbooks -> one summary table, keyed on account_code
+    within each fiscal year.
+
+    Workbooks are checked one by one against the import manifest; unchanged
+    ones are not parsed. An unchanged workbook that feeds the same table
+    and year as a changed one is re-read, and otherwise accounts missing
+    from that year are kept rather than deleted.
+    """
+
+    key = RECORD_COLUMNS[:1]
+    columns = RECORD_COLUMNS[1:]
+    required = ('account_code',)
+
+    def __init__(self, files=None, jobs=None, fiscal_year=None, batch_size=BATCH_SIZE):
+        super().__init__(files, jobs)
+        self.fiscal_year = fiscal_year
+        self.batch_size = batch_size
+        self.skipped_targets = set()
+        self._paths = {}
+
+    def prepare(self, conn):
+        if not table_exists(conn.cursor(), self.table):
+            create_financial_tables()
+
+    def source_paths(self):
+        files = self.files or sorted(MARION_DATA.glob('*.xlsx'))
+        return [path for path in files if source_table(path) == self.table]
+
+    def select(self, conn, force=False, dry_run=False):
+        checked = []
+        for path in self.source_paths():
+            changed, fingerprint = check_source(conn, path, touch=not dry_run)
+            entry = get_manifest_entry(conn, path)
+            self._paths[fingerprint['source']] = path
+            checked.append((changed or force, fingerprint, entry['target'] if entry else None))
+
+        changed_targets = {target for changed, _, target in checked if changed and target}
+        selected = []
+        for changed, fingerprint, target in checked:
+            if changed or target in changed_targets:
+                selected.append(fingerprint)
+            else:
+                print(f'[SKIP] {self._paths[fingerprint["source"]].name} unchanged since last import')
+                self.skipped_targets.add(target)
+        return selected
+
+    def extract(self, selected):
+        paths = [self._paths[fingerprint['source']] for fingerprint in selected]
+        for index, fiscal_year, batch in iter_parsed(paths, self.jobs, self.batch_size, self.fiscal_year):
+            yield {'fiscal_year': fiscal_year}, batch, selected[index]
+
+    def keep_missing(self, scope):
+        return self.target(scope) in self.skipped_targets
+
+    def on_insert(self, now):
+        return {'imported_date': now, 'data_source': 'Marion County Excel Import'}
+
+    def on_update(self, now):
+        return {'imported_date': now}
+
+    def validate(self, cursor, table, scopes):
+        problems = []
+        for scope in scopes:
+            cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE fiscal_year = ?', (scope['fiscal_year'],))
+            if cursor.fetchone()[0] == 0:
+                problems.append(f'no accounts for FY{scope["fiscal_year"]}')
+        return problems
+
+class ExpendituresSource(SummarySource):
+    name = 'marion-expenditures'
+    description = 'County expenditure workbooks -> expenditures_summary'
+    table = 'expenditures_summary'
+
+class RevenuesSource(SummarySource):
+    name = 'marion-revenues'
+    description = 'County revenue workbooks -> revenues_summary'
+    table = 'revenues_summary'
 
 def generate_summary_report():
     """Generate summary statistics from imported data"""
@@ -213,34 +377,53 @@ def generate_summary_report():
     conn.close()
 
 def main():
+    parser = argparse.ArgumentParser(description='Import county financial workbooks into the summary tables.')
+    parser.add_argument('files', nargs='*', type=Path,
+                        help=f'Workbooks to import (default: every .xlsx in {MARION_DATA})')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parser processes (default: one per CPU)')
+    parser.add_argument('--fiscal-year', default=None,
+                        help='Fiscal year for every file (default: read from each workbook title)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--force', action='store_true',
+                        help='Re-import files even if the manifest says they are unchanged')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Load and validate in staging, then discard')
+    args = parser.parse_args()
+
     print('='*80)
     print('MARION COUNTY FINANCIAL DATA IMPORT')
     print('='*80)
 
-    # Check if files exist
-    if not EXPENDITURES_FILE.exists():
-        print(f'[ERROR] File not found: {EXPENDITURES_FILE}')
-        return
-    if not REVENUES_FILE.exists():
-        print(f'[ERROR] File not found: {REVENUES_FILE}')
-        return
-
-    # Create tables
-    create_financial_tables()
-
-    # Parse Excel files
-    expenditures_df = parse_expenditures(EXPENDITURES_FILE)
-    revenues_df = parse_revenues(REVENUES_FILE)
-
-    # Import to database
-    import_to_database(expenditures_df, 'expenditures_summary', fiscal_year='2024')
-    import_to_database(revenues_df, 'revenues_summary', fiscal_year='2024')
-
-    # Generate summary report
-    generate_summary_report()
+    for path in args.files:
+        if not path.exists():
+            print(f'[ERROR] File not found: {path}')
+            return 1
+        if source_table(path) is None:
+            print(f'[ERROR] Cannot tell whether {path.name} holds revenues or expenditures')
+            return 1
+
+    # Expenditures and revenues are separate tables, so both imports run at
+    # once and their workbooks are parsed in parallel; SQLite serializes the
+    # two writers' short commits
+    sources = [source_class(args.files, args.jobs, args.fiscal_year, args.batch_size)
+               for source_class in (ExpendituresSource, RevenuesSource)]
+    sources = [source for source in sources if source.source_paths()]
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as pool:
+        futures = [pool.submit(StagedImport(DB_PATH, source, dry_run=args.dry_run, force=args.force).run)
+                   for source in sources]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+    for error in errors:
+        print(f'[ERROR] {error}')
+    if errors:
+        return 1
+
+    if not args.dry_run:
+        generate_summary_report()
 
     print('\n[OK] Import complete!')
     print('='*80)
+    return 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
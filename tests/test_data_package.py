@@ -0,0 +1,74 @@
+"""Public-records data package: published columns and rows."""
+
+import csv
+import json
+import sqlite3
+
+import pytest
+
+from utils.data_package import build_data_package, package_dir
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('''
+        CREATE TABLE contracts (
+            contract_id TEXT PRIMARY KEY,
+            title TEXT,
+            original_amount REAL,
+            current_amount REAL,
+            is_deleted INTEGER DEFAULT 0
+        );
+        ALTER TABLE contracts ADD COLUMN change_amount
+            REAL GENERATED ALWAYS AS (current_amount - original_amount) VIRTUAL;
+        CREATE TABLE payments (
+            payment_id INTEGER PRIMARY KEY,
+            contract_id TEXT,
+            amount REAL
+        );
+        INSERT INTO contracts (contract_id, title, original_amount, current_amount, is_deleted) VALUES
+            ('C-1', 'Roof', 100, 120, 0),
+            ('C-2', 'Paving', 50, 50, 1);
+        INSERT INTO payments (contract_id, amount) VALUES ('C-1', 10), ('C-2', 20);
+    ''')
+    yield conn
+    conn.close()
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_header_width_matches_row_width(conn, tmp_path):
+    package, _ = build_data_package(conn, 'csv', tmp_path)
+
+    directory = package_dir('csv', tmp_path)
+    for resource in package['resources']:
+        header, *rows = read_csv(directory / resource['file'])
+        assert header == [field['name'] for field in resource['schema']['fields']]
+        assert rows
+        assert all(len(row) == len(header) for row in rows)
+
+
+def test_soft_deleted_contracts_and_children_left_out(conn, tmp_path):
+    package, _ = build_data_package(conn, 'csv', tmp_path)
+
+    resources = {r['name']: r for r in package['resources']}
+    directory = package_dir('csv', tmp_path)
+    assert [row[0] for row in read_csv(directory / resources['contracts']['file'])[1:]] == ['C-1']
+    assert [row[1] for row in read_csv(directory / resources['payments']['file'])[1:]] == ['C-1']
+    assert resources['payments']['rows'] == 1
+
+
+def test_package_from_older_layout_is_rebuilt(conn, tmp_path):
+    build_data_package(conn, 'csv', tmp_path)
+    path = package_dir('csv', tmp_path) / 'datapackage.json'
+    stale = json.loads(path.read_text(encoding='utf-8'))
+    del stale['layout']
+    path.write_text(json.dumps(stale), encoding='utf-8')
+
+    _, summary = build_data_package(conn, 'csv', tmp_path)
+
+    assert all(entry['rebuilt'] for entry in summary)
@@ -0,0 +1,131 @@
+"""Work plan PDF import: page parsing, normalization and reconciliation."""
+
+from scripts.import_fldoe_pdf import normalize_rows, parse_page_text, reconcile
+
+# Layout-mode text (pypdf extract_text(extraction_mode='layout')) of a
+# capacity schedule page and of the page after it, which has no header
+CAPACITY_PAGE = '''\
+Capacity Project Schedules
+
+Project Description                 Location                                     2024 - 2025   2025 - 2026   2026 - 2027   2027 - 2028   2028 - 2029   Total            Funded
+
+
+New 16 classroom addition           Liberty Middle                 Planned Cost: $10,230,418   $0            $0            $0            $0            $10,230,418      Yes
+to replace portables                School                         Student Stations384           0             0             0             0             384
+                                                                                  Total Classrooms16            0             0             0             0             16
+                                                                                  Gross Sq Ft   18,000        0             0             0             0             18,000
+'''
+
+CONTINUED_PAGE = '''\
+12 classroom addition               Ocala Springs Elementary       Planned Cost: $0            $0            $0            $10,500,000   $0            $10,500,000      No
+                                                                                  Student Stations0             0             0             248           0             248
+                                                                                  Total Classrooms0             0             0             12            0             12
+                                                                                  Gross Sq Ft   0             0             0             12,720        0             12,720
+
+
+Other Project Schedules
+
+HVAC replacement                    Belleview High                 Planned Cost: $0            $2,500,000    $0            $0            $0            $2,500,000       Yes
+'''
+
+
+def next_year(text):
+    """The same page in the following year's plan."""
+    for year in range(2028, 2023, -1):
+        text = text.replace(f'{year} - {year + 1}', f'{year + 1} - {year + 2}')
+    return text
+
+
+def parse(*pages):
+    return normalize_rows([parse_page_text(page) for page in pages])
+
+
+def hand_entered(code, name, location, budget, plan='2024-2025'):
+    return {'project_code': code, 'project_name': name, 'location': location,
+            'description': f'{name}.', 'budget_amount': budget,
+            'data_source': f'FLDOE {plan} Work Plan'}
+
+
+LIBERTY = hand_entered('LIBERTY-MS-ADD', 'Liberty Middle - 16 Classroom Addition to Replace Portables',
+                       'Liberty Middle School', 10230418)
+
+
+def test_capacity_row_spans_several_lines():
+    page = parse_page_text(CAPACITY_PAGE)
+
+    assert page['fiscal_years'] == ['2024-2025', '2025-2026', '2026-2027', '2027-2028', '2028-2029']
+    [row] = page['rows']
+    assert row['description'] == 'New 16 classroom addition to replace portables'
+    assert row['location'] == 'Liberty Middle School'
+    assert row['costs'] == [10230418, 0, 0, 0, 0]
+    assert row['total'] == 10230418
+    assert row['funded'] is True
+    assert (row['capacity'], row['num_classrooms'], row['square_footage']) == (384, 16, 18000)
+
+
+def test_page_without_header_inherits_fiscal_years():
+    assert parse_page_text(CONTINUED_PAGE)['fiscal_years'] == []
+
+    plan, projects = parse(CAPACITY_PAGE, CONTINUED_PAGE)
+
+    assert plan == '2024-2025'
+    ocala, hvac = projects[1], projects[2]
+    assert (ocala['start_date'], ocala['estimated_completion']) == ('2027-07-01', '2028-06-30')
+    assert hvac['start_date'] == '2025-07-01'
+    assert hvac['project_type'] == 'Renovation'
+    assert hvac['data_source'] == 'FLDOE 2024-2025 Work Plan'
+
+
+def test_unfunded_row_is_noted_and_planned():
+    _, projects = parse(CAPACITY_PAGE, CONTINUED_PAGE)
+    liberty, ocala = projects[0], projects[1]
+
+    assert ocala['description'] == '12 classroom addition (Not yet funded)'
+    assert ocala['status'] == 'Planning'
+    assert ocala['capacity'] == 248
+    # Funded and scheduled in the plan's first year
+    assert liberty['status'] == 'Under Construction'
+
+
+def test_codes_leave_out_plan_year():
+    _, this_year = parse(CAPACITY_PAGE, CONTINUED_PAGE)
+    plan, next_plan = parse(next_year(CAPACITY_PAGE), CONTINUED_PAGE)
+
+    assert plan == '2025-2026'
+    assert [p['project_code'] for p in next_plan] == [p['project_code'] for p in this_year]
+    assert this_year[2]['project_code'].startswith('WP-BELLEVIEW-HIGH-')
+
+
+def test_reconcile_reuses_hand_entered_code():
+    plan, projects = parse(next_year(CAPACITY_PAGE), CONTINUED_PAGE)
+    existing = [LIBERTY, hand_entered('ELEM-W-SW', 'New Southwest Elementary School W',
+                                      'Southwest Marion County (Location TBD)', 45233977)]
+
+    loaded = {p['project_code']: p for p in reconcile(projects, existing, plan)}
+
+    liberty = loaded['LIBERTY-MS-ADD']
+    assert liberty['project_name'] == LIBERTY['project_name']
+    assert liberty['location'] == 'Liberty Middle School'
+    assert liberty['start_date'] == '2025-07-01'
+    assert liberty['data_source'] == 'FLDOE 2025-2026 Work Plan'
+    assert 'ELEM-W-SW' not in loaded
+    assert len(loaded) == 3
+
+
+def test_reconcile_leaves_hand_entered_rows_of_same_plan():
+    plan, projects = parse(CAPACITY_PAGE, CONTINUED_PAGE)
+
+    loaded = reconcile(projects, [LIBERTY], plan)
+
+    assert [p['project_code'] for p in loaded if 'Liberty' in p['project_name']] == []
+    assert len(loaded) == 2
+
+
+def test_reconcile_leaves_rows_of_newer_plan():
+    plan, projects = parse(CAPACITY_PAGE, CONTINUED_PAGE)
+    _, newer = parse(next_year(CAPACITY_PAGE), CONTINUED_PAGE)
+    hvac = dict(newer[2], budget_amount=2700000, data_source='FLDOE 2025-2026 Work Plan')
+
+    loaded = reconcile(projects, [hvac], plan)
+
+    assert hvac['project_code'] not in [p['project_code'] for p in loaded]
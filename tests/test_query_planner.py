@@ -0,0 +1,114 @@
+"""Ask AI query planner: question parsing, statement cache, cost guard."""
+
+import sqlite3
+
+import pytest
+
+from utils.entities import Entity, Mention
+from utils.query_planner import QueryCostExceeded, QueryPlanner, plan_question
+
+
+def test_dollar_and_day_thresholds():
+    plan = plan_question('projects over $5 million delayed more than 30 days', [])
+
+    assert ('min_amount', 5e6) in plan.filters
+    assert ('min_delay', 30) in plan.filters
+    assert ('delayed', 1) in plan.filters
+
+
+def test_upper_thresholds_and_units():
+    plan = plan_question('projects under 200k', [])
+
+    assert plan.filters == [('max_amount', 200_000)]
+
+
+def test_bare_number_is_not_a_threshold():
+    assert plan_question('projects over 5', []) is None
+
+
+def test_flags():
+    plan = plan_question('completed projects within budget', [])
+
+    assert ('over_budget', 0) in plan.filters
+    assert ('status', 'Completed') in plan.filters
+    assert plan_question('projects on schedule', []).filters == [('delayed', 0)]
+
+
+def test_order_phrase_wins_over_flag_default():
+    assert plan_question('largest delayed projects', []).order == 'amount_desc'
+    assert plan_question('delayed projects', []).order == 'delay_desc'
+    assert plan_question('projects over budget', []).order == 'variance_desc'
+
+
+def test_top_n_and_aggregate():
+    plan = plan_question('top 5 over budget projects', [])
+    assert plan.limit == 5
+    assert plan.template == 'list'
+
+    assert plan_question('how many delayed projects', []).template == 'aggregate'
+
+
+def test_entity_name_is_not_read_as_a_filter():
+    project = Entity('project', 'C-9', 'Late Start Program')
+    plan = plan_question('status of late start program', [Mention(project, 'late start program')])
+
+    assert plan.entities == [project]
+    assert plan.filters == []
+
+
+def test_question_without_constraints_has_no_plan():
+    assert plan_question('tell me about the projects', []) is None
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = tmp_path / 'contracts.db'
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE contracts (
+            contract_id TEXT PRIMARY KEY, title TEXT, school_name TEXT, status TEXT,
+            current_amount REAL, total_paid REAL, percent_complete REAL, delay_days INTEGER,
+            budget_variance_pct REAL, is_delayed INTEGER, is_over_budget INTEGER,
+            surtax_category TEXT, is_deleted INTEGER DEFAULT 0
+        );
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+        INSERT INTO contracts (contract_id, title, current_amount, delay_days, is_delayed, surtax_category)
+        SELECT 'C-' || i, 'Project ' || i, i * 1000, i % 90, i % 2, 'new_construction' FROM n;
+    ''')
+    conn.commit()
+    conn.close()
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return connect
+
+
+def test_same_shape_reuses_sql_and_binds_new_values(connect):
+    planner = QueryPlanner(connect)
+    small, large = (plan_question(q, []) for q in ('delayed projects over $1 million',
+                                                     'delayed projects over $4 million'))
+
+    first_sql, first_params = planner.statement(small)
+    large.sql = lambda: pytest.fail('SQL rendered again for a cached shape')
+    second_sql, second_params = planner.statement(large)
+
+    assert second_sql == first_sql
+    assert first_params != second_params
+    assert (planner.hits, planner.misses) == (1, 1)
+    assert all(row['current_amount'] >= 4e6 for row in planner.execute(large))
+
+
+def test_cost_guard_aborts_long_scan(connect):
+    planner = QueryPlanner(connect, pool_size=1, max_vm_steps=1000)
+    plan = plan_question('delayed projects over $1 million', [])
+
+    with pytest.raises(QueryCostExceeded):
+        planner.execute(plan)
+
+    assert planner.stats()['aborted'] == 1
+    # The connection went back to the pool with its handler cleared
+    planner.max_vm_steps = 10_000_000
+    assert len(planner.execute(plan)) == 10
+    assert planner.stats()['pooled_connections'] == 1
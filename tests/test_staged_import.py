@@ -0,0 +1,214 @@
+"""Staged import: swap, no-op imports, rollback, dry runs."""
+
+import sqlite3
+
+import pytest
+
+from utils.import_manifest import get_manifest_entry
+from utils.staged_import import ImportSource, StagedImport, StagedImportError
+
+
+class WidgetSource(ImportSource):
+    name = 'widgets'
+    table = 'widgets'
+    key = ('code',)
+    columns = ('label', 'amount')
+    required = ('code', 'label')
+
+    def __init__(self, path, records, fail_after=None):
+        super().__init__([path])
+        self.records = records
+        self.fail_after = fail_after
+
+    def extract(self, selected):
+        for index, record in enumerate(self.records):
+            if self.fail_after is not None and index >= self.fail_after:
+                raise StagedImportError('parser failed')
+            yield None, [record], selected[0]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / 'test.db'
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE widgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT,
+            label TEXT,
+            amount REAL
+        );
+        CREATE INDEX idx_widgets_label ON widgets(label);
+        CREATE TABLE data_versions (table_name TEXT PRIMARY KEY, version INTEGER);
+        INSERT INTO data_versions VALUES ('widgets', 0);
+        CREATE TRIGGER widgets_version AFTER INSERT ON widgets BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE table_name = 'widgets';
+        END;
+        INSERT INTO widgets (code, label, amount) VALUES ('A', 'alpha', 1), ('B', 'beta', 2);
+        UPDATE data_versions SET version = 0;
+    ''')
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / 'widgets.txt'
+    path.write_text('v1')
+    return path
+
+
+def query(db, sql, params=()):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run(db, source, **kwargs):
+    return StagedImport(db, source, log=lambda message: None, **kwargs).run()
+
+
+def version(db):
+    return query(db, "SELECT version FROM data_versions WHERE table_name = 'widgets'")[0][0]
+
+
+def test_swap_applies_diff_and_restores_dependents(db, source_file):
+    records = [('A', 'alpha', 10.0), ('C', 'gamma', 3.0)]
+    result = run(db, WidgetSource(source_file, records))
+
+    assert result['status'] == 'imported'
+    assert result['counts']['inserted'] == 1
+    assert result['counts']['updated'] == 1
+    assert result['counts']['deleted'] == 1
+    assert query(db, 'SELECT code, label, amount FROM widgets ORDER BY code') == [
+        ('A', 'alpha', 10.0), ('C', 'gamma', 3.0)]
+    assert version(db) == 1
+
+    dependents = query(db, "SELECT type, name FROM sqlite_master WHERE tbl_name = 'widgets' AND sql IS NOT NULL")
+    assert ('index', 'idx_widgets_label') in dependents
+    assert ('trigger', 'widgets_version') in dependents
+    assert query(db, "SELECT name FROM sqlite_master WHERE name LIKE '%staging%'") == []
+
+    # The restored trigger still fires
+    conn = sqlite3.connect(db)
+    conn.execute("INSERT INTO widgets (code, label) VALUES ('D', 'delta')")
+    conn.commit()
+    conn.close()
+    assert version(db) == 2
+
+
+def test_unchanged_rows_skip_swap_and_version_bump(db, source_file):
+    records = [('A', 'alpha', 1.0), ('B', 'beta', 2.0)]
+    table_sql = query(db, "SELECT sql FROM sqlite_master WHERE name = 'widgets'")
+
+    result = run(db, WidgetSource(source_file, records), force=True)
+
+    assert result['status'] == 'imported'
+    assert result['counts']['unchanged'] == 2
+    assert 'swap' not in [metric['stage'] for metric in result['metrics']]
+    assert version(db) == 0
+    assert query(db, "SELECT sql FROM sqlite_master WHERE name = 'widgets'") == table_sql
+
+    conn = sqlite3.connect(db)
+    assert get_manifest_entry(conn, source_file)['row_count'] == 2
+    conn.close()
+
+
+def test_second_run_skips_unchanged_source(db, source_file):
+    records = [('A', 'alpha', 5.0)]
+    run(db, WidgetSource(source_file, records))
+
+    result = run(db, WidgetSource(source_file, records))
+
+    assert result['status'] == 'unchanged'
+
+
+def test_validation_failure_leaves_live_table(db, source_file):
+    before = query(db, 'SELECT * FROM widgets ORDER BY id')
+
+    with pytest.raises(StagedImportError):
+        run(db, WidgetSource(source_file, [('A', None, 1.0)]))
+
+    assert query(db, 'SELECT * FROM widgets ORDER BY id') == before
+    assert version(db) == 0
+    assert query(db, "SELECT name FROM sqlite_master WHERE name LIKE '%staging%'") == []
+    conn = sqlite3.connect(db)
+    assert get_manifest_entry(conn, source_file) is None
+    conn.close()
+
+
+def test_extract_failure_rolls_back(db, source_file):
+    before = query(db, 'SELECT * FROM widgets ORDER BY id')
+    records = [('A', 'alpha', 9.0), ('Z', 'zeta', 1.0)]
+
+    with pytest.raises(StagedImportError, match='parser failed'):
+        run(db, WidgetSource(source_file, records, fail_after=1))
+
+    assert query(db, 'SELECT * FROM widgets ORDER BY id') == before
+    assert query(db, "SELECT name FROM sqlite_master WHERE name LIKE '%staging%'") == []
+
+
+def test_dry_run_writes_nothing(db, source_file):
+    before = query(db, 'SELECT * FROM widgets ORDER BY id')
+
+    result = run(db, WidgetSource(source_file, [('Z', 'zeta', 1.0)]), dry_run=True)
+
+    assert result['status'] == 'dry_run'
+    assert result['counts']['inserted'] == 1
+    assert query(db, 'SELECT * FROM widgets ORDER BY id') == before
+    assert version(db) == 0
+    conn = sqlite3.connect(db)
+    assert get_manifest_entry(conn, source_file) is None
+    conn.close()
+
+
+class GadgetSource(WidgetSource):
+    table = 'gadgets'
+
+
+def test_generated_columns_survive_staging(db, source_file):
+    # A TEXT primary key, like contracts', rules out SQLite's table-to-table
+    # copy shortcut, under which INSERT ... SELECT * would still work
+    conn = sqlite3.connect(db)
+    conn.executescript('''
+        CREATE TABLE gadgets (code TEXT PRIMARY KEY, label TEXT, amount REAL);
+        ALTER TABLE gadgets ADD COLUMN doubled REAL GENERATED ALWAYS AS (amount * 2) VIRTUAL;
+        INSERT INTO gadgets (code, label, amount) VALUES ('A', 'alpha', 1);
+    ''')
+    conn.close()
+
+    run(db, GadgetSource(source_file, [('A', 'alpha', 4.0), ('B', 'beta', 2.0)]))
+
+    assert query(db, 'SELECT code, doubled FROM gadgets ORDER BY code') == [('A', 8.0), ('B', 4.0)]
+
+
+class RacingWidgetSource(WidgetSource):
+    """Another writer changes the live table while this import is staged."""
+
+    def __init__(self, path, records, db):
+        super().__init__(path, records)
+        self.db = db
+
+    def extract(self, selected):
+        conn = sqlite3.connect(self.db)
+        conn.execute("INSERT INTO widgets (code, label) VALUES ('R', 'racer')")
+        conn.commit()
+        conn.close()
+        yield from super().extract(selected)
+
+
+@pytest.mark.parametrize('records', [
+    [('A', 'alpha', 7.0)],                        # would swap
+    [('A', 'alpha', 1.0), ('B', 'beta', 2.0)],    # would only record the manifest
+])
+def test_write_during_import_aborts_swap(db, source_file, records):
+    with pytest.raises(StagedImportError, match='changed while'):
+        run(db, RacingWidgetSource(source_file, records, db), force=True)
+
+    assert query(db, 'SELECT code FROM widgets ORDER BY code') == [('A',), ('B',), ('R',)]
+    conn = sqlite3.connect(db)
+    assert get_manifest_entry(conn, source_file) is None
+    conn.close()
@@ -0,0 +1,88 @@
+"""
+Streaming answer parts for the Ask AI assistant.
+
+An answer is a sequence of events, sent to the browser as NDJSON (one JSON
+object per line):
+
+    {"type": "header", "text": "...", "intent": "...", "data": ...}
+    {"type": "row", "text": "...", "data": {...}}          (zero or more)
+    {"type": "suggestions", "suggestions": [...]}
+    {"type": "done", "cached": false}
+
+Intent handlers either return a complete response dict, which
+response_parts() splits into events, or are generators yielding events
+(built with header()/row()/suggestions()) as each piece of the answer is
+computed. collect_parts() folds events back into the response dict used by
+the non-streaming /api/ask and the answer cache.
+"""
+
+import json
+
+
+def header(text, intent=None, data=None):
+    event = {'type': 'header', 'text': text, 'intent': intent}
+    if data is not None:
+        event['data'] = data
+    return event
+
+
+def row(text, data=None):
+    event = {'type': 'row', 'text': text}
+    if data is not None:
+        event['data'] = data
+    return event
+
+
+def suggestions(items):
+    return {'type': 'suggestions', 'suggestions': list(items)}
+
+
+def response_parts(response):
+    """
+    Split a complete response dict into events.
+
+    The first answer line becomes the header and each remaining line a row.
+    When the answer has one bullet line per data item, each item rides on
+    its bullet row; otherwise the data is attached to the header.
+    """
+    lines = response['answer'].split('\n')
+    data = response.get('data')
+    bullets = [i for i, line in enumerate(lines[1:], start=1) if line.startswith('•')]
+
+    per_row = isinstance(data, list) and data and len(data) == len(bullets)
+    row_data = dict(zip(bullets, data)) if per_row else {}
+
+    yield header(lines[0], response.get('intent'), None if per_row else data)
+    for i, line in enumerate(lines[1:], start=1):
+        yield row(line, row_data.get(i))
+    yield suggestions(response.get('suggestions', []))
+
+
+def collect_parts(parts):
+    """Fold a sequence of events back into a response dict."""
+    lines, row_data = [], []
+    response = {'answer': '', 'suggestions': []}
+    for event in parts:
+        kind = event['type']
+        if kind == 'header':
+            lines.append(event['text'])
+            if event.get('intent'):
+                response['intent'] = event['intent']
+            if 'data' in event:
+                response['data'] = event['data']
+        elif kind == 'row':
+            lines.append(event['text'])
+            if 'data' in event:
+                row_data.append(event['data'])
+        elif kind == 'suggestions':
+            response['suggestions'] = event['suggestions']
+
+    response['answer'] = '\n'.join(lines)
+    if row_data and 'data' not in response:
+        response['data'] = row_data
+    return response
+
+
+def to_ndjson(event):
+    """Serialize one event as an NDJSON line."""
+    return json.dumps(event, default=str) + '\n'
@@ -0,0 +1,74 @@
+"""
+Answer cache for the Ask AI assistant.
+
+Committee members click the same guided prompts and suggestion chips over and
+over during a meeting. Questions are normalized (case, whitespace,
+punctuation, synonyms) and answers are cached on the normalized question plus
+the data version, so a repeat is served from memory until the data changes.
+
+Intent matching runs on the normalized question too, which guarantees that
+two questions sharing a cache key also get the same answer.
+"""
+
+import re
+
+from utils.cache import VersionedCache
+
+ANSWER_CACHE_SIZE = 512
+
+# Whole-word rewrites applied after punctuation and case are stripped
+SYNONYMS = {
+    'whats': 'what is',
+    'hs': 'high school',
+    'delay': 'delayed',
+    'delays': 'delayed',
+    'overdue': 'delayed',
+    'overbudget': 'over budget',
+    'overruns': 'overrun',
+    'overran': 'overrun',
+    'spend': 'spending',
+    'expenditure': 'spending',
+    'expenditures': 'spending',
+    'categories': 'category',
+}
+
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}\b)')
+_PUNCTUATION = re.compile(r"[^\w\s$%.]|_")
+_TRAILING_DOT = re.compile(r'\.(?!\d)')
+_SYNONYM = re.compile(r'\b(' + '|'.join(map(re.escape, SYNONYMS)) + r')\b')
+
+_answer_cache = VersionedCache('ask_answers', maxsize=ANSWER_CACHE_SIZE)
+
+
+def normalize_question(question):
+    """
+    Normalize a question for matching and caching.
+
+    Lowercases, drops thousands separators and punctuation (keeping $, % and
+    decimal points inside numbers), collapses whitespace and rewrites
+    synonyms.
+
+    Example:
+        "  What's the OVER-budget list?? " -> "what is the over budget list"
+    """
+    text = question.lower().replace("'", '')
+    text = _THOUSANDS.sub('', text)
+    text = _PUNCTUATION.sub(' ', text)
+    text = _TRAILING_DOT.sub(' ', text)
+    text = ' '.join(text.split())
+    return _SYNONYM.sub(lambda m: SYNONYMS[m.group(1)], text)
+
+
+def get_cached_answer(normalized, version):
+    """Return the cached answer for a normalized question, or None."""
+    return _answer_cache.get(normalized, version)
+
+
+def cache_answer(normalized, version, response):
+    """Store an answer for a normalized question at a data version."""
+    _answer_cache.set(normalized, version, response)
+
+
+def cache_stats():
+    """Hit-rate metrics for the answer cache."""
+    return _answer_cache.stats()
@@ -0,0 +1,94 @@
+"""
+In-process caches keyed on the database data version.
+
+The data_versions table (see utils/schema.py) holds one counter per tracked
+table, bumped by triggers on every insert, update and delete. Summing the
+counters gives a cheap, monotonically increasing version that changes whenever
+the underlying data does, so cached results can be reused until then.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def get_data_version(conn, tables=None):
+    """
+    Get the current data version.
+
+    Args:
+        conn: SQLite connection
+        tables: Optional list of table names to restrict the version to
+
+    Returns:
+        Integer version that increases whenever any tracked row changes
+    """
+    cursor = conn.cursor()
+    if tables:
+        placeholders = ','.join('?' * len(tables))
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(version), 0) FROM data_versions
+            WHERE table_name IN ({placeholders})
+        ''', list(tables))
+    else:
+        cursor.execute('SELECT COALESCE(SUM(version), 0) FROM data_versions')
+    return cursor.fetchone()[0]
+
+
+class VersionedCache:
+    """Thread-safe LRU cache whose entries are valid for one data version."""
+
+    def __init__(self, name, maxsize=128):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        """Return the cached value for key at version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, version, value):
+        """Store a value for key at version, evicting the least recently used."""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, version, compute):
+        """Return the cached value, calling compute() to fill a miss."""
+        value = self.get(key, version)
+        if value is None:
+            value = compute()
+            self.set(key, version, value)
+        return value
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit-rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+            }
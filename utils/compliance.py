@@ -0,0 +1,346 @@
+"""
+Compliance scoring engine for the surtax oversight dashboard.
+
+All category metrics come from a single grouped scan of the contracts table.
+The raw metrics are cached per data version, and the score cards are built
+from them by pluggable scoring rules, so changing a formula never re-queries
+the database.
+"""
+
+import time
+import logging
+from datetime import datetime
+
+from utils.cache import VersionedCache, get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Voter-approved surtax categories
+APPROVED_CATEGORIES = ['New Construction', 'Renovation', 'Technology', 'Safety & Security', 'Maintenance']
+
+# Transparency checklist (not tracked in the database yet)
+TRANSPARENCY_ITEMS = {
+    'public_meetings': True,
+    'annual_report': True,
+    'website_updated': True,
+    'financial_audit': False,  # Placeholder
+    'performance_audit': False  # Placeholder
+}
+
+_metrics_cache = VersionedCache('compliance_metrics', maxsize=4)
+
+
+# ==================
+# SCORING RULES
+# ==================
+
+def deduction_score(rate, points_per_percent):
+    """Start at 100 and deduct a fixed number of points per percent of rate."""
+    return max(0, 100 - (rate * points_per_percent))
+
+
+def status_for(score, good=80, warning=60):
+    """Map a score onto good / warning / critical."""
+    return 'good' if score >= good else 'warning' if score >= warning else 'critical'
+
+
+# Each rule takes the metrics dict and returns a 0-100 score. Override any of
+# them by passing scorers={...} to evaluate_compliance().
+DEFAULT_SCORERS = {
+    'financial': lambda m: deduction_score(m['financial']['over_budget_pct'], 5),  # 5 points per percent over budget
+    'schedule': lambda m: deduction_score(m['schedule']['delayed_pct'], 3),  # 3 points per percent delayed
+    'funds': lambda m: m['funds']['eligible_pct'],
+    'transparency': lambda m: m['transparency']['met_pct'],
+    'vendor': lambda m: deduction_score(m['vendor']['high_co_pct'], 2),
+}
+
+
+# ==================
+# METRICS (single scan)
+# ==================
+
+def collect_metrics(conn, fiscal_year=None):
+    """
+    Collect every compliance metric in one pass over contracts.
+
+    Rows are grouped by (surtax_category, vendor_id) so per-category totals
+    and distinct vendor counts can be folded together in Python.
+
+    Args:
+        conn: SQLite connection
+        fiscal_year: Optional fiscal year to restrict the scan to
+
+    Returns:
+        Dict of raw metrics per compliance category
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT
+            surtax_category,
+            vendor_id,
+            COUNT(*) as total,
+            SUM(current_amount) as total_budget,
+            SUM(total_paid) as total_spent,
+            COUNT(CASE WHEN is_over_budget = 1 THEN 1 END) as over_budget_count,
+            COUNT(CASE WHEN status = 'Active' THEN 1 END) as active_count,
+            COUNT(CASE WHEN status = 'Active' AND is_delayed = 1 THEN 1 END) as delayed_count,
+            SUM(CASE WHEN status = 'Active' THEN (CASE WHEN is_delayed = 1 THEN delay_days ELSE 0 END) END) as delay_sum,
+            COUNT(CASE WHEN status = 'Active' THEN (CASE WHEN is_delayed = 1 THEN delay_days ELSE 0 END) END) as delay_n,
+            SUM(change_order_count) as co_sum,
+            COUNT(change_order_count) as co_n,
+            COUNT(CASE WHEN change_order_count > 2 THEN 1 END) as high_co_count
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+    ''' + (' AND fiscal_year = ?' if fiscal_year is not None else '') + '''
+        GROUP BY surtax_category, vendor_id
+    ''', [fiscal_year] if fiscal_year is not None else [])
+
+    fin = {'total': 0, 'total_budget': None, 'total_spent': None, 'over_budget_count': 0}
+    sched = {'total': 0, 'delayed_count': 0, 'delay_sum': 0, 'delay_n': 0}
+    category_totals = {}
+    vendor_ids = set()
+    vendor = {'co_sum': 0, 'co_n': 0, 'high_co_count': 0}
+
+    def add(a, b):
+        return b if a is None else a + (b or 0)
+
+    for row in cursor.fetchall():
+        fin['total'] += row['total']
+        fin['over_budget_count'] += row['over_budget_count']
+        if row['total_budget'] is not None:
+            fin['total_budget'] = add(fin['total_budget'], row['total_budget'])
+        if row['total_spent'] is not None:
+            fin['total_spent'] = add(fin['total_spent'], row['total_spent'])
+
+        sched['total'] += row['active_count']
+        sched['delayed_count'] += row['delayed_count']
+        sched['delay_sum'] += row['delay_sum'] or 0
+        sched['delay_n'] += row['delay_n']
+
+        cat = category_totals.setdefault(row['surtax_category'], {'count': 0, 'total': None})
+        cat['count'] += row['total']
+        if row['total_budget'] is not None:
+            cat['total'] = add(cat['total'], row['total_budget'])
+
+        if row['vendor_id'] is not None:
+            vendor_ids.add(row['vendor_id'])
+            vendor['co_sum'] += row['co_sum'] or 0
+            vendor['co_n'] += row['co_n']
+            vendor['high_co_count'] += row['high_co_count']
+
+    fin['over_budget_pct'] = (fin['over_budget_count'] / fin['total'] * 100) if fin['total'] > 0 else 0
+
+    sched['delayed_pct'] = (sched['delayed_count'] / sched['total'] * 100) if sched['total'] > 0 else 0
+    sched['avg_delay'] = (sched['delay_sum'] / sched['delay_n']) if sched['delay_n'] else None
+
+    valid_funds = sum(c['total'] or 0 for name, c in category_totals.items() if name in APPROVED_CATEGORIES)
+    total_funds = sum(c['total'] or 0 for c in category_totals.values())
+    funds = {
+        'approved_count': len([name for name in category_totals if name in APPROVED_CATEGORIES]),
+        'category_count': len(category_totals),
+        'valid_funds': valid_funds,
+        'total_funds': total_funds,
+        'eligible_pct': (valid_funds / total_funds * 100) if total_funds > 0 else 100,
+    }
+
+    vendor['vendor_count'] = len(vendor_ids)
+    vendor['avg_change_orders'] = (vendor['co_sum'] / vendor['co_n']) if vendor['co_n'] else None
+    vendor['high_co_pct'] = (vendor['high_co_count'] / vendor['vendor_count'] * 100) if vendor['vendor_count'] > 0 else 0
+
+    transparency = {
+        'items': dict(TRANSPARENCY_ITEMS),
+        'met_pct': sum(1 for v in TRANSPARENCY_ITEMS.values() if v) / len(TRANSPARENCY_ITEMS) * 100,
+    }
+
+    return {
+        'financial': fin,
+        'schedule': sched,
+        'funds': funds,
+        'transparency': transparency,
+        'vendor': vendor,
+    }
+
+
+def get_compliance_metrics(conn, fiscal_year=None):
+    """Get compliance metrics, reusing the cached scan while data is unchanged."""
+    version = get_data_version(conn, ['contracts'])
+    key = ('metrics', fiscal_year)
+    cached = _metrics_cache.get(key, version)
+    if cached is not None:
+        return cached, 0.0
+
+    start = time.perf_counter()
+    metrics = collect_metrics(conn, fiscal_year)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    _metrics_cache.set(key, version, metrics)
+    return metrics, elapsed_ms
+
+
+# ==================
+# SCORE CARDS
+# ==================
+
+def _financial_card(m, score):
+    fin = m['financial']
+    return {
+        'name': 'Financial Management',
+        'icon': 'currency-dollar',
+        'score': int(score),
+        'status': status_for(score),
+        'metrics': [
+            {'label': 'Total Budget', 'value': f"${fin['total_budget']:,.0f}" if fin['total_budget'] else '$0'},
+            {'label': 'Total Spent', 'value': f"${fin['total_spent']:,.0f}" if fin['total_spent'] else '$0'},
+            {'label': 'Over Budget Projects', 'value': f"{fin['over_budget_count'] or 0} of {fin['total'] or 0}"},
+            {'label': 'Budget Variance Rate', 'value': f"{fin['over_budget_pct']:.1f}%"}
+        ],
+        'recommendations': [
+            'Continue monitoring projects approaching budget limits',
+            'Review change order approval processes'
+        ] if fin['over_budget_pct'] > 10 else ['All projects within acceptable budget variance']
+    }
+
+
+def _schedule_card(m, score):
+    sched = m['schedule']
+    return {
+        'name': 'Schedule Performance',
+        'icon': 'clock',
+        'score': int(score),
+        'status': status_for(score),
+        'metrics': [
+            {'label': 'Active Projects', 'value': str(sched['total'] or 0)},
+            {'label': 'Delayed Projects', 'value': str(sched['delayed_count'] or 0)},
+            {'label': 'On-Time Rate', 'value': f"{100 - sched['delayed_pct']:.1f}%"},
+            {'label': 'Avg Delay (days)', 'value': f"{sched['avg_delay']:.0f}" if sched['avg_delay'] else '0'}
+        ],
+        'recommendations': [
+            'Investigate root causes of delays',
+            'Consider schedule recovery plans'
+        ] if sched['delayed_pct'] > 20 else ['Schedule performance is acceptable']
+    }
+
+
+def _funds_card(m, score):
+    funds = m['funds']
+    return {
+        'name': 'Use of Funds',
+        'icon': 'check-circle',
+        'score': int(score),
+        'status': status_for(score, good=95, warning=80),
+        'metrics': [
+            {'label': 'Approved Categories', 'value': str(funds['approved_count'])},
+            {'label': 'Total Categories', 'value': str(funds['category_count'])},
+            {'label': 'Eligible Spending', 'value': f"${funds['valid_funds']:,.0f}"},
+            {'label': 'Compliance Rate', 'value': f"{score:.1f}%"}
+        ],
+        'recommendations': ['All funds used for voter-approved purposes'] if score >= 95 else ['Review categorization of expenditures']
+    }
+
+
+def _transparency_card(m, score):
+    items = m['transparency']['items']
+    return {
+        'name': 'Transparency & Reporting',
+        'icon': 'document-text',
+        'score': int(score),
+        'status': status_for(score),
+        'metrics': [
+            {'label': 'Public Meetings', 'value': 'Yes' if items['public_meetings'] else 'No', 'check': items['public_meetings']},
+            {'label': 'Annual Report', 'value': 'Yes' if items['annual_report'] else 'Pending', 'check': items['annual_report']},
+            {'label': 'Financial Audit', 'value': 'Yes' if items['financial_audit'] else 'Pending', 'check': items['financial_audit']},
+            {'label': 'Performance Audit', 'value': 'Yes' if items['performance_audit'] else 'Pending', 'check': items['performance_audit']}
+        ],
+        'recommendations': ['Complete outstanding audits'] if score < 100 else ['All transparency requirements met']
+    }
+
+
+def _vendor_card(m, score):
+    vendor = m['vendor']
+    return {
+        'name': 'Vendor Performance',
+        'icon': 'users',
+        'score': int(score),
+        'status': status_for(score),
+        'metrics': [
+            {'label': 'Active Vendors', 'value': str(vendor['vendor_count'] or 0)},
+            {'label': 'Avg Change Orders', 'value': f"{vendor['avg_change_orders']:.1f}" if vendor['avg_change_orders'] else '0'},
+            {'label': 'High CO Vendors', 'value': str(vendor['high_co_count'] or 0)},
+            {'label': 'Performance Rate', 'value': f"{score:.0f}%"}
+        ],
+        'recommendations': ['Review vendors with high change order rates'] if vendor['high_co_pct'] > 20 else ['Vendor performance is satisfactory']
+    }
+
+
+# Card order on the compliance dashboard
+CARD_BUILDERS = [
+    ('financial', _financial_card),
+    ('schedule', _schedule_card),
+    ('funds', _funds_card),
+    ('transparency', _transparency_card),
+    ('vendor', _vendor_card),
+]
+
+
+def evaluate_compliance(metrics, scorers=None):
+    """
+    Build compliance score cards from collected metrics.
+
+    Args:
+        metrics: Dict returned by collect_metrics()
+        scorers: Optional dict of category -> scoring function overriding
+                 DEFAULT_SCORERS
+
+    Returns:
+        Compliance dict with categories, overall score and per-category timings
+    """
+    rules = dict(DEFAULT_SCORERS)
+    if scorers:
+        rules.update(scorers)
+
+    compliance = {
+        'generated_at': datetime.now(),
+        'overall_score': 0,
+        'categories': [],
+        'timings_ms': {}
+    }
+
+    for key, build_card in CARD_BUILDERS:
+        start = time.perf_counter()
+        score = rules[key](metrics)
+        card = build_card(metrics, score)
+        card['key'] = key
+        compliance['categories'].append(card)
+        compliance['timings_ms'][key] = (time.perf_counter() - start) * 1000
+
+    # Calculate overall score
+    compliance['overall_score'] = int(sum(c['score'] for c in compliance['categories']) / len(compliance['categories']))
+    compliance['overall_status'] = status_for(compliance['overall_score'])
+
+    return compliance
+
+
+def compute_compliance(conn, scorers=None, fiscal_year=None):
+    """
+    Compute the compliance dashboard from a single cached scan.
+
+    Args:
+        conn: SQLite connection
+        scorers: Optional scoring rule overrides (see DEFAULT_SCORERS)
+        fiscal_year: Optional fiscal year to score on its own
+
+    Returns:
+        Compliance dict as rendered by compliance.html
+    """
+    metrics, scan_ms = get_compliance_metrics(conn, fiscal_year)
+    compliance = evaluate_compliance(metrics, scorers)
+    compliance['timings_ms']['scan'] = scan_ms
+
+    logger.debug('Compliance timings (ms): ' + ', '.join(
+        f'{key}={ms:.2f}' for key, ms in compliance['timings_ms'].items()
+    ))
+    return compliance
+
+
+def cache_stats():
+    """Return hit-rate metrics for the compliance metrics cache."""
+    return _metrics_cache.stats()
@@ -0,0 +1,158 @@
+"""
+Per-session conversation context for Ask AI follow-ups.
+
+Suggestion chips such as "Who is the contractor?" or "What is being done
+about it?" refer to the previous answer. After every answer the session's
+context (the entities the question mentioned and the answer's result rows)
+is kept server-side, so a follow-up is answered from those rows instead of
+re-running the original query.
+
+The store is bounded three ways: least-recently-used sessions are evicted
+past max_sessions, contexts expire after ttl_seconds, and the rows held
+across all sessions are capped at max_total_rows (oldest sessions go first).
+A context is also dropped when the data version it was computed at changes.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+MAX_SESSIONS = 500
+TTL_SECONDS = 30 * 60
+MAX_ROWS_PER_CONTEXT = 50
+MAX_TOTAL_ROWS = 10000
+
+
+class ConversationContext:
+    """The previous answer of one session."""
+
+    def __init__(self, question, intent, entities, rows, version):
+        self.question = question
+        self.intent = intent
+        self.entities = list(entities)
+        self.rows = rows
+        self.version = version
+        self.touched = time.monotonic()
+        self.session_id = None
+
+    def missing(self, columns):
+        """Columns not present on every row (to be hydrated by contract_id)."""
+        return [c for c in columns if any(c not in row for row in self.rows)]
+
+    def hydrated(self, columns, fetch):
+        """
+        The rows with missing columns filled in (store them with
+        ConversationStore.set_rows so they are fetched once).
+
+        Args:
+            columns: Column names the follow-up needs
+            fetch: Callable (contract_ids, columns) -> {contract_id: row dict}
+        """
+        missing = self.missing(columns)
+        if not missing or not self.rows:
+            return self.rows
+        found = fetch([row['contract_id'] for row in self.rows], missing)
+        rows = []
+        for row in self.rows:
+            extra = found.get(row['contract_id'], {})
+            rows.append({**{column: extra.get(column) for column in missing}, **row})
+        return rows
+
+
+def result_rows(data):
+    """Project rows from an answer's data (aggregates have no contract_id)."""
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return []
+    return [dict(row) for row in data if isinstance(row, dict) and row.get('contract_id')][:MAX_ROWS_PER_CONTEXT]
+
+
+class ConversationStore:
+    """Thread-safe LRU + TTL store of ConversationContext by session id."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl_seconds=TTL_SECONDS, max_total_rows=MAX_TOTAL_ROWS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_total_rows = max_total_rows
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id, version):
+        """Return the live context for a session at a data version, or None."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            context = self._contexts.get(session_id)
+            if context is None or context.version != version:
+                if context is not None:
+                    self._drop(session_id)
+                self.misses += 1
+                return None
+            context.touched = now
+            self._contexts.move_to_end(session_id)
+            self.hits += 1
+            return context
+
+    def remember(self, session_id, context):
+        """Replace a session's context, evicting to stay within the caps."""
+        with self._lock:
+            if session_id in self._contexts:
+                self._drop(session_id)
+            context.session_id = session_id
+            self._contexts[session_id] = context
+            self._total_rows += len(context.rows)
+            self._evict()
+
+    def set_rows(self, context, rows):
+        """Replace a context's rows, keeping the row total (and its cap) in step."""
+        with self._lock:
+            if self._contexts.get(context.session_id) is context:
+                self._total_rows += len(rows) - len(context.rows)
+                context.rows = rows
+                self._evict()
+            else:
+                context.rows = rows
+
+    def forget(self, session_id):
+        with self._lock:
+            if session_id in self._contexts:
+                self._drop(session_id)
+
+    def _evict(self):
+        # Oldest sessions first; the most recent one is always kept
+        while len(self._contexts) > self.max_sessions or (
+                self._total_rows > self.max_total_rows and len(self._contexts) > 1):
+            self._drop(next(iter(self._contexts)))
+            self.evictions += 1
+
+    def _drop(self, session_id):
+        context = self._contexts.pop(session_id)
+        self._total_rows -= len(context.rows)
+
+    def _expire(self, now):
+        # Oldest-touched first, so stop at the first live context
+        while self._contexts:
+            session_id, context = next(iter(self._contexts.items()))
+            if now - context.touched < self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'sessions': len(self._contexts),
+                'max_sessions': self.max_sessions,
+                'rows': self._total_rows,
+                'max_rows': self.max_total_rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,302 @@
+"""
+Public-records data package (Frictionless Data Package layout).
+
+build_data_package() writes one CSV or Parquet file per public table plus
+a datapackage.json describing each table's schema, in a directory per
+format under PACKAGE_DIR. Each resource records a content hash of its table
+(columns and rows in rowid order); on the next build only tables whose hash
+changed are rewritten. Before hashing, a table's data_versions counters are
+compared with the ones recorded at the last build, so a request for an
+unchanged package reads no table data at all.
+
+Soft-deleted contracts (is_deleted = 1) are left out, as everywhere else in
+the dashboard, and so are the child rows (payments, change orders, ...) of
+those contracts.
+
+Table files are versioned by content hash (payments-1a2b3c4d5e6f.csv), so a
+build never overwrites a file in place; it writes the new version, swaps in
+a new datapackage.json and then removes versions no longer listed.
+open_package() takes a snapshot under the build lock (the descriptor plus an
+open handle on every table file), and iter_package_zip() streams the zip
+from those handles, so a download in flight is unaffected by a concurrent
+build, and never holds the archive in memory.
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+import zipfile
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from utils.cache import get_data_version
+from utils.exports import EXPORT_FORMATS, ChunkSink, iter_batches
+from utils.schema import table_exists
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = Path(__file__).parent.parent / 'data' / 'public_records'
+
+# Tables released in response to public records requests
+PACKAGE_TABLES = [
+    'contracts',
+    'change_orders',
+    'payments',
+    'milestones',
+    'project_phases',
+    'inspection_log',
+    'expenditures_summary',
+    'revenues_summary',
+]
+
+PACKAGE_FORMATS = ('csv', 'parquet')
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Bump when table files change shape, so the next build rewrites every table
+PACKAGE_LAYOUT = 2
+
+_build_lock = threading.Lock()
+
+
+def _field_type(declared):
+    """Table Schema field type for an SQLite declared type."""
+    declared = (declared or '').upper()
+    if 'BOOL' in declared:
+        return 'boolean'
+    if 'INT' in declared:
+        return 'integer'
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB', 'NUMERIC', 'DECIMAL')):
+        return 'number'
+    return 'string'
+
+
+def table_columns(conn, table):
+    """(name, declared type) pairs, or [] if the table does not exist."""
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _published(table, columns):
+    """
+    WHERE clause selecting a table's public rows, and the tables it reads.
+
+    Returns:
+        (sql, list of tables whose data versions cover the result)
+    """
+    names = {name for name, _ in columns}
+    if 'is_deleted' in names:
+        return 'is_deleted = 0', [table]
+    if 'contract_id' in names:
+        return (f'NOT EXISTS (SELECT 1 FROM contracts c WHERE c.contract_id = {table}.contract_id '
+                f'AND c.is_deleted = 1)'), [table, 'contracts']
+    return '1', [table]
+
+
+def table_query(table, columns):
+    """
+    SELECT of a table's public rows in rowid order.
+
+    Columns are named rather than SELECT *, which would also return
+    generated columns (contracts.change_amount, ...) that PRAGMA table_info
+    leaves out of the header.
+    """
+    where, _ = _published(table, columns)
+    names = ', '.join(f'"{name}"' for name, _ in columns)
+    return f'SELECT {names} FROM {table} WHERE {where} ORDER BY rowid'
+
+
+def table_version(conn, table, columns):
+    """Sum of the data_versions counters behind a table's public rows (None if untracked)."""
+    if not table_exists(conn.cursor(), 'data_versions'):
+        return None
+    return get_data_version(conn, _published(table, columns)[1])
+
+
+def table_hash(conn, table, columns):
+    """SHA-256 over a table's column list and public rows (rowid order)."""
+    digest = hashlib.sha256(json.dumps(columns).encode('utf-8'))
+    cursor = conn.execute(table_query(table, columns))
+    for rows in iter_batches(cursor):
+        for row in rows:
+            digest.update(json.dumps(list(row), default=str).encode('utf-8'))
+            digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def package_dir(fmt, out_dir=PACKAGE_DIR):
+    """Directory holding one format's package."""
+    return Path(out_dir) / fmt
+
+
+def load_package(fmt, out_dir=PACKAGE_DIR):
+    """The last built datapackage.json for a format, or None."""
+    path = package_dir(fmt, out_dir) / 'datapackage.json'
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def _write_table(conn, table, columns, path, fmt):
+    """Stream a table into a file (written to a temp name, then swapped in)."""
+    writer = EXPORT_FORMATS[fmt][0]
+    names = [name for name, _ in columns]
+    cursor = conn.execute(table_query(table, columns))
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp, 'wb') as f:
+        for chunk in writer(names, iter_batches(cursor), dict(columns)):
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+def build_data_package(conn, fmt='csv', out_dir=PACKAGE_DIR, force=False):
+    """
+    Bring the data package up to date, rewriting only changed tables.
+
+    Args:
+        conn: SQLite connection
+        fmt: 'csv' or 'parquet' (parquet needs pyarrow)
+        out_dir: Package root (each format builds into its own subdirectory)
+        force: Rewrite every table
+
+    Returns:
+        (datapackage dict, list of {'table', 'rows', 'rebuilt'} dicts)
+    """
+    if fmt not in PACKAGE_FORMATS:
+        raise ValueError(f'Unknown package format: {fmt}')
+    ext = EXPORT_FORMATS[fmt][2]
+    directory = package_dir(fmt, out_dir)
+
+    with _build_lock:
+        directory.mkdir(parents=True, exist_ok=True)
+        old_package = load_package(fmt, out_dir) or {}
+        previous = ({r['name']: r for r in old_package.get('resources', [])}
+                    if old_package.get('layout') == PACKAGE_LAYOUT else {})
+        resources, summary = [], []
+
+        for table in PACKAGE_TABLES:
+            columns = table_columns(conn, table)
+            if not columns:
+                logger.warning(f'Data package: table {table} not found, skipped')
+                continue
+
+            old = previous.get(table)
+            version = table_version(conn, table, columns)
+            if (not force and old is not None and version is not None and old.get('data_version') == version
+                    and (directory / old['file']).exists()):
+                resources.append(old)
+                summary.append({'table': table, 'rows': old['rows'], 'rebuilt': False})
+                continue
+
+            # Counters moved (or are unknown): the contents decide
+            content_hash = table_hash(conn, table, columns)
+            path = directory / f'{table}-{content_hash[:12]}.{ext}'
+            if not force and old is not None and old.get('content_hash') == content_hash and path.exists():
+                resources.append(dict(old, data_version=version))
+                summary.append({'table': table, 'rows': old['rows'], 'rebuilt': False})
+                continue
+
+            started = datetime.now()
+            _write_table(conn, table, columns, path, fmt)
+            rows = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {_published(table, columns)[0]}').fetchone()[0]
+            logger.info(f'Data package: wrote {table} ({rows} rows) in '
+                        f'{(datetime.now() - started).total_seconds():.2f}s')
+
+            resources.append({
+                'name': table,
+                'path': f'{table}.{ext}',
+                'file': path.name,
+                'format': fmt,
+                'mediatype': EXPORT_FORMATS[fmt][1],
+                'bytes': path.stat().st_size,
+                'rows': rows,
+                'content_hash': content_hash,
+                'data_version': version,
+                'built_at': datetime.now().isoformat(timespec='seconds'),
+                'schema': {'fields': [{'name': name, 'type': _field_type(declared)}
+                                      for name, declared in columns]},
+            })
+            summary.append({'table': table, 'rows': rows, 'rebuilt': True})
+
+        package = {
+            'name': 'surtax-oversight-public-records',
+            'title': 'Surtax Oversight Public Records',
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'layout': PACKAGE_LAYOUT,
+            'resources': resources,
+        }
+        tmp = directory / 'datapackage.json.tmp'
+        tmp.write_text(json.dumps(package, indent=2), encoding='utf-8')
+        os.replace(tmp, directory / 'datapackage.json')
+
+        # Downloads in flight read through handles opened by open_package();
+        # where open files cannot be removed (Windows), retry on the next build
+        listed = {r['file'] for r in resources}
+        for path in directory.glob(f'*.{ext}'):
+            if path.name not in listed:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    return package, summary
+
+
+def open_package(fmt, out_dir=PACKAGE_DIR):
+    """
+    Snapshot the current package for streaming.
+
+    Returns:
+        List of (archive name, open binary file); the zipped descriptor
+        lists files under their archive names. iter_package_zip() closes them.
+
+    Raises:
+        FileNotFoundError: if the format has not been built
+    """
+    directory = package_dir(fmt, out_dir)
+    with _build_lock:
+        package = load_package(fmt, out_dir)
+        if package is None:
+            raise FileNotFoundError(f'No {fmt} data package has been built')
+        files = []
+        try:
+            for resource in package['resources']:
+                files.append((resource['path'], open(directory / resource['file'], 'rb')))
+        except OSError:
+            for _, f in files:
+                f.close()
+            raise
+
+    descriptor = dict(package, resources=[{k: v for k, v in r.items() if k != 'file'}
+                                          for r in package['resources']])
+    files.insert(0, ('datapackage.json', io.BytesIO(json.dumps(descriptor, indent=2).encode('utf-8'))))
+    return files
+
+
+def iter_package_zip(files):
+    """
+    Yield a zip of a package snapshot (see open_package), chunk by chunk.
+
+    CSV is deflated; Parquet (already compressed) is stored.
+    """
+    sink = ChunkSink()
+    now = datetime.now().timetuple()[:6]
+    try:
+        with zipfile.ZipFile(sink, 'w') as archive:
+            for name, src in files:
+                info = zipfile.ZipInfo(name, date_time=now)
+                info.compress_type = zipfile.ZIP_STORED if name.endswith('.parquet') else zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w', force_zip64=True) as dest:
+                    while True:
+                        chunk = src.read(ZIP_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        for _, src in files:
+            src.close()
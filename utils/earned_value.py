@@ -0,0 +1,197 @@
+"""
+Earned-value metrics and completion forecasts for the surtax portfolio.
+
+Contract columns are loaded once into NumPy arrays and every project's
+planned value, earned value, CPI, SPI, estimate-at-completion and forecast
+finish date are computed in a single vectorized pass. Results are cached per
+data version and day (planned value depends on today's date).
+
+Definitions (per project):
+    BAC = current_amount                       budget at completion
+    EV  = BAC * percent_complete               earned value
+    AC  = total_paid                           actual cost
+    PV  = BAC * elapsed / baseline duration    planned value, clipped to [0, BAC]
+    CPI = EV / AC        SPI = EV / PV
+    EAC = BAC / CPI (AC + remaining work when CPI is undefined)
+    Forecast finish = start + baseline duration / SPI
+"""
+
+import math
+import logging
+from datetime import date
+
+import numpy as np
+
+from utils.cache import VersionedCache, get_data_version
+
+logger = logging.getLogger(__name__)
+
+_ev_cache = VersionedCache('earned_value', maxsize=2)
+
+NUMERIC_COLUMNS = ['original_amount', 'current_amount', 'total_paid', 'percent_complete']
+DATE_COLUMNS = ['start_date', 'original_end_date', 'current_end_date', 'actual_end_date']
+
+
+def _to_dates(values):
+    """Convert ISO date strings (or None) to a datetime64[D] array."""
+    return np.array([v[:10] if v else 'NaT' for v in values], dtype='datetime64[D]')
+
+
+def columns_from_rows(rows):
+    """
+    Transpose contract rows into column arrays.
+
+    Args:
+        rows: Sequence of tuples ordered as contract_id, status,
+              NUMERIC_COLUMNS, DATE_COLUMNS
+
+    Returns:
+        Dict of column name -> NumPy array
+    """
+    n_fixed = 2 + len(NUMERIC_COLUMNS)
+    columns = list(zip(*rows)) if rows else [()] * (n_fixed + len(DATE_COLUMNS))
+
+    cols = {
+        'contract_id': np.array(columns[0], dtype=object),
+        'status': np.array(columns[1], dtype=object),
+    }
+    for i, name in enumerate(NUMERIC_COLUMNS, start=2):
+        cols[name] = np.array(columns[i], dtype=float)
+    for i, name in enumerate(DATE_COLUMNS, start=n_fixed):
+        cols[name] = _to_dates(columns[i])
+    return cols
+
+
+def load_contract_columns(conn, fiscal_year=None):
+    """Load the earned-value inputs for every surtax project (of one fiscal year) as column arrays."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT contract_id, status, {', '.join(NUMERIC_COLUMNS)}, {', '.join(DATE_COLUMNS)}
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+        {'AND fiscal_year = ?' if fiscal_year is not None else ''}
+    ''', [fiscal_year] if fiscal_year is not None else [])
+    return columns_from_rows([tuple(row) for row in cursor.fetchall()])
+
+
+def compute_earned_value(cols, as_of=None):
+    """
+    Compute earned-value metrics for all projects in one vectorized pass.
+
+    Args:
+        cols: Dict of column arrays from load_contract_columns()
+        as_of: Status date (datetime.date or numpy datetime64), defaults to today
+
+    Returns:
+        Dict of metric name -> NumPy array, aligned with cols['contract_id']
+    """
+    as_of = np.datetime64(as_of or date.today(), 'D')
+
+    bac = np.nan_to_num(cols['current_amount'])
+    ac = np.nan_to_num(cols['total_paid'])
+    pct = np.clip(np.nan_to_num(cols['percent_complete']) / 100.0, 0.0, 1.0)
+
+    start = cols['start_date']
+    baseline_end = np.where(np.isnat(cols['original_end_date']), cols['current_end_date'], cols['original_end_date'])
+
+    duration = (baseline_end - start).astype('timedelta64[D]').astype(float)
+    elapsed = (as_of - start).astype('timedelta64[D]').astype(float)
+    duration[np.isnat(baseline_end) | np.isnat(start)] = np.nan
+    elapsed[np.isnat(start)] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        planned_pct = np.where(duration > 0, elapsed / duration, np.where(elapsed >= 0, 1.0, 0.0))
+        planned_pct = np.clip(np.nan_to_num(planned_pct), 0.0, 1.0)
+
+        ev = bac * pct
+        pv = bac * planned_pct
+        cpi = np.where(ac > 0, ev / ac, np.nan)
+        spi = np.where(pv > 0, ev / pv, np.nan)
+
+        valid_cpi = np.isfinite(cpi) & (cpi > 0)
+        eac = np.where(valid_cpi, bac / np.where(valid_cpi, cpi, 1.0), ac + (bac - ev))
+
+        # Forecast finish: stretch the baseline duration by 1/SPI
+        valid_spi = np.isfinite(spi) & (spi > 0) & np.isfinite(duration)
+        forecast_days = np.where(valid_spi, np.round(duration / np.where(valid_spi, spi, 1.0)), 0)
+
+    forecast_finish = np.where(valid_spi, start + forecast_days.astype('timedelta64[D]'), cols['current_end_date'])
+    finished = pct >= 1.0
+    actual_or_current = np.where(np.isnat(cols['actual_end_date']), cols['current_end_date'], cols['actual_end_date'])
+    forecast_finish = np.where(finished, actual_or_current, forecast_finish)
+
+    slip_days = (forecast_finish - baseline_end).astype('timedelta64[D]').astype(float)
+    slip_days[np.isnat(forecast_finish) | np.isnat(baseline_end)] = np.nan
+
+    return {
+        'bac': bac,
+        'pv': pv,
+        'ev': ev,
+        'ac': ac,
+        'cv': ev - ac,
+        'sv': ev - pv,
+        'cpi': cpi,
+        'spi': spi,
+        'eac': eac,
+        'vac': bac - eac,
+        'planned_pct': planned_pct * 100,
+        'baseline_finish': baseline_end,
+        'forecast_finish': forecast_finish,
+        'slip_days': slip_days,
+    }
+
+
+def summarize_portfolio(metrics):
+    """Roll per-project metrics up into portfolio totals and indices."""
+    totals = {key: float(metrics[key].sum()) for key in ('bac', 'pv', 'ev', 'ac', 'eac')}
+    totals['cpi'] = totals['ev'] / totals['ac'] if totals['ac'] > 0 else None
+    totals['spi'] = totals['ev'] / totals['pv'] if totals['pv'] > 0 else None
+    totals['vac'] = totals['bac'] - totals['eac']
+    totals['project_count'] = int(len(metrics['bac']))
+    totals['cost_underperforming'] = int(np.sum(metrics['cpi'] < 0.9))
+    totals['schedule_underperforming'] = int(np.sum(metrics['spi'] < 0.9))
+    return totals
+
+
+def _clean(value):
+    """Convert NumPy scalars to JSON-safe Python values."""
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else str(value)
+    value = float(value)
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def build_records(contract_ids, metrics):
+    """Turn column arrays into a dict of contract_id -> metrics dict."""
+    keys = list(metrics)
+    records = {}
+    for i, contract_id in enumerate(contract_ids):
+        records[contract_id] = {key: _clean(metrics[key][i]) for key in keys}
+    return records
+
+
+def get_portfolio_earned_value(conn, as_of=None, fiscal_year=None):
+    """
+    Get earned-value metrics for the whole portfolio, cached per data version.
+
+    Args:
+        conn: SQLite connection
+        as_of: Optional status date, defaults to today
+        fiscal_year: Optional fiscal year to restrict the portfolio to
+
+    Returns:
+        Dict with 'as_of', 'portfolio' totals and 'projects' keyed by contract_id
+    """
+    as_of = as_of or date.today()
+    version = get_data_version(conn, ['contracts'])
+
+    def compute():
+        cols = load_contract_columns(conn, fiscal_year)
+        metrics = compute_earned_value(cols, as_of)
+        return {
+            'as_of': str(as_of),
+            'portfolio': summarize_portfolio(metrics),
+            'projects': build_records(cols['contract_id'], metrics),
+        }
+
+    return _ev_cache.get_or_compute((str(as_of), fiscal_year), version, compute)
@@ -0,0 +1,252 @@
+"""
+Entity resolution for Ask AI questions.
+
+Schools, vendors, surtax categories and project titles are loaded into a
+token trie, together with common abbreviations ("North Marion High" is also
+"north marion", "north marion high school" and "nmhs"; "Ausley Construction Company,
+LLC" is also "ausley construction" and "ausley"). A question is walked once,
+left to right, taking the longest alias at each position, so every mentioned
+entity is extracted in time linear in the question length.
+
+The trie is rebuilt automatically when the schools, vendors, contracts or
+surtax_categories tables change (tracked through the data version).
+"""
+
+import re
+import logging
+import threading
+from collections import namedtuple
+
+from utils.ask_cache import normalize_question
+from utils.cache import get_data_version
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TABLES = ['schools', 'vendors', 'contracts', 'surtax_categories']
+
+# kind: 'school', 'vendor', 'project' or 'category';
+# key: school_id / vendor_id / contract_id / category_id
+Entity = namedtuple('Entity', ['kind', 'key', 'name'])
+
+# A resolved mention: the entity and the alias text that matched it
+Mention = namedtuple('Mention', ['entity', 'alias'])
+
+SCHOOL_TYPES = {
+    'elementary': ['elementary school', 'elem', 'es'],
+    'middle': ['middle school', 'ms'],
+    'high': ['high school', 'senior high', 'hs'],
+}
+
+CORPORATE_SUFFIXES = {'inc', 'llc', 'co', 'company', 'corp', 'corporation', 'ltd'}
+
+# Words too common in this county to stand alone as an alias
+GENERIC_WORDS = {
+    'marion', 'ocala', 'county', 'school', 'schools', 'district', 'new', 'other',
+    'construction', 'services', 'industries', 'partners', 'electric', 'utility',
+    'government', 'public', 'safety', 'budget', 'capital', 'major', 'service',
+}
+
+# Ordinary words that are also school names; "the legacy of the program" must
+# not resolve to Legacy Elementary, so these never stand alone as an alias
+DICTIONARY_WORDS = {
+    'legacy', 'liberty', 'sunrise', 'forest', 'vanguard', 'horizon', 'greenway',
+    'college', 'park', 'lake', 'north', 'south', 'west', 'east', 'port', 'fort',
+}
+
+# Shorter initials ("les", "mes") collide with ordinary words
+MIN_INITIALS = 4
+
+_QUOTED_CODE = re.compile(r'"([A-Za-z]{2,})"')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def school_aliases(name, school_type):
+    """Aliases for a school name such as 'Belleview High'."""
+    normalized = normalize_question(name)
+    aliases = {normalized}
+    words = normalized.split()
+    type_word = words[-1] if words else ''
+    if type_word in SCHOOL_TYPES and len(words) > 1:
+        base = ' '.join(words[:-1])
+        for variant in SCHOOL_TYPES[type_word]:
+            aliases.add(f'{base} {variant}')
+        # Initials plus type code: "north marion high" -> "nmhs"
+        initials = ''.join(w[0] for w in words[:-1]) + SCHOOL_TYPES[type_word][-1]
+        if len(initials) >= MIN_INITIALS:
+            aliases.add(initials)
+        if len(base) >= 4 and base not in GENERIC_WORDS and base not in DICTIONARY_WORDS:
+            aliases.add(base)
+    return aliases
+
+
+def vendor_aliases(name):
+    """Aliases for a vendor name such as 'Ausley Construction Company, LLC'."""
+    normalized = normalize_question(name)
+    aliases = {normalized}
+    words = normalized.split()
+    while words and words[-1] in CORPORATE_SUFFIXES:
+        words = words[:-1]
+    if words:
+        aliases.add(' '.join(words))
+        if len(words[0]) >= 5 and words[0] not in GENERIC_WORDS and words[0] not in DICTIONARY_WORDS:
+            aliases.add(words[0])
+    return aliases
+
+
+def category_aliases(category_id, name):
+    """Aliases for a surtax category: its name, id and distinctive words."""
+    # A one-word id is only an alias when it is distinctive ("other" is not)
+    id_alias = category_id.replace('_', ' ')
+    aliases = set()
+    if ' ' in id_alias or (len(id_alias) >= 5 and id_alias not in GENERIC_WORDS):
+        aliases.add(id_alias)
+    if name:
+        normalized = normalize_question(name)
+        aliases.add(normalized)
+        aliases.update(w for w in normalized.split() if len(w) >= 5 and w not in GENERIC_WORDS)
+    return aliases
+
+
+def project_aliases(title):
+    """Aliases for a project title, including quoted codes like "CCC"."""
+    aliases = {normalize_question(title)}
+    for code in _QUOTED_CODE.findall(title):
+        aliases.add(code.lower())
+    return aliases
+
+
+class EntityIndex:
+    """Token trie of entity aliases."""
+
+    def __init__(self, version):
+        self.version = version
+        self._root = {}
+        self.entities = []
+
+    def add(self, entity, aliases):
+        self.entities.append(entity)
+        for alias in aliases:
+            node = self._root
+            for token in alias.split():
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append(entity)
+
+    def extract(self, question):
+        """
+        Find every entity mentioned in a question.
+
+        Args:
+            question: Question text (normalized with normalize_question)
+
+        Returns:
+            List of Mention, in question order, leftmost-longest
+        """
+        tokens = question.split()
+        mentions = []
+        seen = set()
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            best_end, best = None, None
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if None in node:
+                    best_end, best = j, node[None]
+            if best is None:
+                i += 1
+                continue
+            alias = ' '.join(tokens[i:best_end])
+            for entity in best:
+                if entity not in seen:
+                    seen.add(entity)
+                    mentions.append(Mention(entity, alias))
+            i = best_end
+        return mentions
+
+
+def build_entity_index(conn, version):
+    """Load schools, vendors, surtax project titles and categories into a new index."""
+    index = EntityIndex(version)
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT school_id, school_name, school_type FROM schools WHERE is_deleted = 0')
+    for school_id, name, school_type in cursor.fetchall():
+        index.add(Entity('school', school_id, name), school_aliases(name, school_type))
+
+    # Contracts also carry vendors that were never added to the vendors table
+    cursor.execute('''
+        SELECT vendor_id, vendor_name FROM vendors WHERE is_deleted = 0
+        UNION
+        SELECT DISTINCT vendor_id, vendor_name FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+        AND vendor_id IS NOT NULL AND vendor_name IS NOT NULL
+        AND vendor_id NOT IN (SELECT vendor_id FROM vendors)
+    ''')
+    for vendor_id, name in cursor.fetchall():
+        index.add(Entity('vendor', vendor_id, name), vendor_aliases(name))
+
+    cursor.execute('''
+        SELECT contract_id, title FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL AND title IS NOT NULL
+    ''')
+    for contract_id, title in cursor.fetchall():
+        index.add(Entity('project', contract_id, title), project_aliases(title))
+
+    cursor.execute('''
+        SELECT category_id, category_name FROM surtax_categories
+        UNION
+        SELECT DISTINCT surtax_category, NULL FROM contracts
+        WHERE surtax_category IS NOT NULL
+        AND surtax_category NOT IN (SELECT category_id FROM surtax_categories)
+    ''')
+    for category_id, name in cursor.fetchall():
+        index.add(Entity('category', category_id, name or category_id.replace('_', ' ').title()),
+                  category_aliases(category_id, name))
+
+    logger.info(f'Entity index v{version}: {len(index.entities)} entities')
+    return index
+
+
+def get_entity_index(conn):
+    """Get the entity index for the current data version, rebuilding if stale."""
+    global _index
+    version = get_data_version(conn, SOURCE_TABLES)
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = build_entity_index(conn, version)
+        return _index
+
+
+def extract_entities(conn, question):
+    """Mentions of schools, vendors, projects and categories in a normalized question."""
+    return get_entity_index(conn).extract(question)
+
+
+def entity_scope(entities):
+    """
+    Build a parameterized WHERE fragment selecting the contracts of entities.
+
+    Schools match on school_id, school_name or a title naming the school
+    ("HVAC Upgrades - Belleview Senior High" for Belleview High).
+
+    Returns:
+        (sql, params) tuple
+    """
+    parts, params = [], []
+    for entity in entities:
+        if entity.kind == 'school':
+            words = entity.name.split()
+            pattern = '%' + '%'.join([' '.join(words[:-1]), words[-1]] if len(words) > 1 else words) + '%'
+            parts.append('(school_id = ? OR school_name = ? OR title LIKE ?)')
+            params += [entity.key, entity.name, pattern]
+        elif entity.kind == 'vendor':
+            parts.append('vendor_id = ?')
+            params.append(entity.key)
+        else:
+            parts.append('contract_id = ?')
+            params.append(entity.key)
+    return '(' + ' OR '.join(parts or ['0']) + ')', params
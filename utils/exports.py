@@ -0,0 +1,145 @@
+"""
+Streaming table exports (CSV, NDJSON, Parquet).
+
+Rows are pulled from an open cursor with fetchmany() and encoded batch by
+batch, so an export runs in constant memory however many rows it covers:
+each writer is a generator of byte chunks suitable for a streaming Flask
+Response.
+
+Parquet needs pyarrow, which is optional; is_available() reports whether a
+format can be produced in this environment.
+"""
+
+import io
+import csv
+import json
+
+EXPORT_BATCH_SIZE = 2000
+
+
+def iter_batches(cursor, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row tuples from an executed cursor."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def csv_chunks(columns, batches, types=None):
+    """CSV with a header row; one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(columns, batches, types=None):
+    """One JSON object per line; one chunk per batch."""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows).encode('utf-8')
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(pa, declared):
+    """Arrow type for an SQLite declared column type (by SQLite's affinity rules)."""
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB', 'NUMERIC', 'DECIMAL')):
+        return pa.float64()
+    return pa.string()
+
+
+def _coerce(values, cast):
+    """Convert stray values (SQLite is dynamically typed) or drop them to NULL."""
+    out = []
+    for value in values:
+        try:
+            out.append(None if value is None or value == '' else cast(value))
+        except (TypeError, ValueError):
+            out.append(None)
+    return out
+
+
+def parquet_chunks(columns, batches, types=None):
+    """
+    Parquet, one row group per batch, flushed as each group is written.
+
+    Args:
+        columns: Column names
+        batches: Iterable of lists of row tuples
+        types: Optional dict of column -> SQLite declared type; the Arrow
+            schema is fixed up front from it so every row group matches
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = types or {}
+    schema = pa.schema([(name, _arrow_type(pa, types.get(name))) for name in columns])
+    casts = {pa.int64(): int, pa.float64(): float, pa.string(): str}
+
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in batches:
+        arrays = []
+        for i, field in enumerate(schema):
+            values = [row[i] for row in rows]
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+                arrays.append(pa.array(_coerce(values, casts[field.type]), type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+# format -> (writer, mimetype, file extension, optional module it needs)
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv', 'csv', None),
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson', None),
+    'parquet': (parquet_chunks, 'application/vnd.apache.parquet', 'parquet', 'pyarrow'),
+}
+
+
+def is_available(fmt):
+    """Whether an export format's optional dependency is installed."""
+    requirement = EXPORT_FORMATS[fmt][3]
+    if requirement is None:
+        return True
+    try:
+        __import__(requirement)
+        return True
+    except ImportError:
+        return False
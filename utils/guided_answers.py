@@ -0,0 +1,133 @@
+"""
+Precomputed answers for the guided committee prompts.
+
+The GUIDED_AI_PROMPTS buttons are the most-clicked questions and each needs
+several aggregations. A background job rebuilds every guided answer whenever
+the data version changes and stores them in the guided_answers table (see
+utils/schema.py) and an in-memory map, so a click is a single keyed read.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+
+from utils.ask_cache import normalize_question
+from utils.cache import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# How often the background job checks the data version
+REFRESH_INTERVAL_SECONDS = 30
+
+# normalized prompt -> (data_version, response)
+_answers = {}
+_answers_lock = threading.Lock()
+
+
+def prompt_key(prompt):
+    """Key a guided prompt the same way /api/ask keys questions."""
+    return normalize_question(prompt)
+
+
+def refresh_guided_answers(conn, prompts, builders, force=False):
+    """
+    Rebuild every guided answer if the data version has changed.
+
+    Args:
+        conn: SQLite connection
+        prompts: GUIDED_AI_PROMPTS entries (with 'category' and 'prompt')
+        builders: Dict of category -> builder(conn) returning a response dict
+        force: Rebuild even if the stored answers are current
+
+    Returns:
+        Number of answers rebuilt
+    """
+    version = get_data_version(conn)
+    cursor = conn.cursor()
+    if not force:
+        cursor.execute('SELECT COUNT(*) FROM guided_answers WHERE data_version = ?', (version,))
+        if cursor.fetchone()[0] >= len(prompts):
+            _load_into_memory(conn, version)
+            return 0
+
+    rows = []
+    fresh = {}
+    for p in prompts:
+        builder = builders.get(p['category'])
+        if builder is None:
+            continue
+        key = prompt_key(p['prompt'])
+        response = dict(builder(conn), intent='guided')
+        fresh[key] = (version, response)
+        rows.append((key, p['category'], version, json.dumps(response, default=str), datetime.now().isoformat()))
+
+    cursor.executemany('''
+        INSERT OR REPLACE INTO guided_answers (prompt_key, category, data_version, response_json, computed_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+
+    with _answers_lock:
+        _answers.update(fresh)
+    logger.info(f'Precomputed {len(rows)} guided answers at data version {version}')
+    return len(rows)
+
+
+def _load_into_memory(conn, version):
+    """Populate the in-memory map from the table (e.g. after a restart)."""
+    with _answers_lock:
+        if all(v == version for v, _ in _answers.values()) and _answers:
+            return
+    cursor = conn.cursor()
+    cursor.execute('SELECT prompt_key, response_json FROM guided_answers WHERE data_version = ?', (version,))
+    loaded = {key: (version, json.loads(response)) for key, response in cursor.fetchall()}
+    with _answers_lock:
+        _answers.update(loaded)
+
+
+def get_guided_answer(conn, normalized, version):
+    """
+    Return the precomputed answer for a normalized guided prompt, or None.
+
+    Served from memory; falls back to one keyed read of guided_answers for
+    answers written by another process.
+    """
+    with _answers_lock:
+        entry = _answers.get(normalized)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT response_json FROM guided_answers
+        WHERE prompt_key = ? AND data_version = ?
+    ''', (normalized, version))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    response = json.loads(row[0])
+    with _answers_lock:
+        _answers[normalized] = (version, response)
+    return response
+
+
+def start_guided_refresher(refresh, interval_seconds=REFRESH_INTERVAL_SECONDS):
+    """
+    Run refresh() periodically on a daemon thread.
+
+    refresh is expected to call refresh_guided_answers(), which is a single
+    data-version read when nothing has changed.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_seconds):
+            try:
+                refresh()
+            except Exception as e:
+                logger.error(f'Guided answer refresh failed: {e}')
+
+    thread = threading.Thread(target=run, name='guided-answers', daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,198 @@
+"""
+Import manifest and row-level diffs for the data import scripts.
+
+Each imported source file has a row in import_manifest (see utils/schema.py)
+with its size, mtime, SHA-256 and the row counts of its last import. An
+importer checks a source before parsing it:
+
+- size and mtime unchanged: skipped without reading the file
+- contents unchanged (same hash, e.g. after a copy or touch): skipped, and
+  the new mtime is recorded
+- otherwise the source is parsed and applied with RowDiff, which compares
+  records with the stored rows on a natural key and writes only the
+  inserts, updates and deletes
+"""
+
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+from utils.schema import ensure_import_manifest
+
+REPO_ROOT = Path(__file__).parent.parent
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def source_name(path):
+    """Manifest key for a file: repo-relative when inside the repo."""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(REPO_ROOT.resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_manifest_entry(conn, path):
+    """The manifest row for a source as a dict, or None."""
+    ensure_import_manifest(conn)
+    cursor = conn.execute('''
+        SELECT source, target, size, mtime, sha256, row_count, inserted, updated, deleted, imported_at
+        FROM import_manifest WHERE source = ?
+    ''', (source_name(path),))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    columns = [d[0] for d in cursor.description]
+    return dict(zip(columns, row))
+
+
+def check_source(conn, path, touch=True):
+    """
+    Decide whether a source needs importing.
+
+    Args:
+        conn: SQLite connection
+        path: Source file
+        touch: Record the new mtime of a touched but unchanged file (off
+            for dry runs, which must not write)
+
+    Returns:
+        (changed, fingerprint) where fingerprint is a dict with the
+        source's 'source', 'size', 'mtime' and 'sha256' (None when the
+        fast size/mtime check already proved it unchanged)
+    """
+    stat = Path(path).stat()
+    fingerprint = {'source': source_name(path), 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': None}
+    entry = get_manifest_entry(conn, path)
+    if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return False, fingerprint
+
+    fingerprint['sha256'] = file_sha256(path)
+    if entry is not None and entry['sha256'] == fingerprint['sha256']:
+        if not touch:
+            return False, fingerprint
+        conn.execute('UPDATE import_manifest SET size = ?, mtime = ? WHERE source = ?',
+                     (stat.st_size, stat.st_mtime, fingerprint['source']))
+        conn.commit()
+        return False, fingerprint
+    return True, fingerprint
+
+
+def record_source(conn, fingerprint, target, counts):
+    """
+    Store a source's fingerprint and import counts (caller commits, so the
+    manifest only moves forward when the import itself does).
+    """
+    sha256 = fingerprint['sha256'] or file_sha256(REPO_ROOT / fingerprint['source'])
+    conn.execute('''
+        INSERT OR REPLACE INTO import_manifest
+            (source, target, size, mtime, sha256, row_count, inserted, updated, deleted, imported_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (fingerprint['source'], target, fingerprint['size'], fingerprint['mtime'], sha256,
+          counts['rows'], counts['inserted'], counts['updated'], counts['deleted'],
+          datetime.now().isoformat(timespec='seconds')))
+
+
+class RowDiff:
+    """
+    Apply records to a table as a diff against the rows already there.
+
+    Records are tuples of the key columns followed by the value columns.
+    Existing rows in scope are loaded once; apply() then inserts new keys
+    and updates keys whose values differ, and finish() optionally deletes
+    keys in scope that no record mentioned.
+    """
+
+    def __init__(self, cursor, table, key, columns, scope=None, on_insert=None, on_update=None):
+        """
+        Args:
+            cursor: SQLite cursor (inside the caller's transaction)
+            table: Target table
+            key: Natural key column names (unique within scope)
+            columns: Value column names compared between source and table
+            scope: Optional dict of column -> value the diff is limited to
+                (e.g. {'fiscal_year': '2024'}); also written on insert
+            on_insert: Extra column -> value written with inserted rows
+            on_update: Extra column -> value written with updated rows
+        """
+        self.cursor = cursor
+        self.table = table
+        self.key = list(key)
+        self.columns = list(columns)
+        self.scope = dict(scope or {})
+        self.on_insert = dict(on_insert or {})
+        self.on_update = dict(on_update or {})
+        self.counts = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        self._seen = set()
+
+        where = ' AND '.join(f'{column} = ?' for column in self.scope) or '1'
+        self._where = where
+        cursor.execute(f'''
+            SELECT {', '.join(self.key + self.columns)} FROM {table} WHERE {where}
+        ''', list(self.scope.values()))
+        width = len(self.key)
+        self._existing = {tuple(row[:width]): tuple(row[width:]) for row in cursor.fetchall()}
+
+    def apply(self, records):
+        """Diff and write one batch of records."""
+        width = len(self.key)
+        inserts, updates = [], []
+        for record in records:
+            key, values = tuple(record[:width]), tuple(record[width:])
+            self.counts['rows'] += 1
+            self._seen.add(key)
+            current = self._existing.get(key)
+            if current is None:
+                inserts.append(key + values)
+                self._existing[key] = values
+            elif current != values:
+                updates.append(values + key)
+                self._existing[key] = values
+            else:
+                self.counts['unchanged'] += 1
+
+        if inserts:
+            insert_columns = self.key + self.columns + list(self.scope) + list(self.on_insert)
+            extra = tuple(self.scope.values()) + tuple(self.on_insert.values())
+            self.cursor.executemany(f'''
+                INSERT INTO {self.table} ({', '.join(insert_columns)})
+                VALUES ({', '.join('?' * len(insert_columns))})
+            ''', [row + extra for row in inserts])
+            self.counts['inserted'] += len(inserts)
+        if updates:
+            assignments = ', '.join(f'{column} = ?' for column in self.columns + list(self.on_update))
+            key_match = ' AND '.join(f'{column} = ?' for column in self.key)
+            extra = tuple(self.on_update.values())
+            scope_values = tuple(self.scope.values())
+            self.cursor.executemany(f'''
+                UPDATE {self.table} SET {assignments} WHERE {key_match} AND {self._where}
+            ''', [row[:len(self.columns)] + extra + row[len(self.columns):] + scope_values for row in updates])
+            self.counts['updated'] += len(updates)
+
+    def finish(self, delete_missing=True):
+        """
+        Delete rows in scope whose key no record mentioned.
+
+        Returns:
+            Counts dict: rows, inserted, updated, unchanged, deleted
+        """
+        if delete_missing:
+            missing = [key for key in self._existing if key not in self._seen]
+            if missing:
+                key_match = ' AND '.join(f'{column} = ?' for column in self.key)
+                scope_values = tuple(self.scope.values())
+                self.cursor.executemany(f'''
+                    DELETE FROM {self.table} WHERE {key_match} AND {self._where}
+                ''', [key + scope_values for key in missing])
+                self.counts['deleted'] += len(missing)
+        return self.counts
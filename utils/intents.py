@@ -0,0 +1,199 @@
+"""
+Intent matching for the Ask AI assistant.
+
+Each intent declares its keyword clauses and a handler. Every keyword from
+every intent is compiled into one combined regex, so a question is scanned
+once no matter how many intents are registered, and every intent is scored
+from that single pass.
+
+Scoring replaces the old if/elif ordering: an intent matches only when all of
+its clauses match. Intents with more satisfied constraints rank first
+("high school" + "delayed" beats "delayed"), then the summed length of the
+longest keyword matched per clause ("over budget" beats "budget"). Ties go to
+the intent registered first.
+
+Intents may also require entity mentions (see utils/entities.py): they match
+only when the question names an entity of one of their kinds, which counts
+as one more constraint, and the matched alias length adds to the score.
+"""
+
+import re
+
+# Score per satisfied clause or entity requirement; longer than any keyword
+CONSTRAINT_WEIGHT = 1000
+
+
+def _trie_pattern(node):
+    """Render a keyword trie as a regex that branches one character at a time."""
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A keyword ends here; the greedy ? still prefers the longer keyword
+        pattern = f'(?:{pattern})?'
+    return pattern
+
+
+class KeywordMatcher:
+    """
+    Multi-keyword substring matcher compiled into one regex.
+
+    The keywords are merged into a trie and rendered as a single regex inside
+    a zero-width lookahead, so the regex engine tries every position of the
+    text once and overlapping keywords are all found. Each position yields its
+    longest keyword; shorter keywords starting there (its prefixes) come from
+    a precomputed table. Adding keywords grows the trie, not the per-position
+    work, so the cost stays roughly flat as intents are registered.
+    """
+
+    def __init__(self, keywords):
+        keywords = sorted(set(keywords))
+        trie = {}
+        for kw in keywords:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self._prefixes = {
+            kw: [other for other in keywords if kw.startswith(other)]
+            for kw in keywords
+        }
+        self._regex = re.compile(f'(?=({_trie_pattern(trie) or "(?!)"}))')
+
+    def findall(self, text):
+        """Return the set of keywords that occur in text."""
+        found = set()
+        prefixes = self._prefixes
+        for kw in self._regex.findall(text):
+            found.update(prefixes[kw])
+        return found
+
+
+class Intent:
+    """A question intent: keyword clauses (all required), entity kinds and a handler."""
+
+    def __init__(self, name, clauses, handler, order, entities=None):
+        self.name = name
+        self.clauses = [[kw.lower() for kw in clause] for clause in clauses]
+        self.handler = handler
+        self.order = order
+        self.entities = set(entities or ())
+
+    def __repr__(self):
+        return f'Intent({self.name!r})'
+
+
+class IntentMatch:
+    """The winning intent for a question and the keywords that selected it."""
+
+    def __init__(self, intent, score, keywords, entities=None):
+        self.intent = intent
+        self.name = intent.name
+        self.score = score
+        self.keywords = keywords
+        self.entities = entities or []
+
+    def __repr__(self):
+        return f'IntentMatch({self.name!r}, score={self.score}, keywords={sorted(self.keywords)})'
+
+    @property
+    def constraints(self):
+        """Number of satisfied clauses (plus the entity requirement, if any)."""
+        return self.score // CONSTRAINT_WEIGHT
+
+
+class IntentRegistry:
+    """Registry of intents compiled into a single keyword matcher."""
+
+    def __init__(self):
+        self.intents = []
+        self._matcher = None
+        self._index = {}
+        self._keywordless = []
+
+    def register(self, name, clauses, handler, entities=None):
+        """
+        Register an intent.
+
+        Args:
+            name: Intent name
+            clauses: List of keyword lists, all of which must match
+            handler: Callable (cursor, question, match) -> response dict
+            entities: Optional entity kinds, one of which must be mentioned
+        """
+        self.intents.append(Intent(name, clauses, handler, len(self.intents), entities))
+        self._matcher = None
+        return handler
+
+    def intent(self, name, *clauses, entities=None):
+        """Decorator form of register().
+
+        Example:
+            @registry.intent('delayed', ['delayed', 'behind schedule', 'late'])
+            def answer_delayed(cursor, question, match): ...
+        """
+        def decorator(handler):
+            return self.register(name, list(clauses), handler, entities)
+        return decorator
+
+    def compile(self):
+        """Build the keyword matcher and keyword -> (intent, clause) index."""
+        index = {}
+        for intent in self.intents:
+            for clause_idx, clause in enumerate(intent.clauses):
+                for kw in clause:
+                    index.setdefault(kw, []).append((intent, clause_idx))
+        self._index = index
+        self._keywordless = [intent for intent in self.intents if not intent.clauses]
+        self._matcher = KeywordMatcher(index.keys())
+
+    def scores(self, question, mentions=()):
+        """
+        Score every intent against a question in one pass.
+
+        Args:
+            question: Question text
+            mentions: Entity mentions from utils.entities.extract_entities()
+
+        Returns:
+            List of IntentMatch for intents whose clauses all matched,
+            best first
+        """
+        if self._matcher is None:
+            self.compile()
+
+        # intent -> clause_idx -> longest matched keyword
+        best = {}
+        for kw in self._matcher.findall(question.lower()):
+            for intent, clause_idx in self._index[kw]:
+                clauses = best.setdefault(intent, {})
+                current = clauses.get(clause_idx)
+                if current is None or len(kw) > len(current):
+                    clauses[clause_idx] = kw
+
+        matches = []
+        for intent in list(best) + self._keywordless:
+            clauses = best.get(intent, {})
+            if len(clauses) != len(intent.clauses):
+                continue
+            # Constraint count dominates; keyword/alias length breaks ties
+            score = CONSTRAINT_WEIGHT * len(clauses) + sum(len(kw) for kw in clauses.values())
+            entities = []
+            if intent.entities:
+                scoped = [m for m in mentions if m.entity.kind in intent.entities]
+                if not scoped:
+                    continue
+                score += CONSTRAINT_WEIGHT + max(len(m.alias) for m in scoped)
+                entities = [m.entity for m in scoped]
+            elif not clauses:
+                continue
+            matches.append(IntentMatch(intent, score, set(clauses.values()), entities))
+
+        matches.sort(key=lambda m: (-m.score, m.intent.order))
+        return matches
+
+    def match(self, question, mentions=()):
+        """Return the best IntentMatch for a question, or None."""
+        matches = self.scores(question, mentions)
+        return matches[0] if matches else None
@@ -0,0 +1,205 @@
+"""
+SQLite-backed background job queue for heavy renders.
+
+Jobs are rows in the jobs table (see utils/schema.py). A fixed pool of
+worker threads claims queued jobs one at a time, so at most max_workers
+renders run at once no matter how many exports are requested; the request
+thread only inserts a row and returns a job id to poll.
+
+Each job carries a cache key (kind, parameters and data version). Submitting
+a key that already has a finished artifact returns that job immediately, and
+a key that is already queued or running is joined rather than rendered
+twice. Renderers write their artifact straight to its file under
+ARTIFACT_DIR, so a large export never has to be held in memory.
+"""
+
+import json
+import uuid
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = Path(__file__).parent.parent / 'data' / 'artifacts'
+
+MAX_WORKERS = 2
+
+# Finished artifacts kept per kind (older ones are deleted with their jobs)
+KEEP_ARTIFACTS = 20
+
+
+class JobQueue:
+    """Persistent job queue with a bounded worker pool."""
+
+    def __init__(self, connect, renderers, max_workers=MAX_WORKERS, artifact_dir=ARTIFACT_DIR):
+        """
+        Args:
+            connect: Callable returning a new SQLite connection (sqlite3.Row rows)
+            renderers: Dict of kind -> (file extension, render(params, path)),
+                where render writes the artifact to path
+            max_workers: Concurrent renders allowed
+            artifact_dir: Where finished artifacts are written
+        """
+        self._connect = connect
+        self.renderers = renderers
+        self.max_workers = max_workers
+        self.artifact_dir = Path(artifact_dir)
+        self._wake = threading.Condition()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool (idempotent) and requeue jobs orphaned by a restart."""
+        with self._lock:
+            if self._workers:
+                return
+            conn = self._connect()
+            try:
+                conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+                conn.commit()
+            finally:
+                conn.close()
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, kind, params, cache_key):
+        """
+        Queue a job, or return an existing job for the same cache key.
+
+        Returns:
+            Job dict (see get())
+        """
+        if kind not in self.renderers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        self.start()
+
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT job_id, status, artifact_path FROM jobs
+                WHERE cache_key = ? AND status IN ('queued', 'running', 'done')
+                ORDER BY created_at DESC
+            ''', (cache_key,))
+            for row in cursor.fetchall():
+                if row['status'] != 'done' or Path(row['artifact_path']).exists():
+                    return self.get(row['job_id'], conn)
+
+            job_id = uuid.uuid4().hex
+            cursor.execute('''
+                INSERT INTO jobs (job_id, kind, params_json, cache_key, status, created_at)
+                VALUES (?, ?, ?, ?, 'queued', ?)
+            ''', (job_id, kind, json.dumps(params, sort_keys=True), cache_key,
+                  datetime.now().isoformat(timespec='seconds')))
+            conn.commit()
+            job = self.get(job_id, conn)
+        finally:
+            conn.close()
+
+        with self._wake:
+            self._wake.notify()
+        return job
+
+    def get(self, job_id, conn=None):
+        """Job status dict, or None."""
+        own_conn = conn is None
+        conn = conn or self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT job_id, kind, params_json, cache_key, status, error, artifact_path,
+                       created_at, started_at, finished_at
+                FROM jobs WHERE job_id = ?
+            ''', (job_id,))
+            row = cursor.fetchone()
+        finally:
+            if own_conn:
+                conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job.pop('params_json'))
+        return job
+
+    def _claim(self, conn):
+        """Atomically move the oldest queued job to running."""
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('''
+                SELECT job_id, kind, params_json FROM jobs
+                WHERE status = 'queued'
+                ORDER BY created_at, rowid
+                LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if row is not None:
+                cursor.execute('''
+                    UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?
+                ''', (datetime.now().isoformat(timespec='seconds'), row['job_id']))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return row
+
+    def _run(self):
+        while True:
+            conn = self._connect()
+            try:
+                job = self._claim(conn)
+                if job is not None:
+                    self._execute(conn, job)
+            except Exception as e:
+                logger.error(f'Job worker error: {e}')
+                job = None
+            finally:
+                conn.close()
+
+            if job is None:
+                with self._wake:
+                    self._wake.wait(timeout=5)
+
+    def _execute(self, conn, job):
+        started = datetime.now()
+        path = None
+        try:
+            extension, render = self.renderers[job['kind']]
+            path = self.artifact_dir / f"{job['job_id']}.{extension}"
+            self.artifact_dir.mkdir(parents=True, exist_ok=True)
+            render(json.loads(job['params_json']), path)
+            conn.execute('''
+                UPDATE jobs SET status = 'done', artifact_path = ?, finished_at = ? WHERE job_id = ?
+            ''', (str(path), datetime.now().isoformat(timespec='seconds'), job['job_id']))
+            conn.commit()
+            logger.info(f"Job {job['job_id']} ({job['kind']}) done in {(datetime.now() - started).total_seconds():.1f}s")
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} ({job['kind']}) failed: {e}")
+            if path is not None:
+                path.unlink(missing_ok=True)
+            conn.execute('''
+                UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE job_id = ?
+            ''', (str(e), datetime.now().isoformat(timespec='seconds'), job['job_id']))
+            conn.commit()
+        else:
+            self._prune(conn, job['kind'])
+
+    def _prune(self, conn, kind):
+        """Delete all but the newest KEEP_ARTIFACTS finished jobs of a kind."""
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT job_id, artifact_path FROM jobs
+            WHERE kind = ? AND status IN ('done', 'failed')
+            ORDER BY finished_at DESC
+            LIMIT -1 OFFSET ?
+        ''', (kind, KEEP_ARTIFACTS))
+        stale = cursor.fetchall()
+        for row in stale:
+            if row['artifact_path']:
+                Path(row['artifact_path']).unlink(missing_ok=True)
+        cursor.executemany('DELETE FROM jobs WHERE job_id = ?', [(row['job_id'],) for row in stale])
+        conn.commit()
@@ -0,0 +1,315 @@
+"""
+Monte Carlo schedule and cost risk simulation for surtax projects.
+
+Answers questions like "what is the chance this finishes by August?".
+Each project's remaining work comes from its project_phases rows; schedule
+growth is bootstrapped from how far contracts across the portfolio have
+slipped past their original end dates, and cost growth from the portfolio's
+change-order history. All trials for a project run as one vectorized NumPy
+draw, and portfolio-wide runs are spread across a process pool.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from utils.cache import VersionedCache, get_data_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRIALS = 5000
+MAX_TRIALS = 100_000
+PERCENTILES = (50, 80, 95)
+
+# Per-phase duration noise on top of the bootstrapped growth factor
+PHASE_SIGMA = 0.15
+# Per-trial cost noise on top of the bootstrapped growth ratio
+COST_SIGMA = 0.05
+
+# Tables that feed the simulation inputs
+SOURCE_TABLES = ['contracts', 'project_phases', 'change_orders']
+
+_forecast_cache = VersionedCache('monte_carlo', maxsize=256)
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+# ==================
+# INPUTS
+# ==================
+
+def _days_between(start, end):
+    """Days between two ISO dates, or None if either is missing."""
+    if not start or not end:
+        return None
+    return (date.fromisoformat(end[:10]) - date.fromisoformat(start[:10])).days
+
+
+def load_history(conn):
+    """
+    Build the empirical growth pools used for bootstrapping.
+
+    Returns:
+        Dict with 'schedule_growth' (ratio of current to original duration)
+        and 'cost_growth' (change-order growth as a fraction of the award)
+    """
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT start_date, original_end_date, current_end_date
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+        AND start_date IS NOT NULL AND original_end_date IS NOT NULL AND current_end_date IS NOT NULL
+    ''')
+    schedule_growth = []
+    for row in cursor.fetchall():
+        planned = _days_between(row[0], row[1])
+        actual = _days_between(row[0], row[2])
+        if planned and planned > 0 and actual is not None:
+            schedule_growth.append(max(actual / planned, 0.5))
+
+    # Contract-level growth, plus line items that are not yet reflected in it
+    cursor.execute('''
+        SELECT c.original_amount,
+               c.current_amount - c.original_amount as change_amount,
+               COALESCE(SUM(co.amount), 0) as line_item_amount
+        FROM contracts c
+        LEFT JOIN change_orders co ON co.contract_id = c.contract_id AND co.status = 'Approved'
+        WHERE c.is_deleted = 0 AND c.surtax_category IS NOT NULL AND c.original_amount > 0
+        GROUP BY c.contract_id
+    ''')
+    cost_growth = []
+    for row in cursor.fetchall():
+        growth = max(row[1] or 0, row[2] or 0) / row[0]
+        cost_growth.append(max(growth, -0.5))
+
+    return {
+        'schedule_growth': np.array(schedule_growth or [1.0]),
+        'cost_growth': np.array(cost_growth or [0.0]),
+    }
+
+
+def load_project_inputs(conn, contract_id, as_of=None):
+    """
+    Collect the remaining phase durations and cost position for one project.
+
+    Args:
+        conn: SQLite connection
+        contract_id: Contract to simulate
+        as_of: Status date, defaults to today
+
+    Returns:
+        Dict of simulation inputs, or None if the project does not exist
+    """
+    as_of = as_of or date.today()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT contract_id, title, start_date, original_end_date, current_end_date,
+               current_amount, total_paid, percent_complete
+        FROM contracts
+        WHERE contract_id = ?
+    ''', (contract_id,))
+    contract = cursor.fetchone()
+    if not contract:
+        return None
+    contract = dict(zip([d[0] for d in cursor.description], contract))
+
+    cursor.execute('''
+        SELECT phase_name, start_date, end_date, percent_complete
+        FROM project_phases
+        WHERE contract_id = ?
+        ORDER BY start_date ASC
+    ''', (contract_id,))
+    remaining = []
+    for name, start, end, pct in cursor.fetchall():
+        planned = _days_between(start, end)
+        if not planned or planned <= 0:
+            continue
+        left = planned * (1 - min(max(float(pct or 0), 0), 100) / 100)
+        if left > 0:
+            remaining.append(left)
+
+    pct_complete = float(contract['percent_complete'] or 0)
+    if not remaining and pct_complete < 100:
+        # No open phases recorded: treat the unfinished share of the contract as one phase
+        planned = _days_between(contract['start_date'], contract['original_end_date'] or contract['current_end_date'])
+        if planned and planned > 0:
+            remaining.append(planned * (1 - pct_complete / 100))
+
+    budget = float(contract['current_amount'] or 0)
+    paid = float(contract['total_paid'] or 0)
+    return {
+        'contract_id': contract_id,
+        'title': contract['title'],
+        'as_of': as_of.isoformat(),
+        'current_end_date': contract['current_end_date'],
+        'remaining_days': remaining,
+        'budget': budget,
+        'paid': paid,
+        'remaining_cost': max(budget - paid, budget * (1 - pct_complete / 100), 0.0),
+    }
+
+
+# ==================
+# SIMULATION
+# ==================
+
+def simulate_project(inputs, history, trials=DEFAULT_TRIALS, seed=None, target_date=None):
+    """
+    Run the Monte Carlo trials for one project.
+
+    Args:
+        inputs: Dict from load_project_inputs()
+        history: Dict from load_history()
+        trials: Number of trials
+        seed: Optional seed (int or SeedSequence) for reproducible runs
+        target_date: Optional ISO date to report the probability of finishing by
+
+    Returns:
+        Dict with P50/P80/P95 completion dates and costs
+    """
+    rng = np.random.default_rng(seed)
+    as_of = date.fromisoformat(inputs['as_of'])
+    phases = np.asarray(inputs['remaining_days'], dtype=float)
+
+    if len(phases):
+        growth = rng.choice(history['schedule_growth'], size=(trials, len(phases)))
+        noise = rng.lognormal(0.0, PHASE_SIGMA, size=(trials, len(phases)))
+        days = (phases * growth * noise).sum(axis=1)
+    else:
+        days = np.zeros(trials)
+
+    cost_growth = rng.choice(history['cost_growth'], size=trials) + rng.normal(0.0, COST_SIGMA, size=trials)
+    costs = inputs['paid'] + inputs['remaining_cost'] * np.maximum(1 + cost_growth, 0)
+
+    day_pcts = np.percentile(days, PERCENTILES)
+    cost_pcts = np.percentile(costs, PERCENTILES)
+
+    result = {
+        'contract_id': inputs['contract_id'],
+        'title': inputs['title'],
+        'as_of': inputs['as_of'],
+        'trials': trials,
+        'current_end_date': inputs['current_end_date'],
+        'budget': inputs['budget'],
+        'completion': {
+            f'p{p}': (as_of + timedelta(days=int(np.ceil(d)))).isoformat()
+            for p, d in zip(PERCENTILES, day_pcts)
+        },
+        'cost': {f'p{p}': float(c) for p, c in zip(PERCENTILES, cost_pcts)},
+        'prob_over_budget': float(np.mean(costs > inputs['budget'])) * 100 if inputs['budget'] else None,
+    }
+
+    if inputs['current_end_date']:
+        deadline = (date.fromisoformat(inputs['current_end_date'][:10]) - as_of).days
+        result['prob_on_time'] = float(np.mean(days <= deadline)) * 100
+
+    if target_date:
+        target_days = (date.fromisoformat(target_date) - as_of).days
+        result['target_date'] = target_date
+        result['prob_by_target'] = float(np.mean(days <= target_days)) * 100
+
+    return result
+
+
+def _simulate_batch(batch, history, trials, target_date):
+    """Process-pool worker: simulate a batch of (inputs, seed) pairs."""
+    return [simulate_project(inputs, history, trials, seed, target_date) for inputs, seed in batch]
+
+
+def _get_pool():
+    """Lazily start the shared process pool for portfolio runs; returns (pool, workers)."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = min(4, os.cpu_count() or 1)
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+            logger.info(f'Started Monte Carlo process pool with {_pool_workers} workers')
+        return _pool, _pool_workers
+
+
+# ==================
+# CACHED ENTRY POINTS
+# ==================
+
+def forecast_project(conn, contract_id, trials=DEFAULT_TRIALS, target_date=None, as_of=None):
+    """
+    Get the Monte Carlo forecast for one project, cached per data version.
+
+    Returns:
+        Forecast dict from simulate_project(), or None if the project is unknown
+    """
+    trials = max(100, min(int(trials), MAX_TRIALS))
+    as_of = as_of or date.today()
+    version = get_data_version(conn, SOURCE_TABLES)
+    key = (contract_id, trials, target_date, as_of.isoformat())
+
+    cached = _forecast_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    inputs = load_project_inputs(conn, contract_id, as_of)
+    if inputs is None:
+        return None
+
+    # Seed from the project so repeated runs at the same version agree
+    seed = np.random.SeedSequence([version, sum(map(ord, contract_id))])
+    result = simulate_project(inputs, load_history(conn), trials, seed, target_date)
+    _forecast_cache.set(key, version, result)
+    return result
+
+
+def forecast_portfolio(conn, contract_ids, trials=DEFAULT_TRIALS, target_date=None, as_of=None, parallel=True):
+    """
+    Forecast many projects, spreading the trials across a process pool.
+
+    Args:
+        conn: SQLite connection
+        contract_ids: Projects to simulate
+        trials: Trials per project
+        target_date: Optional ISO date for prob_by_target
+        as_of: Status date, defaults to today
+        parallel: Use the process pool (False runs inline)
+
+    Returns:
+        List of forecast dicts
+    """
+    trials = max(100, min(int(trials), MAX_TRIALS))
+    as_of = as_of or date.today()
+    version = get_data_version(conn, SOURCE_TABLES)
+
+    results = {}
+    pending = []
+    for contract_id in contract_ids:
+        key = (contract_id, trials, target_date, as_of.isoformat())
+        cached = _forecast_cache.get(key, version)
+        if cached is not None:
+            results[contract_id] = cached
+            continue
+        inputs = load_project_inputs(conn, contract_id, as_of)
+        if inputs is not None:
+            seed = np.random.SeedSequence([version, sum(map(ord, contract_id))])
+            pending.append((inputs, seed))
+
+    if pending:
+        history = load_history(conn)
+        if parallel and len(pending) > 1:
+            pool, workers = _get_pool()
+            batches = [pending[i::workers] for i in range(workers) if pending[i::workers]]
+            futures = [pool.submit(_simulate_batch, batch, history, trials, target_date) for batch in batches]
+            simulated = [r for future in futures for r in future.result()]
+        else:
+            simulated = _simulate_batch(pending, history, trials, target_date)
+
+        for result in simulated:
+            key = (result['contract_id'], trials, target_date, as_of.isoformat())
+            _forecast_cache.set(key, version, result)
+            results[result['contract_id']] = result
+
+    return [results[cid] for cid in contract_ids if cid in results]
@@ -0,0 +1,328 @@
+"""
+Template-based question-to-SQL planner for Ask AI.
+
+A question is parsed into a QueryPlan: entity scope (schools, vendors,
+projects from utils/entities.py), surtax categories, status flags, amount and
+delay thresholds, ordering and a row limit. The plan is rendered onto one of
+a fixed set of parameterized templates over the contracts table; every WHERE
+and ORDER BY fragment comes from a whitelist, and user values only ever
+travel as parameters.
+
+SQL text is rendered once per plan shape (later plans of the same shape
+only bind their values) and executed on a small pool of long-lived
+connections, whose sqlite3 statement caches keep the statements prepared
+between requests. A
+per-question cost guard (an SQLite progress handler with a VM-step budget,
+plus a hard row cap) stops any plan from running an unbounded scan.
+"""
+
+import re
+import queue
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from utils.entities import entity_scope
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = 50
+DEFAULT_ROWS = 10
+
+# Progress handler granularity (VM instructions per callback) and budget
+PROGRESS_STEP = 1000
+MAX_VM_STEPS = 2_000_000
+
+STATEMENT_CACHE_SIZE = 128
+POOL_SIZE = 4
+
+BASE_WHERE = 'is_deleted = 0 AND surtax_category IS NOT NULL'
+
+TEMPLATES = {
+    'list': '''
+        SELECT contract_id, title, school_name, status, current_amount,
+               percent_complete, delay_days, budget_variance_pct
+        FROM contracts
+        WHERE {where}
+        ORDER BY {order}, contract_id
+        LIMIT ?
+    ''',
+    'aggregate': '''
+        SELECT COUNT(*) as count,
+               COALESCE(SUM(current_amount), 0) as total_budget,
+               COALESCE(SUM(total_paid), 0) as total_spent,
+               COALESCE(SUM(is_delayed), 0) as delayed,
+               COALESCE(SUM(is_over_budget), 0) as over_budget
+        FROM contracts
+        WHERE {where}
+    ''',
+}
+
+# filter name -> (SQL fragment, description template)
+FILTERS = {
+    'delayed': ('is_delayed = ?', '{} schedule'),
+    'over_budget': ('is_over_budget = ?', '{} budget'),
+    'status': ('status = ?', 'status {}'),
+    'min_amount': ('current_amount >= ?', 'at least ${:,.0f}'),
+    'max_amount': ('current_amount <= ?', 'at most ${:,.0f}'),
+    'min_delay': ('delay_days >= ?', 'delayed at least {:.0f} days'),
+    'max_delay': ('delay_days <= ?', 'delayed at most {:.0f} days'),
+}
+
+ORDERINGS = {
+    'amount_desc': 'current_amount DESC',
+    'amount_asc': 'current_amount ASC',
+    'delay_desc': 'delay_days DESC',
+    'variance_desc': 'budget_variance_pct DESC',
+    'progress_desc': 'percent_complete DESC',
+    'progress_asc': 'percent_complete ASC',
+    'end_asc': 'current_end_date ASC',
+    'start_desc': 'start_date DESC',
+}
+
+ORDER_PHRASES = [
+    (('largest', 'biggest', 'most expensive', 'highest budget', 'costliest'), 'amount_desc'),
+    (('smallest', 'cheapest', 'least expensive', 'lowest budget'), 'amount_asc'),
+    (('longest delay', 'most delayed', 'furthest behind'), 'delay_desc'),
+    (('most over budget', 'worst overrun', 'biggest overrun'), 'variance_desc'),
+    (('most complete', 'furthest along', 'most progress'), 'progress_desc'),
+    (('least complete', 'least progress'), 'progress_asc'),
+    (('due soonest', 'finishing soon', 'next to finish', 'deadline'), 'end_asc'),
+    (('newest', 'most recent', 'latest'), 'start_desc'),
+]
+
+# (phrases, filter name, value, description value)
+FLAG_PHRASES = [
+    (('on schedule', 'on time'), 'delayed', 0, 'on'),
+    (('delayed', 'behind schedule', 'late'), 'delayed', 1, 'behind'),
+    (('within budget', 'under budget', 'on budget'), 'over_budget', 0, 'within'),
+    (('over budget', 'cost overrun', 'overspent'), 'over_budget', 1, 'over'),
+    (('completed', 'finished'), 'status', 'Completed', 'Completed'),
+    (('active', 'in progress', 'underway', 'under way', 'ongoing'), 'status', 'Active', 'Active'),
+    (('planning', 'planned'), 'status', 'Planning', 'Planning'),
+    (('proposed',), 'status', 'Proposed', 'Proposed'),
+]
+
+AGGREGATE_PHRASES = ('how many', 'count', 'total', 'how much', 'sum of')
+
+_MULTIPLIERS = {'k': 1e3, 'thousand': 1e3, 'm': 1e6, 'mm': 1e6, 'million': 1e6, 'b': 1e9, 'billion': 1e9}
+_LOWER = r'over|above|more than|greater than|at least|exceeding'
+_UPPER = r'under|below|less than|at most'
+_THRESHOLD = re.compile(
+    rf'\b(?P<op>{_LOWER}|{_UPPER})\s+(?P<dollar>\$)?(?P<num>\d+(?:\.\d+)?)\s*'
+    r'(?P<unit>k|thousand|mm|m|million|b|billion|days?)?\b'
+)
+_TOP_N = re.compile(r'\b(?:top|first|last)\s+(\d{1,3})\b|\b(\d{1,3})\s+(?:largest|biggest|smallest|projects)\b')
+
+
+def _has_phrase(text, phrase):
+    return re.search(rf'\b{re.escape(phrase)}\b', text) is not None
+
+
+class QueryPlan:
+    """Parsed question: template, filters, entity scope, ordering and limit."""
+
+    def __init__(self, template='list'):
+        self.template = template
+        self.filters = []       # [(filter name, value)]
+        self.entities = []      # school / vendor / project entities (OR-ed)
+        self.categories = []    # category entities (OR-ed)
+        self.order = None
+        self.limit = DEFAULT_ROWS
+
+    @property
+    def constraints(self):
+        """Number of independent conditions, used to rank against fixed intents."""
+        return len(self.filters) + bool(self.entities) + bool(self.categories)
+
+    def shape(self):
+        """Cache key: everything that affects the SQL text, but no values."""
+        return (
+            self.template,
+            tuple(name for name, _ in self.filters),
+            tuple(e.kind for e in self.entities),
+            len(self.categories),
+            self.order,
+        )
+
+    def sql(self):
+        """SQL text for this plan's shape (no values)."""
+        where = [BASE_WHERE] + [FILTERS[name][0] for name, _ in self.filters]
+        if self.entities:
+            where.append(entity_scope(self.entities)[0])
+        if self.categories:
+            where.append(f"surtax_category IN ({','.join('?' * len(self.categories))})")
+        return TEMPLATES[self.template].format(where=' AND '.join(where), order=ORDERINGS.get(self.order, ''))
+
+    def params(self):
+        """Parameters for sql(), in placeholder order."""
+        params = [value for _, value in self.filters]
+        if self.entities:
+            params += entity_scope(self.entities)[1]
+        params += [c.key for c in self.categories]
+        if self.template == 'list':
+            params.append(min(self.limit, MAX_ROWS))
+        return params
+
+    def render(self):
+        """Return (sql, params) for this plan."""
+        return self.sql(), self.params()
+
+    def describe(self):
+        """Readable summary of the filters, for the answer header."""
+        parts = []
+        for name, value in self.filters:
+            if name in ('delayed', 'over_budget'):
+                label = next(desc for _, n, v, desc in FLAG_PHRASES if n == name and v == value)
+                parts.append(FILTERS[name][1].format(label))
+            else:
+                parts.append(FILTERS[name][1].format(value))
+        if self.categories:
+            parts.append(' or '.join(c.name for c in self.categories))
+        if self.entities:
+            parts.append('at ' + ' or '.join(e.name for e in self.entities))
+        return ', '.join(parts)
+
+
+def plan_question(question, mentions):
+    """
+    Parse a normalized question into a QueryPlan.
+
+    Args:
+        question: Normalized question text
+        mentions: Entity mentions from utils.entities.extract_entities()
+
+    Returns:
+        QueryPlan, or None if the question has no filters
+    """
+    # Phrases inside an entity name ("New High School Construction Project")
+    # must not also count as filters
+    text = question
+    for m in mentions:
+        text = text.replace(m.alias, ' ', 1)
+
+    plan = QueryPlan('aggregate' if any(_has_phrase(text, p) for p in AGGREGATE_PHRASES) else 'list')
+    plan.entities = [m.entity for m in mentions if m.entity.kind in ('school', 'vendor', 'project')]
+    plan.categories = [m.entity for m in mentions if m.entity.kind == 'category']
+
+    for match in _THRESHOLD.finditer(text):
+        unit = match.group('unit') or ''
+        value = float(match.group('num'))
+        lower = re.fullmatch(_LOWER, match.group('op')) is not None
+        if unit.startswith('day'):
+            plan.filters.append(('min_delay' if lower else 'max_delay', value))
+        elif match.group('dollar') or unit:
+            plan.filters.append(('min_amount' if lower else 'max_amount', value * _MULTIPLIERS.get(unit, 1)))
+        text = text.replace(match.group(0), ' ', 1)
+
+    seen = set()
+    for phrases, name, value, _ in FLAG_PHRASES:
+        if name not in seen and any(_has_phrase(text, p) for p in phrases):
+            plan.filters.append((name, value))
+            seen.add(name)
+
+    for phrases, order in ORDER_PHRASES:
+        if any(_has_phrase(text, p) for p in phrases):
+            plan.order = order
+            break
+    if plan.order is None:
+        flags = dict(plan.filters)
+        plan.order = 'delay_desc' if flags.get('delayed') == 1 else 'variance_desc' if flags.get('over_budget') == 1 else 'amount_desc'
+
+    top = _TOP_N.search(text)
+    if top:
+        plan.limit = max(1, min(int(top.group(1) or top.group(2)), MAX_ROWS))
+
+    return plan if plan.constraints else None
+
+
+class QueryCostExceeded(Exception):
+    """Raised when a planned query exceeds its VM-step budget."""
+
+
+class QueryPlanner:
+    """Executes QueryPlans with cached SQL, pooled connections and a cost guard."""
+
+    def __init__(self, connect, pool_size=POOL_SIZE, max_vm_steps=MAX_VM_STEPS):
+        self._connect = connect
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._statements = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_vm_steps = max_vm_steps
+        self.hits = 0
+        self.misses = 0
+        self.aborted = 0
+
+    def statement(self, plan):
+        """SQL for a plan's shape (rendered on the first lookup only) and the plan's params."""
+        key = plan.shape()
+        with self._lock:
+            sql = self._statements.get(key)
+            if sql is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+        if sql is None:
+            sql = plan.sql()
+            with self._lock:
+                self.misses += 1
+                self._statements[key] = sql
+                while len(self._statements) > STATEMENT_CACHE_SIZE:
+                    self._statements.popitem(last=False)
+        return sql, plan.params()
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def execute(self, plan):
+        """
+        Run a plan under the cost guard.
+
+        Returns:
+            List of sqlite3.Row
+
+        Raises:
+            QueryCostExceeded: if the query ran past max_vm_steps
+        """
+        sql, params = self.statement(plan)
+        conn = self._acquire()
+        steps = [0]
+
+        def guard():
+            steps[0] += PROGRESS_STEP
+            return steps[0] > self.max_vm_steps   # non-zero aborts the statement
+
+        conn.set_progress_handler(guard, PROGRESS_STEP)
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            if steps[0] > self.max_vm_steps:
+                with self._lock:
+                    self.aborted += 1
+                logger.warning(f'Ask query aborted after {steps[0]:,} VM steps: {plan.shape()}')
+                raise QueryCostExceeded(plan.describe()) from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+            self._release(conn)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'statements': len(self._statements),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+                'aborted': self.aborted,
+                'pooled_connections': self._pool.qsize(),
+            }
@@ -0,0 +1,180 @@
+"""
+Materialized annual report snapshots, one versioned row per fiscal year.
+
+Building the annual report runs a dozen aggregations. Instead, each fiscal
+year's report is materialized as JSON in the report_snapshots table (see
+utils/schema.py) and /report and /report/print render the stored snapshot:
+
+- An open fiscal year is materialized on demand and re-materialized (as a
+  new version) the first time it is viewed after the data changes.
+- Once a fiscal year has closed (FINAL_GRACE after June 30), its next
+  snapshot is marked final and is served as-is from then on.
+- A final snapshot changes only when it is explicitly regenerated, which
+  writes a new version; diff_reports() lists what changed between versions.
+
+Fiscal years run July 1 - June 30 and are named by the year they end in.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+from utils.cache import get_data_version
+
+# Late postings (accruals, retainage releases) settle during year-end close
+FINAL_GRACE = timedelta(days=90)
+
+# Keys used to line up list items between two versions of a report section
+DIFF_KEYS = ('contract_id', 'surtax_category', 'status', 'title')
+
+# Volatile fields that are not report content
+DIFF_IGNORE = {'generated_at'}
+
+
+def current_fiscal_year(today=None):
+    """Fiscal year containing a date (FY 2025 runs July 2024 - June 2025)."""
+    today = today or date.today()
+    return today.year + 1 if today.month >= 7 else today.year
+
+
+def fiscal_year_is_final(fiscal_year, today=None):
+    """Whether a fiscal year has closed and its data is final."""
+    today = today or date.today()
+    return today >= date(fiscal_year, 6, 30) + FINAL_GRACE
+
+
+def _decode(row):
+    report = json.loads(row['report_json'])
+    report['generated_at'] = datetime.fromisoformat(report['generated_at'])
+    report['snapshot'] = {
+        'version': row['version'],
+        'is_final': bool(row['is_final']),
+        'reason': row['reason'],
+        'data_version': row['data_version'],
+    }
+    return report
+
+
+def get_report_snapshot(conn, fiscal_year, version=None):
+    """
+    Load a stored report.
+
+    Args:
+        conn: SQLite connection
+        fiscal_year: Fiscal year (e.g. 2025)
+        version: Snapshot version, defaults to the latest
+
+    Returns:
+        Report dict (with a 'snapshot' metadata entry), or None
+    """
+    cursor = conn.cursor()
+    if version is None:
+        cursor.execute('''
+            SELECT * FROM report_snapshots WHERE fiscal_year = ?
+            ORDER BY version DESC LIMIT 1
+        ''', (fiscal_year,))
+    else:
+        cursor.execute('''
+            SELECT * FROM report_snapshots WHERE fiscal_year = ? AND version = ?
+        ''', (fiscal_year, version))
+    row = cursor.fetchone()
+    return _decode(row) if row else None
+
+
+def list_report_snapshots(conn, fiscal_year=None):
+    """Snapshot metadata (no report bodies), newest first."""
+    query = '''
+        SELECT fiscal_year, version, data_version, is_final, reason, generated_at
+        FROM report_snapshots
+    '''
+    params = []
+    if fiscal_year is not None:
+        query += ' WHERE fiscal_year = ?'
+        params.append(fiscal_year)
+    query += ' ORDER BY fiscal_year DESC, version DESC'
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def save_report_snapshot(conn, fiscal_year, report, reason, is_final=False):
+    """
+    Store a report as the next version for its fiscal year.
+
+    Returns:
+        The new version number
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM report_snapshots WHERE fiscal_year = ?',
+                   (fiscal_year,))
+    version = cursor.fetchone()[0]
+    body = {k: v for k, v in report.items() if k != 'snapshot'}
+    cursor.execute('''
+        INSERT INTO report_snapshots
+            (fiscal_year, version, data_version, is_final, reason, generated_at, report_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (fiscal_year, version, get_data_version(conn), int(is_final), reason,
+          report['generated_at'].isoformat(timespec='seconds'),
+          json.dumps(body, default=str, sort_keys=True)))
+    conn.commit()
+    return version
+
+
+def snapshot_needed(conn, fiscal_year, latest, today=None):
+    """
+    Decide whether a fiscal year needs a new snapshot before it is served.
+
+    Returns:
+        'on_demand' if none exists, 'final' if the year has closed since the
+        last snapshot, 'data_change' for a stale open year, or None
+    """
+    if latest is None:
+        return 'final' if fiscal_year_is_final(fiscal_year, today) else 'on_demand'
+    if latest['snapshot']['is_final']:
+        return None
+    if fiscal_year_is_final(fiscal_year, today):
+        return 'final'
+    if latest['snapshot']['data_version'] != get_data_version(conn):
+        return 'data_change'
+    return None
+
+
+def _diff_key(item):
+    for key in DIFF_KEYS:
+        if isinstance(item, dict) and item.get(key) is not None:
+            return (key, item[key])
+    return None
+
+
+def diff_reports(old, new, path=''):
+    """
+    List the differences between two report versions.
+
+    Dicts are compared key by key and lists of records are lined up on
+    contract_id / category / status / title where present (by position
+    otherwise), so a changed project shows up as field changes rather than
+    a reshuffled list.
+
+    Returns:
+        List of {'path', 'old', 'new'} dicts; a missing side is None
+    """
+    changes = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in sorted(set(old) | set(new), key=str):
+            if key in DIFF_IGNORE or key == 'snapshot':
+                continue
+            changes += diff_reports(old.get(key), new.get(key), f'{path}.{key}' if path else str(key))
+    elif isinstance(old, list) and isinstance(new, list):
+        old_keys = [_diff_key(item) for item in old]
+        new_keys = [_diff_key(item) for item in new]
+        if None in old_keys or None in new_keys:
+            pairs = [(i, i) for i in range(max(len(old), len(new)))]
+            old_by, new_by = dict(enumerate(old)), dict(enumerate(new))
+        else:
+            old_by, new_by = dict(zip(old_keys, old)), dict(zip(new_keys, new))
+            pairs = [(k, k) for k in dict.fromkeys(old_keys + new_keys)]
+        for old_k, new_k in pairs:
+            label = old_k if isinstance(old_k, int) else f'{old_k[0]}={old_k[1]}'
+            changes += diff_reports(old_by.get(old_k), new_by.get(new_k), f'{path}[{label}]')
+    elif old != new and not (isinstance(old, float) and isinstance(new, float) and abs(old - new) < 1e-6):
+        changes.append({'path': path, 'old': old, 'new': new})
+    return changes
@@ -0,0 +1,112 @@
+"""
+Annual report as an XLSX workbook, one sheet per report section.
+
+Sheets are written with openpyxl's write-only workbook, which streams rows
+to disk as they are appended instead of holding a cell grid in memory, so
+memory stays flat however many rows a section has.
+
+openpyxl is optional; is_available() reports whether it is installed.
+"""
+
+# (sheet title, report key) in workbook order
+REPORT_SHEETS = [
+    ('Summary', 'stats'),
+    ('Categories', 'categories'),
+    ('By Status', 'by_status'),
+    ('Top Projects', 'top_projects'),
+    ('Completed', 'completed_projects'),
+    ('Change Orders', 'change_orders'),
+    ('Concerns', 'concerns'),
+    ('Compliance', 'compliance'),
+]
+
+# Identifying columns lead each table (snapshot JSON stores keys sorted)
+LEAD_COLUMNS = ('contract_id', 'title', 'school_name', 'category_name', 'status', 'type', 'severity')
+
+
+def is_available():
+    """Whether openpyxl is installed."""
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _label(key):
+    return str(key).replace('_', ' ').title()
+
+
+def _cell(value):
+    """Excel-safe cell value (openpyxl rejects dicts and lists)."""
+    if isinstance(value, (dict, list, tuple)):
+        return str(value)
+    return value
+
+
+def section_rows(section):
+    """
+    Yield a header row then data rows for one report section.
+
+    Lists of records become a table with one column per field; a dict
+    (stats, change order totals, compliance checklist) becomes a two-column
+    Metric / Value table. An empty section gets a "No data" row, so it cannot
+    be mistaken for a failed export.
+    """
+    if not section:
+        yield ['Status']
+        yield ['No data']
+        return
+
+    if isinstance(section, dict):
+        yield ['Metric', 'Value']
+        for key, value in section.items():
+            yield [_label(key), _cell(value)]
+        return
+
+    records = section
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    columns.sort(key=lambda c: LEAD_COLUMNS.index(c) if c in LEAD_COLUMNS else len(LEAD_COLUMNS))
+    yield [_label(column) for column in columns]
+    for record in records:
+        yield [_cell(record.get(column)) for column in columns]
+
+
+def write_report_workbook(report, fileobj):
+    """
+    Write every report section to its own sheet.
+
+    Args:
+        report: Annual report dict (see get_report_data)
+        fileobj: Path or binary file object to save to
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+
+    title = workbook.create_sheet('Report')
+    title.append([f"Surtax Oversight Annual Report - {report['fiscal_year']}"])
+    title.append(['Generated', report['generated_at']])
+    snapshot = report.get('snapshot')
+    if snapshot:
+        title.append(['Snapshot version', snapshot['version']])
+        title.append(['Final', 'Yes' if snapshot['is_final'] else 'No'])
+
+    for sheet_title, key in REPORT_SHEETS:
+        sheet = workbook.create_sheet(sheet_title)
+        rows = section_rows(report.get(key))
+        header = next(rows)
+        cells = []
+        for value in header:
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.font = bold
+            cells.append(cell)
+        sheet.append(cells)
+        for row in rows:
+            sheet.append(row)
+
+    workbook.save(fileobj)
+
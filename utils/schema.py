@@ -0,0 +1,412 @@
+"""
+Runtime schema upgrades for the oversight dashboard.
+
+Every upgrade here is idempotent. The dashboard applies them once per process
+the first time it opens the database (see get_db in app.py), so an existing
+contracts.db picks up new columns, indexes and triggers without a separate
+migration step.
+"""
+
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A contract counts toward the change-order view when it is a live surtax
+# project whose current amount differs from the original award.
+CHANGE_ORDER_FILTER = '''
+    is_deleted = 0
+    AND surtax_category IS NOT NULL
+    AND original_amount IS NOT NULL
+    AND current_amount != original_amount
+'''
+
+
+def add_column(cursor, table, col_name, col_def):
+    """
+    Add a column to a table, ignoring it if the column already exists.
+
+    Args:
+        cursor: SQLite cursor
+        table: Table name
+        col_name: Column name
+        col_def: Column type and constraints
+
+    Returns:
+        True if the column was added
+    """
+    try:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {col_name} {col_def}')
+        logger.info(f'  Added column: {table}.{col_name}')
+        return True
+    except sqlite3.OperationalError as e:
+        if 'duplicate column name' in str(e).lower():
+            return False
+        raise
+
+
+def table_exists(cursor, table):
+    """Check whether a table exists."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    )
+    return cursor.fetchone() is not None
+
+
+def fiscal_year_sql(date_expr):
+    """
+    SQL expression for the fiscal year of a date.
+
+    Fiscal years run July 1 - June 30 and are named by the year they end in
+    (2023-08-01 is FY 2024). The result is TEXT, matching the fiscal_year
+    columns written by the importers.
+    """
+    return (f"CAST(CAST(strftime('%Y', {date_expr}) AS INTEGER)"
+            f" + (CAST(strftime('%m', {date_expr}) AS INTEGER) >= 7) AS TEXT)")
+
+
+def _change_order_terms(ref):
+    """Build the per-row summary contributions for OLD or NEW in a trigger."""
+    qualifies = f'''{ref}.is_deleted = 0
+        AND {ref}.surtax_category IS NOT NULL
+        AND {ref}.original_amount IS NOT NULL
+        AND {ref}.current_amount != {ref}.original_amount'''
+
+    def when(value):
+        return f'(CASE WHEN {qualifies} THEN {value} ELSE 0 END)'
+
+    return {
+        'count': when('1'),
+        'value': when(f'{ref}.current_amount - {ref}.original_amount'),
+        'increases': when(f'({ref}.current_amount > {ref}.original_amount)'),
+        'decreases': when(f'({ref}.current_amount < {ref}.original_amount)'),
+    }
+
+
+def _change_order_summary_update(remove=None, add=None):
+    """Build an UPDATE that moves one row's contribution out of/into the summary."""
+    old = _change_order_terms(remove) if remove else None
+    new = _change_order_terms(add) if add else None
+
+    def delta(key):
+        expr = ''
+        if old:
+            expr += f' - {old[key]}'
+        if new:
+            expr += f' + {new[key]}'
+        return expr
+
+    return f'''
+        UPDATE change_order_summary SET
+            total_changes = total_changes{delta('count')},
+            total_change_value = total_change_value{delta('value')},
+            increases = increases{delta('increases')},
+            decreases = decreases{delta('decreases')}
+        WHERE id = 1;
+    '''
+
+
+def refresh_change_order_summary(conn):
+    """Recompute the change-order summary row from scratch."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO change_order_summary
+            (id, total_changes, total_change_value, increases, decreases)
+        SELECT
+            1,
+            COUNT(*),
+            COALESCE(SUM(change_amount), 0),
+            COALESCE(SUM(CASE WHEN change_amount > 0 THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN change_amount < 0 THEN 1 ELSE 0 END), 0)
+        FROM contracts
+        WHERE {CHANGE_ORDER_FILTER}
+    ''')
+
+
+def ensure_change_order_deltas(conn):
+    """
+    Index contract budget changes and maintain the change-order summary row.
+
+    SQLite only allows VIRTUAL generated columns to be added with ALTER TABLE,
+    so change_amount/change_abs are virtual and the partial index on change_abs
+    is what stores the value. /change-orders walks that index instead of
+    sorting the whole contracts table, and reads its totals from
+    change_order_summary, which triggers keep current.
+    """
+    cursor = conn.cursor()
+
+    add_column(cursor, 'contracts', 'change_amount',
+               'REAL GENERATED ALWAYS AS (current_amount - original_amount) VIRTUAL')
+    add_column(cursor, 'contracts', 'change_abs',
+               'REAL GENERATED ALWAYS AS (ABS(current_amount - original_amount)) VIRTUAL')
+
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_contracts_change_abs
+        ON contracts(change_abs DESC)
+        WHERE {CHANGE_ORDER_FILTER}
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_change_orders_contract_date
+        ON change_orders(contract_id, approved_date DESC)
+    ''')
+
+    if not table_exists(cursor, 'change_order_summary'):
+        cursor.execute('''
+            CREATE TABLE change_order_summary (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                total_changes INTEGER DEFAULT 0,
+                total_change_value REAL DEFAULT 0,
+                increases INTEGER DEFAULT 0,
+                decreases INTEGER DEFAULT 0
+            )
+        ''')
+        refresh_change_order_summary(conn)
+        logger.info('  Created change_order_summary')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_change_order_summary_insert
+        AFTER INSERT ON contracts
+        BEGIN
+            {_change_order_summary_update(add='NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_change_order_summary_update
+        AFTER UPDATE OF is_deleted, surtax_category, original_amount, current_amount ON contracts
+        BEGIN
+            {_change_order_summary_update(remove='OLD', add='NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_change_order_summary_delete
+        AFTER DELETE ON contracts
+        BEGIN
+            {_change_order_summary_update(remove='OLD')}
+        END
+    ''')
+
+
+# Tables whose changes bump the data version used by in-process caches
+VERSIONED_TABLES = [
+    'contracts', 'change_orders', 'milestones', 'payments', 'project_phases',
+    'inspection_log', 'community_engagement', 'committee_actions',
+    'contractor_performance', 'documents', 'schools', 'vendors',
+    'surtax_categories', 'expenditures_summary', 'revenues_summary',
+    'capital_projects',
+]
+
+
+def ensure_data_versions(conn):
+    """
+    Track a change counter per table for cache invalidation.
+
+    Triggers bump data_versions.version for the table on every insert, update
+    and delete, so readers can tell whether anything changed with one indexed
+    read (see utils/cache.get_data_version).
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    for table in VERSIONED_TABLES:
+        if not table_exists(cursor, table):
+            continue
+        cursor.execute(
+            'INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)',
+            (table,)
+        )
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+
+def ensure_kpi_snapshots(conn):
+    """Create the KPI snapshot history table (see utils/snapshots.py)."""
+    from utils.snapshots import KPI_COLUMNS
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_snapshots (
+            snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            captured_at TEXT NOT NULL,
+            data_version INTEGER,
+            reason TEXT
+        )
+    ''')
+    for col_name, col_type in KPI_COLUMNS.items():
+        add_column(cursor, 'kpi_snapshots', col_name, col_type)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_kpi_snapshots_captured
+        ON kpi_snapshots(captured_at)
+    ''')
+
+
+def ensure_guided_answers(conn):
+    """Create the precomputed guided-prompt answer store (see utils/guided_answers.py)."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS guided_answers (
+            prompt_key TEXT PRIMARY KEY,
+            category TEXT,
+            data_version INTEGER NOT NULL,
+            response_json TEXT NOT NULL,
+            computed_at TEXT
+        )
+    ''')
+
+
+def ensure_report_snapshots(conn):
+    """Create the versioned annual report store (see utils/report_snapshots.py)."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_snapshots (
+            snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fiscal_year INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            data_version INTEGER,
+            is_final INTEGER NOT NULL DEFAULT 0,
+            reason TEXT,
+            generated_at TEXT NOT NULL,
+            report_json TEXT NOT NULL,
+            UNIQUE (fiscal_year, version)
+        )
+    ''')
+
+
+def ensure_jobs(conn):
+    """Create the background job queue (see utils/jobs.py)."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params_json TEXT,
+            cache_key TEXT,
+            status TEXT NOT NULL,
+            error TEXT,
+            artifact_path TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_status
+        ON jobs(status, created_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_cache_key
+        ON jobs(cache_key)
+    ''')
+
+
+def ensure_fiscal_years(conn):
+    """
+    Make fiscal year a first-class dimension of contracts and payments.
+
+    Contracts without an imported fiscal_year take it from their award (or
+    start) date, payments get a fiscal_year derived from payment_date, and
+    triggers keep both filled in on insert and update. Composite indexes led
+    by fiscal_year let every ?fy= view read only its year's slice.
+    """
+    cursor = conn.cursor()
+
+    contract_date = 'COALESCE(award_date, start_date)'
+    cursor.execute(f'''
+        UPDATE contracts SET fiscal_year = {fiscal_year_sql(contract_date)}
+        WHERE (fiscal_year IS NULL OR fiscal_year = '') AND {contract_date} IS NOT NULL
+    ''')
+    for event in ('INSERT', 'UPDATE OF award_date, start_date, fiscal_year'):
+        name = event.split()[0].lower()
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_contracts_fiscal_year_{name}
+            AFTER {event} ON contracts
+            WHEN (NEW.fiscal_year IS NULL OR NEW.fiscal_year = '')
+                AND COALESCE(NEW.award_date, NEW.start_date) IS NOT NULL
+            BEGIN
+                UPDATE contracts SET fiscal_year = {fiscal_year_sql('COALESCE(NEW.award_date, NEW.start_date)')}
+                WHERE rowid = NEW.rowid;
+            END
+        ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_contracts_fy_category
+        ON contracts(fiscal_year, surtax_category, is_deleted)
+    ''')
+
+    if table_exists(cursor, 'payments'):
+        add_column(cursor, 'payments', 'fiscal_year', 'TEXT')
+        cursor.execute(f'''
+            UPDATE payments SET fiscal_year = {fiscal_year_sql('payment_date')}
+            WHERE fiscal_year IS NULL AND payment_date IS NOT NULL
+        ''')
+        for event in ('INSERT', 'UPDATE OF payment_date'):
+            name = event.split()[0].lower()
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_payments_fiscal_year_{name}
+                AFTER {event} ON payments
+                WHEN NEW.payment_date IS NOT NULL
+                BEGIN
+                    UPDATE payments SET fiscal_year = {fiscal_year_sql('NEW.payment_date')}
+                    WHERE rowid = NEW.rowid;
+                END
+            ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_payments_fy_contract
+            ON payments(fiscal_year, contract_id)
+        ''')
+
+    for table in ('expenditures_summary', 'revenues_summary'):
+        if table_exists(cursor, table):
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{table}_fy_amount
+                ON {table}(fiscal_year, total_amount)
+            ''')
+
+
+def ensure_import_manifest(conn):
+    """Create the import source manifest (see utils/import_manifest.py)."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            source TEXT PRIMARY KEY,
+            target TEXT,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT,
+            row_count INTEGER,
+            inserted INTEGER,
+            updated INTEGER,
+            deleted INTEGER,
+            imported_at TEXT
+        )
+    ''')
+
+
+# Applied in order; append new upgrades to the end.
+SCHEMA_UPGRADES = [
+    ensure_change_order_deltas,
+    ensure_data_versions,
+    ensure_kpi_snapshots,
+    ensure_guided_answers,
+    ensure_report_snapshots,
+    ensure_jobs,
+    ensure_fiscal_years,
+    ensure_import_manifest,
+]
+
+
+def ensure_schema(conn):
+    """Apply all runtime schema upgrades to an open connection."""
+    for upgrade in SCHEMA_UPGRADES:
+        upgrade(conn)
+    conn.commit()
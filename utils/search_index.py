@@ -0,0 +1,261 @@
+"""
+Offline TF-IDF retrieval index for free-form Ask AI questions.
+
+One document per surtax project, built from the contract title, school,
+vendor, description and delay_reason plus its inspection findings, committee
+action items and community engagement notes. Document vectors are stored as a
+term-major sparse matrix (CSR postings: term_ptr / doc_idx / weights) in .npy
+files under data/search_index and memory-mapped on load, so startup does not
+re-tokenize anything.
+
+The index is tied to the data version of its source tables. When that
+changes, only documents whose text hash changed are re-tokenized before the
+matrix is reassembled.
+"""
+
+import json
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from utils.cache import get_data_version
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(__file__).parent.parent / 'data' / 'search_index'
+SOURCE_TABLES = ['contracts', 'inspection_log', 'committee_actions', 'community_engagement']
+ARRAYS = ['idf', 'term_ptr', 'doc_idx', 'weights']
+
+# Minimum cosine similarity for a document to count as relevant
+MIN_SCORE = 0.05
+
+STOPWORDS = frozenset('''
+    a about all also an and any are as at be been being by can could did do does
+    for from had has have how i in is it its me more most my no not of on or our
+    show so tell than that the their them there these this those to us was we
+    were what when where which who why will with would you your project projects
+'''.split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords dropped and plurals folded."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def load_documents(conn):
+    """
+    Gather the searchable text for every surtax project.
+
+    Returns:
+        Dict of contract_id -> document text, in contract_id order
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT contract_id, title, school_name, vendor_name, description, delay_reason
+        FROM contracts
+        WHERE is_deleted = 0 AND surtax_category IS NOT NULL
+        ORDER BY contract_id
+    ''')
+    docs = {row[0]: [part for part in row[1:] if part] for row in cursor.fetchall()}
+
+    related = [
+        'SELECT contract_id, findings FROM inspection_log',
+        'SELECT contract_id, action_item FROM committee_actions',
+        'SELECT contract_id, feedback_summary FROM community_engagement',
+        'SELECT contract_id, concerns_raised FROM community_engagement',
+    ]
+    for sql in related:
+        cursor.execute(sql)
+        for contract_id, text in cursor.fetchall():
+            if text and contract_id in docs:
+                docs[contract_id].append(text)
+
+    return {contract_id: '\n'.join(parts) for contract_id, parts in docs.items()}
+
+
+class SearchIndex:
+    """TF-IDF document vectors stored as term-major sparse postings."""
+
+    def __init__(self, version, doc_ids, vocab, idf, term_ptr, doc_idx, weights):
+        self.version = version
+        self.doc_ids = doc_ids
+        self.vocab = vocab
+        self.idf = idf
+        self.term_ptr = term_ptr
+        self.doc_idx = doc_idx
+        self.weights = weights
+
+    @classmethod
+    def from_counts(cls, version, doc_counts):
+        """
+        Assemble the matrix from per-document term counts.
+
+        Args:
+            version: Data version the counts were taken at
+            doc_counts: Dict of contract_id -> {term: count}
+        """
+        doc_ids = list(doc_counts)
+        terms = sorted({term for counts in doc_counts.values() for term in counts})
+        vocab = {term: i for i, term in enumerate(terms)}
+
+        term_col, doc_col, tf_col = [], [], []
+        for d, contract_id in enumerate(doc_ids):
+            for term, count in doc_counts[contract_id].items():
+                term_col.append(vocab[term])
+                doc_col.append(d)
+                tf_col.append(count)
+
+        term_arr = np.array(term_col, dtype=np.int32)
+        doc_arr = np.array(doc_col, dtype=np.int32)
+        tf_arr = np.array(tf_col, dtype=np.float32)
+
+        order = np.lexsort((doc_arr, term_arr))
+        term_arr, doc_arr, tf_arr = term_arr[order], doc_arr[order], tf_arr[order]
+
+        n_docs = len(doc_ids)
+        df = np.bincount(term_arr, minlength=len(terms))
+        idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+        term_ptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        # Sublinear tf * idf, L2-normalized per document
+        weights = (1 + np.log(tf_arr)) * idf[term_arr]
+        norms = np.sqrt(np.bincount(doc_arr, weights=weights ** 2, minlength=n_docs))
+        weights = (weights / np.where(norms > 0, norms, 1)[doc_arr]).astype(np.float32)
+
+        return cls(version, doc_ids, vocab, idf, term_ptr, doc_arr, weights)
+
+    def search(self, query, k=5):
+        """
+        Rank documents by cosine similarity to a query.
+
+        Returns:
+            List of (contract_id, score) for the top k documents (every
+            document when k is None) above MIN_SCORE
+        """
+        counts = Counter(t for t in tokenize(query) if t in self.vocab)
+        if not counts or not self.doc_ids:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        q_weights = []
+        for term, count in counts.items():
+            t = self.vocab[term]
+            weight = (1 + math.log(count)) * float(self.idf[t])
+            q_weights.append(weight)
+            start, end = self.term_ptr[t], self.term_ptr[t + 1]
+            scores[self.doc_idx[start:end]] += weight * self.weights[start:end]
+        scores /= math.sqrt(sum(w * w for w in q_weights))
+
+        k = len(scores) if k is None else min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.doc_ids[i], float(scores[i])) for i in top if scores[i] >= MIN_SCORE]
+
+    def save(self, directory, doc_terms):
+        """Write arrays and manifest; arrays are versioned so live mmaps stay valid."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(directory / f'{name}-{self.version}.npy', getattr(self, name))
+
+        with open(directory / 'doc_terms.json', 'w') as f:
+            json.dump(doc_terms, f)
+
+        manifest = {'version': self.version, 'doc_ids': self.doc_ids, 'terms': list(self.vocab)}
+        tmp = directory / 'manifest.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, directory / 'manifest.json')
+
+        # Old generations may still be mapped elsewhere; removal is best-effort
+        for path in directory.glob('*-*.npy'):
+            if not path.stem.endswith(f'-{self.version}'):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a saved index, or return None if there is none."""
+        try:
+            with open(directory / 'manifest.json') as f:
+                manifest = json.load(f)
+            version = manifest['version']
+            arrays = {name: np.load(directory / f'{name}-{version}.npy', mmap_mode='r') for name in ARRAYS}
+        except (OSError, ValueError, KeyError):
+            return None
+        vocab = {term: i for i, term in enumerate(manifest['terms'])}
+        return cls(version, manifest['doc_ids'], vocab, **arrays)
+
+
+def _load_doc_terms(directory):
+    try:
+        with open(directory / 'doc_terms.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def rebuild_index(conn, version, directory=INDEX_DIR):
+    """Rebuild the index, re-tokenizing only documents whose text changed."""
+    previous = _load_doc_terms(directory)
+    doc_terms = {}
+    retokenized = 0
+    for contract_id, text in load_documents(conn).items():
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        cached = previous.get(contract_id)
+        if cached and cached['hash'] == digest:
+            doc_terms[contract_id] = cached
+        else:
+            doc_terms[contract_id] = {'hash': digest, 'counts': Counter(tokenize(text))}
+            retokenized += 1
+
+    index = SearchIndex.from_counts(version, {cid: entry['counts'] for cid, entry in doc_terms.items()})
+    try:
+        index.save(directory, doc_terms)
+    except OSError as e:
+        logger.warning(f'Could not persist search index: {e}')
+    logger.info(f'Search index v{version}: {len(doc_terms)} documents, {retokenized} re-tokenized, {len(index.vocab)} terms')
+    return index
+
+
+def get_search_index(conn):
+    """Get the retrieval index for the current data version, rebuilding if stale."""
+    global _index
+    version = get_data_version(conn, SOURCE_TABLES)
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex.load(INDEX_DIR)
+        if _index is None or _index.version != version:
+            _index = rebuild_index(conn, version)
+        return _index
+
+
+def search_projects(conn, query, k=5):
+    """Top-k (contract_id, score) pairs for a free-form question (k=None: all matches)."""
+    return get_search_index(conn).search(query, k)
+
+
+def query_terms(conn, query, exclude=()):
+    """Index terms in a question (tokens no project mentions are dropped), minus exclude."""
+    vocab = get_search_index(conn).vocab
+    return [t for t in dict.fromkeys(tokenize(query)) if t in vocab and t not in exclude]
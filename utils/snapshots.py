@@ -0,0 +1,215 @@
+"""
+KPI snapshot history for trend charts.
+
+A snapshot is one compact row holding every headline KPI (overview stats,
+compliance scores and concern counts) at a point in time. Rows are appended
+on a schedule or whenever the data version changes, and trend views read
+them back with a single range scan on captured_at instead of recomputing
+historical states.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from utils.cache import get_data_version
+
+logger = logging.getLogger(__name__)
+
+# Snapshot columns: KPI name -> SQLite type
+KPI_COLUMNS = {
+    # get_overview_stats()
+    'total_projects': 'INTEGER',
+    'total_budget': 'REAL',
+    'total_spent': 'REAL',
+    'total_remaining': 'REAL',
+    'percent_spent': 'REAL',
+    'active_projects': 'INTEGER',
+    'completed_projects': 'INTEGER',
+    'delayed_projects': 'INTEGER',
+    'over_budget_projects': 'INTEGER',
+    'on_track_projects': 'INTEGER',
+    'avg_completion': 'REAL',
+    # get_compliance_data()
+    'compliance_overall': 'INTEGER',
+    'compliance_financial': 'INTEGER',
+    'compliance_schedule': 'INTEGER',
+    'compliance_funds': 'INTEGER',
+    'compliance_transparency': 'INTEGER',
+    'compliance_vendor': 'INTEGER',
+    # get_concerns()
+    'concerns_total': 'INTEGER',
+    'concerns_high': 'INTEGER',
+    'concerns_medium': 'INTEGER',
+    'concerns_schedule_delay': 'INTEGER',
+    'concerns_cost_overrun': 'INTEGER',
+    'concerns_vendor_pattern': 'INTEGER',
+}
+
+OVERVIEW_KPIS = [
+    'total_projects', 'total_budget', 'total_spent', 'total_remaining', 'percent_spent',
+    'active_projects', 'completed_projects', 'delayed_projects', 'over_budget_projects',
+    'on_track_projects', 'avg_completion',
+]
+
+# Take a snapshot at least this often even if nothing changed
+SNAPSHOT_MAX_AGE = timedelta(days=1)
+
+
+def build_kpi_row(stats, compliance, concerns):
+    """
+    Flatten live KPI values into a snapshot row.
+
+    Args:
+        stats: Dict from get_overview_stats()
+        compliance: Dict from get_compliance_data()
+        concerns: List from get_concerns()
+
+    Returns:
+        Dict of KPI name -> value for every key in KPI_COLUMNS
+    """
+    row = {key: stats.get(key) for key in OVERVIEW_KPIS}
+
+    row['compliance_overall'] = compliance.get('overall_score')
+    for category in compliance.get('categories', []):
+        if category.get('key'):
+            row[f"compliance_{category['key']}"] = category['score']
+
+    row['concerns_total'] = len(concerns)
+    row['concerns_high'] = sum(1 for c in concerns if c['severity'] == 'High')
+    row['concerns_medium'] = sum(1 for c in concerns if c['severity'] == 'Medium')
+    row['concerns_schedule_delay'] = sum(1 for c in concerns if c['type'] == 'Schedule Delay')
+    row['concerns_cost_overrun'] = sum(1 for c in concerns if c['type'] == 'Cost Overrun')
+    row['concerns_vendor_pattern'] = sum(1 for c in concerns if c['type'] == 'Vendor Pattern')
+
+    return {key: row.get(key) for key in KPI_COLUMNS}
+
+
+def get_latest_snapshot(conn):
+    """Get the most recent snapshot row, or None."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM kpi_snapshots
+        ORDER BY captured_at DESC
+        LIMIT 1
+    ''')
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+def save_snapshot(conn, kpis, reason='manual', captured_at=None):
+    """
+    Append a KPI snapshot row.
+
+    Args:
+        conn: SQLite connection
+        kpis: Dict from build_kpi_row()
+        reason: Why the snapshot was taken (manual, scheduled, data_change)
+        captured_at: Optional timestamp, defaults to now
+
+    Returns:
+        The new snapshot_id
+    """
+    captured_at = captured_at or datetime.now()
+    columns = list(KPI_COLUMNS)
+    placeholders = ','.join('?' * (len(columns) + 3))
+
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        INSERT INTO kpi_snapshots (captured_at, data_version, reason, {', '.join(columns)})
+        VALUES ({placeholders})
+    ''', [captured_at.isoformat(timespec='seconds'), get_data_version(conn), reason]
+         + [kpis.get(col) for col in columns])
+    conn.commit()
+    return cursor.lastrowid
+
+
+def snapshot_due(conn, now=None):
+    """
+    Decide whether a new snapshot should be taken.
+
+    Returns:
+        'data_change' if the data version moved since the last snapshot,
+        'scheduled' if the last snapshot is older than SNAPSHOT_MAX_AGE,
+        or None if no snapshot is needed
+    """
+    now = now or datetime.now()
+    latest = get_latest_snapshot(conn)
+    if latest is None:
+        return 'scheduled'
+    if latest['data_version'] != get_data_version(conn):
+        return 'data_change'
+    if datetime.fromisoformat(latest['captured_at']) <= now - SNAPSHOT_MAX_AGE:
+        return 'scheduled'
+    return None
+
+
+def get_kpi_trend(conn, metrics, start=None, end=None):
+    """
+    Read KPI history with one range scan over captured_at.
+
+    Args:
+        conn: SQLite connection
+        metrics: List of KPI names (keys of KPI_COLUMNS)
+        start: Optional ISO date/datetime lower bound (inclusive)
+        end: Optional ISO date/datetime upper bound (inclusive)
+
+    Returns:
+        Dict with the time series points and first-to-last change per metric
+
+    Raises:
+        ValueError: if metrics is empty or names an unknown KPI
+    """
+    if not metrics:
+        raise ValueError('No KPI requested')
+    unknown = [m for m in metrics if m not in KPI_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown KPI(s): {', '.join(unknown)}")
+
+    query = f"SELECT captured_at, {', '.join(metrics)} FROM kpi_snapshots WHERE 1 = 1"
+    params = []
+    if start:
+        query += ' AND captured_at >= ?'
+        params.append(start)
+    if end:
+        # A bare date means the whole day
+        query += ' AND captured_at <= ?'
+        params.append(end if 'T' in end else f'{end}T23:59:59')
+    query += ' ORDER BY captured_at ASC'
+
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    points = [dict(row) for row in cursor.fetchall()]
+
+    change = {}
+    if points:
+        for metric in metrics:
+            first, last = points[0][metric], points[-1][metric]
+            change[metric] = {
+                'first': first,
+                'last': last,
+                'delta': (last - first) if first is not None and last is not None else None
+            }
+
+    return {'metrics': metrics, 'points': points, 'change': change}
+
+
+def start_snapshot_scheduler(capture, interval_seconds=300):
+    """
+    Run capture() periodically on a daemon thread.
+
+    capture is expected to check snapshot_due() itself, so most ticks cost a
+    single data-version read.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_seconds):
+            try:
+                capture()
+            except Exception as e:
+                logger.error(f'KPI snapshot failed: {e}')
+
+    thread = threading.Thread(target=run, name='kpi-snapshots', daemon=True)
+    thread.start()
+    return stop
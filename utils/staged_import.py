@@ -0,0 +1,367 @@
+"""
+Staged imports: load into a staging table, then swap it into place.
+
+An ImportSource describes one importable dataset (its live table, natural
+key, value columns and how to extract records). StagedImport runs it in
+stages, timing each and counting rows:
+
+- check:    skip the import if the manifest says every source file is
+            unchanged (see utils/import_manifest.py)
+- stage:    copy the live table into a staging table (same DDL)
+- index:    index the staging table on the natural key
+- load:     diff the extracted records into the staging table (RowDiff)
+- validate: duplicate keys, required columns, source-specific checks
+- swap:     in one short transaction, drop the live table, rename the
+            staging table over it, restore the live table's triggers and
+            indexes, bump its data version and record the manifest. When the
+            diff wrote nothing, the live table and its data version are left
+            alone and only the manifest is recorded.
+
+The dashboard keeps reading the untouched live table until the swap, so it
+never sees a half-finished import, and the database write lock is taken for
+long only by the swap. SQLite cannot rename indexes, so the live table's
+secondary indexes are rebuilt under their own names inside the swap; the
+staging key index is dropped first.
+
+A dry run writes nothing outside the staging table, not even the manifest's
+refreshed mtimes.
+
+Imports into the same table must not overlap: each swap replaces the whole
+table with the copy taken at the stage step. The stage step reads the
+table's data_versions counter with the copy, and the swap aborts with
+StagedImportError if it moved in between (another import, or any other
+write, landed first); the import can simply be run again.
+"""
+
+import re
+import time
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+from utils.schema import table_exists
+from utils.import_manifest import RowDiff, check_source, record_source
+
+# Seconds to wait for the write lock (imports of different tables may run
+# side by side, e.g. the Marion expenditures and revenues; imports of the
+# same table are refused at the swap, see the module docstring)
+BUSY_TIMEOUT = 60
+
+
+class StagedImportError(Exception):
+    """An import stage failed; the live table is untouched."""
+
+
+class ImportSource:
+    """
+    Base class for an importable dataset.
+
+    Subclasses set the class attributes and implement extract(); the other
+    hooks have working defaults.
+    """
+
+    name = None
+    description = ''
+    table = None
+    key = ()
+    columns = ()
+    required = ()
+
+    # Delete rows in an imported scope that the source no longer lists
+    delete_missing = True
+
+    def __init__(self, files=None, jobs=None):
+        self.files = [Path(f) for f in files or []]
+        self.jobs = jobs
+
+    def prepare(self, conn):
+        """Create the live table if it does not exist yet."""
+
+    def source_paths(self):
+        """Files this source reads (tracked in the import manifest)."""
+        return list(self.files)
+
+    def select(self, conn, force=False, dry_run=False):
+        """
+        Fingerprints of the source files to import.
+
+        Args:
+            dry_run: Leave the manifest untouched (see check_source's touch)
+
+        Returns:
+            List of fingerprints (see check_source); empty when nothing
+            changed since the last import
+        """
+        checked = [check_source(conn, path, touch=not dry_run) for path in self.source_paths()]
+        if force or any(changed for changed, _ in checked):
+            return [fingerprint for _, fingerprint in checked]
+        return []
+
+    def extract(self, selected):
+        """
+        Yield (scope, records, fingerprint) for the selected sources.
+
+        scope is None or a dict of column -> value limiting the rows the
+        records replace (e.g. {'fiscal_year': '2024'}); records are tuples
+        of key columns followed by value columns.
+        """
+        raise NotImplementedError
+
+    def keep_missing(self, scope):
+        """Whether rows missing from a scope must be kept this run."""
+        return not self.delete_missing
+
+    def on_insert(self, now):
+        """Extra column values for inserted rows."""
+        return {}
+
+    def on_update(self, now):
+        """Extra column values for updated rows."""
+        return {}
+
+    def validate(self, cursor, table, scopes):
+        """Source-specific checks on the staging table; returns problem strings."""
+        return []
+
+    def target(self, scope):
+        """Manifest target label for a scope."""
+        if not scope:
+            return self.table
+        return self.table + ':' + ','.join(f'{k}={v}' for k, v in scope.items())
+
+
+def _scope_key(scope):
+    return tuple(sorted((scope or {}).items()))
+
+
+class StagedImport:
+    """Run an ImportSource through the staged pipeline."""
+
+    def __init__(self, db_path, source, dry_run=False, force=False, log=print):
+        self.db_path = db_path
+        self.source = source
+        self.dry_run = dry_run
+        self.force = force
+        self.log = log
+        self.staging = f'{source.table}__staging'
+        self.staged_version = None
+        self.metrics = []
+        self.counts = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+
+    def _stage(self, name, func):
+        """Run one stage, recording its time and row count (len() of a list result)."""
+        started = time.perf_counter()
+        result = func()
+        rows = len(result) if isinstance(result, list) else result
+        self.metrics.append({'stage': name, 'seconds': time.perf_counter() - started, 'rows': rows})
+        self.log(f"  {name:<9} {self.metrics[-1]['seconds']:8.3f}s  {rows if rows is not None else '':>9}")
+        return result
+
+    def run(self):
+        """
+        Import the source.
+
+        Returns:
+            Result dict: status ('imported', 'dry_run' or 'unchanged'),
+            counts, and per-stage metrics
+
+        Raises:
+            StagedImportError: if loading or validation fails (staging is dropped)
+        """
+        source = self.source
+        self.log(f'[INFO] Import {source.name} -> {source.table}' + (' (dry run)' if self.dry_run else ''))
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+        try:
+            source.prepare(conn)
+            conn.commit()
+            selected = self._stage('check', lambda: source.select(conn, self.force, self.dry_run))
+            if not selected:
+                self.log(f'[SKIP] {source.name}: sources unchanged since last import')
+                return self._result('unchanged')
+
+            try:
+                self._stage('stage', lambda: self._create_staging(conn))
+                self._stage('index', lambda: self._index_staging(conn))
+                diffs, per_source = {}, {}
+                self._stage('load', lambda: self._load(conn, selected, diffs, per_source))
+                self._stage('validate', lambda: self._validate(conn, diffs))
+                if self.dry_run:
+                    return self._result('dry_run')
+                c = self.counts
+                if c['inserted'] + c['updated'] + c['deleted'] == 0:
+                    # Nothing to swap in; the live table and its version stay put
+                    self._stage('record', lambda: self._record(conn, diffs, per_source))
+                else:
+                    self._stage('swap', lambda: self._swap(conn, diffs, per_source))
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute(f'DROP TABLE IF EXISTS {self.staging}')
+                conn.commit()
+        finally:
+            conn.close()
+
+        return self._result('imported')
+
+    def _result(self, status):
+        c = self.counts
+        if status != 'unchanged':
+            self.log(f"[OK] {self.source.name}: {c['rows']} records, {c['inserted']} inserted, "
+                     f"{c['updated']} updated, {c['deleted']} deleted, {c['unchanged']} unchanged"
+                     + (' (dry run, nothing written)' if status == 'dry_run' else ''))
+        return {'status': status, 'counts': dict(c), 'metrics': self.metrics}
+
+    def _create_staging(self, conn):
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                           (self.source.table,)).fetchone()
+        if row is None:
+            raise StagedImportError(f'Table {self.source.table} does not exist')
+        ddl = re.sub(rf'^CREATE TABLE\s+["`\[]?{re.escape(self.source.table)}["`\]]?',
+                     f'CREATE TABLE {self.staging}', row[0], count=1, flags=re.IGNORECASE)
+        conn.execute(f'DROP TABLE IF EXISTS {self.staging}')
+        conn.execute(ddl)
+        conn.commit()
+
+        # Named columns: SELECT * would include generated columns, which
+        # cannot be inserted (PRAGMA table_info leaves them out)
+        columns = ', '.join(f'"{row[1]}"' for row in conn.execute(f'PRAGMA table_info({self.source.table})'))
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        self.staged_version = self._table_version(cursor)
+        cursor.execute(f'INSERT INTO {self.staging} ({columns}) SELECT {columns} FROM {self.source.table}')
+        conn.commit()
+        return conn.execute(f'SELECT COUNT(*) FROM {self.staging}').fetchone()[0]
+
+    def _index_staging(self, conn):
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{self.staging}_key
+            ON {self.staging}({', '.join(self.source.key)})
+        ''')
+        conn.commit()
+        return None
+
+    def _load(self, conn, selected, diffs, per_source):
+        """Diff every extracted batch into staging (committed batch by batch)."""
+        source = self.source
+        now = datetime.now().isoformat(sep=' ')
+        cursor = conn.cursor()
+        for scope, records, fingerprint in source.extract(selected):
+            scope_key = _scope_key(scope)
+            if scope_key not in diffs:
+                diffs[scope_key] = (scope, RowDiff(cursor, self.staging, source.key, source.columns, scope=scope,
+                                                   on_insert=source.on_insert(now),
+                                                   on_update=source.on_update(now)), [])
+            diff = diffs[scope_key][1]
+            before = dict(diff.counts)
+            diff.apply(records)
+            conn.commit()
+
+            if fingerprint is not None:
+                counts = per_source.setdefault(fingerprint['source'],
+                                               (fingerprint, {'rows': 0, 'inserted': 0, 'updated': 0, 'deleted': 0}, scope_key))[1]
+                for key in ('rows', 'inserted', 'updated'):
+                    counts[key] += diff.counts[key] - before[key]
+                if fingerprint['source'] not in diffs[scope_key][2]:
+                    diffs[scope_key][2].append(fingerprint['source'])
+
+        # Fingerprints that produced no records still get a manifest row
+        for fingerprint in selected:
+            per_source.setdefault(fingerprint['source'],
+                                  (fingerprint, {'rows': 0, 'inserted': 0, 'updated': 0, 'deleted': 0}, None))
+
+        for scope_key, (scope, diff, sources) in diffs.items():
+            diff.finish(delete_missing=not source.keep_missing(scope))
+            for name in sources:
+                per_source[name][1]['deleted'] = diff.counts['deleted']
+            for key in self.counts:
+                self.counts[key] += diff.counts[key]
+        conn.commit()
+        return self.counts['rows']
+
+    def _validate(self, conn, diffs):
+        source = self.source
+        cursor = conn.cursor()
+        scopes = [scope for scope, _, _ in diffs.values()]
+        problems = []
+
+        scope_columns = sorted({column for scope in scopes if scope for column in scope})
+        group = ', '.join(list(source.key) + scope_columns)
+        cursor.execute(f'''
+            SELECT {group}, COUNT(*) FROM {self.staging}
+            GROUP BY {group} HAVING COUNT(*) > 1 LIMIT 5
+        ''')
+        for row in cursor.fetchall():
+            problems.append(f'duplicate key {tuple(row[:-1])} ({row[-1]} rows)')
+
+        for column in source.required:
+            cursor.execute(f'SELECT COUNT(*) FROM {self.staging} WHERE {column} IS NULL OR {column} = ?', ('',))
+            missing = cursor.fetchone()[0]
+            if missing:
+                problems.append(f'{missing} row(s) missing {column}')
+
+        problems += source.validate(cursor, self.staging, scopes)
+        if problems:
+            for problem in problems:
+                self.log(f'[ERROR] {source.name}: {problem}')
+            raise StagedImportError(f'{source.name} failed validation ({len(problems)} problem(s))')
+        return cursor.execute(f'SELECT COUNT(*) FROM {self.staging}').fetchone()[0]
+
+    def _swap(self, conn, diffs, per_source):
+        table = self.source.table
+        cursor = conn.cursor()
+        cursor.execute(f'DROP INDEX IF EXISTS idx_{self.staging}_key')
+        conn.commit()
+
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            self._check_unchanged(cursor)
+            cursor.execute('''
+                SELECT sql FROM sqlite_master
+                WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            ''', (table,))
+            dependents = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'DROP TABLE {table}')
+            cursor.execute(f'ALTER TABLE {self.staging} RENAME TO {table}')
+            for sql in dependents:
+                cursor.execute(sql)
+            if table_exists(cursor, 'data_versions'):
+                # The rename bypassed the version triggers
+                cursor.execute('UPDATE data_versions SET version = version + 1 WHERE table_name = ?', (table,))
+            self._record_sources(conn, diffs, per_source)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return self.counts['rows']
+
+    def _record(self, conn, diffs, per_source):
+        """Record the manifest for an import that changed no rows."""
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            self._check_unchanged(cursor)
+            self._record_sources(conn, diffs, per_source)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return 0
+
+    def _table_version(self, cursor):
+        """The live table's data_versions counter (None if untracked)."""
+        if not table_exists(cursor, 'data_versions'):
+            return None
+        cursor.execute('SELECT version FROM data_versions WHERE table_name = ?', (self.source.table,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _check_unchanged(self, cursor):
+        """Refuse to swap over writes made to the live table since staging."""
+        if self._table_version(cursor) != self.staged_version:
+            raise StagedImportError(f'{self.source.table} changed while {self.source.name} was '
+                                    f'staged (another import?); run the import again')
+
+    def _record_sources(self, conn, diffs, per_source):
+        scope_labels = {key: self.source.target(scope) for key, (scope, _, _) in diffs.items()}
+        for fingerprint, counts, scope_key in per_source.values():
+            record_source(conn, fingerprint, scope_labels.get(scope_key, self.source.table), counts)